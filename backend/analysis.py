@@ -6,158 +6,403 @@ from dotenv import load_dotenv
 # Load Environment Variables
 load_dotenv()
 
-def generate_rule_based_report(stock_data):
+# --- Rule-Based Expert System ---
+# One rule table drives both the per-stock report (generate_rule_based_report, the
+# API fallback) and the ETL batch (score_universe), so the two cannot drift apart.
+# Groups run in order; inside a group the first matching rule wins (the original
+# if / elif chains). A rule is (flag, side, weight, when(d), text(d)) where d is
+# _rule_inputs(record); score = 50 + the weights of the rules that fired.
+
+def _ma_ready(d):
+    return d["price"] and d["ma20"] and d["ma60"]
+
+RULE_GROUPS = [
+    # 1. Chips
+    [("foreign_strong_buy", "bull", 15, lambda d: d["foreign"] > 1000, lambda d: f"外資強力買超 ({d['foreign']}張)。"),
+     ("foreign_buy",        "bull", 5,  lambda d: d["foreign"] > 0,    lambda d: "外資站在買方。"),
+     ("foreign_sell",       "bear", -15, lambda d: d["foreign"] < -1000, lambda d: f"外資調節 ({d['foreign']}張)。")],
+    [("trust_buy",          "bull", 10, lambda d: d["trust"] > 100,    lambda d: "投信進場佈局。")],
+    # 2. Revenue
+    [("revenue_surge",      "bull", 15, lambda d: d["yoy"] > 20,       lambda d: f"營收年增爆發 (+{d['yoy']}%)。"),
+     ("revenue_decline",    "bear", -15, lambda d: d["yoy"] < -20,     lambda d: f"營收明顯衰退 ({d['yoy']}%)。")],
+    # 3. Valuation
+    [("pe_low",             "bull", 10, lambda d: d["pe"] > 0 and d["pe"] < 15, lambda d: f"本益比 ({d['pe']}x) 低廉。"),
+     ("pe_high",            "bear", -10, lambda d: d["pe"] > 40,       lambda d: f"本益比 ({d['pe']}x) 偏高。")],
+    # 4. Technicals (only when the OHLCV history is available)
+    [("ma_bull",            "bull", 10, lambda d: _ma_ready(d) and d["price"] > d["ma20"] > d["ma60"],
+      lambda d: "多頭排列 (站上月線與季線)。"),
+     ("ma_bear",            "bear", -10, lambda d: _ma_ready(d) and d["price"] < d["ma20"] < d["ma60"],
+      lambda d: "空頭排列 (跌破月線與季線)。")],
+    [("rsi_hot",            "bear", -5, lambda d: d["rsi"] is not None and d["rsi"] >= 80, lambda d: f"RSI 過熱 ({d['rsi']})。"),
+     ("rsi_oversold",       "bull", 5,  lambda d: d["rsi"] is not None and d["rsi"] <= 20, lambda d: f"RSI 超賣 ({d['rsi']})。")],
+    [("volume_breakout",    "bull", 5,
+      lambda d: d["from_high"] is not None and d["vol_ratio"] is not None and d["from_high"] > -3 and d["vol_ratio"] >= 1.5,
+      lambda d: f"量增 ({d['vol_ratio']}倍) 逼近 52 週高點。")],
+]
+RULES = {rule[0]: rule for group in RULE_GROUPS for rule in group}
+
+def _rule_inputs(stock_data):
+    """The raw values the rules read (missing keys default as in the original expert system)."""
+    val = stock_data.get('valuation', {})
+    rev = stock_data.get('revenue', {})
+    chips = stock_data.get('chips', {})
+    tech = stock_data.get('technicals') or {}
+    return {
+        "pe": val.get('current_pe', 0), "price": val.get('price', 0),
+        "yoy": rev.get('yoy', 0),
+        "foreign": chips.get('foreign_net', 0), "trust": chips.get('trust_net', 0),
+        "ma20": tech.get('ma20'), "ma60": tech.get('ma60'), "rsi": tech.get('rsi14'),
+        "from_high": tech.get('pct_from_high'), "vol_ratio": tech.get('volume_ratio'),
+    }
+
+def rule_verdict(score):
+    if score >= 80: return "強力買進 (Strong Buy)"
+    if score >= 60: return "偏多操作 (Bullish)"
+    if score <= 30: return "保守觀望 (Bearish)"
+    return "區間震盪 (Neutral)"
+
+def score_record(stock_data):
+    """Rules only (no markdown) -> {"score", "verdict", "factors"}. Raises on inputs the rules can't compare."""
+    d = _rule_inputs(stock_data)
+    fired = []
+    for group in RULE_GROUPS:
+        for flag, _, _, when, _ in group:
+            if when(d):
+                fired.append(flag)
+                break
+    score = 50 + sum(RULES[k][2] for k in fired)
+    return {"score": score, "verdict": rule_verdict(score), "factors": fired}
+
+def render_rule_report(stock_data, rule=None):
     """
-    Original Expert System Logic (Fallback)
+    Markdown for a scored rule result (precomputed `rule_analysis` by default).
+    Scores the record on the spot when it has none.
     """
+    rule = rule or stock_data.get('rule_analysis')
+    if not rule:
+        return generate_rule_based_report(stock_data)
     sid = stock_data.get('stock_id')
     name = stock_data.get('stock_name', sid)
-    
-    val = stock_data.get('valuation', {})
-    pe = val.get('current_pe', 0)
-    rev = stock_data.get('revenue', {})
-    mom = rev.get('mom', 0)
-    yoy = rev.get('yoy', 0)
-    chips = stock_data.get('chips', {})
-    foreign = chips.get('foreign_net', 0)
-    trust = chips.get('trust_net', 0)
-    
-    score = 50 
-    bull_factors, bear_factors = [], []
-    
-    # 1. Chips
-    if foreign > 1000: 
-        score += 15
-        bull_factors.append(f"外資強力買超 ({foreign}張)。")
-    elif foreign > 0:
-        score += 5
-        bull_factors.append("外資站在買方。")
-    elif foreign < -1000:
-        score -= 15
-        bear_factors.append(f"外資調節 ({foreign}張)。")
-        
-    if trust > 100:
-        score += 10
-        bull_factors.append("投信進場佈局。")
-        
-    # 2. Revenue
-    if yoy > 20:
-        score += 15
-        bull_factors.append(f"營收年增爆發 (+{yoy}%)。")
-    elif yoy < -20:
-        score -= 15
-        bear_factors.append(f"營收明顯衰退 ({yoy}%)。")
-        
-    # 3. Valuation
-    if pe > 0 and pe < 15:
-        score += 10
-        bull_factors.append(f"本益比 ({pe}x) 低廉。")
-    elif pe > 40:
-        score -= 10
-        bear_factors.append(f"本益比 ({pe}x) 偏高。")
-        
-    # Verdict
-    if score >= 80: verdict = "強力買進 (Strong Buy)"
-    elif score >= 60: verdict = "偏多操作 (Bullish)"
-    elif score <= 30: verdict = "保守觀望 (Bearish)"
-    else: verdict = "區間震盪 (Neutral)"
-    
+    d = _rule_inputs(stock_data)
+    bull = [RULES[k][4](d) for k in rule["factors"] if RULES[k][1] == "bull"]
+    bear = [RULES[k][4](d) for k in rule["factors"] if RULES[k][1] == "bear"]
+
     summary_md = f"### 🤖 Rules AI 診斷: {name} ({sid})\n\n"
-    summary_md += f"**總和評分**: {score}分 - **{verdict}**\n\n"
-    for f in bull_factors: summary_md += f"- 📈 {f}\n"
-    for f in bear_factors: summary_md += f"- 📉 {f}\n"
-    
-    if not bull_factors and not bear_factors:
+    summary_md += f"**總和評分**: {rule['score']}分 - **{rule['verdict']}**\n\n"
+    for f in bull: summary_md += f"- 📈 {f}\n"
+    for f in bear: summary_md += f"- 📉 {f}\n"
+    if not bull and not bear:
         summary_md += "數據平穩，無顯著訊號。\n"
-        
     summary_md += "\n> *此報告由專家規則系統生成 (Rule-Based)*"
-    
-    return { "score": score, "verdict": verdict, "report": summary_md }
+    return { "score": rule['score'], "verdict": rule['verdict'], "factors": list(rule['factors']), "report": summary_md }
+
+def generate_rule_based_report(stock_data):
+    """
+    Original Expert System Logic (Fallback)
+    """
+    return render_rule_report(stock_data, score_record(stock_data))
 
+# --- Batch Rule Scoring (ETL time) ---
+# score_record over the whole universe once per ETL run; each record stores
+# {"score", "verdict", "factors"} as rule_analysis and the API only renders the
+# markdown. backend/tests/test_rule_scoring.py checks both paths on every stock.
+# A plain loop on purpose: reading the inputs out of the record dicts costs as much
+# as the rules themselves, so a NumPy pass over ~2k stocks was measured slower.
+
+def score_universe(db):
+    """
+    Rule scoring for {code: record}.
+    Returns {code: {"score", "verdict", "factors"}}. Stocks whose rule inputs are
+    not comparable (the per-stock report would raise) are left out.
+    """
+    out = {}
+    for code, rec in db.items():
+        try: out[code] = score_record(rec)
+        except Exception: continue  # e.g. "valuation": null, a string PE
+    return out
+
+def verify_batch_scoring(db):
+    """Reference vs batch on every stock. Returns a list of mismatch descriptions."""
+    batch = score_universe(db)
+    mismatches = []
+    for code, rec in db.items():
+        try:
+            ref = generate_rule_based_report(rec)
+        except Exception as e:
+            if code in batch:
+                mismatches.append(f"{code}: reference raised {type(e).__name__}, batch scored it")
+            continue
+        if code not in batch:
+            mismatches.append(f"{code}: batch skipped a stock the reference scores")
+            continue
+        got = render_rule_report(rec, batch[code])
+        for key in ("score", "verdict", "factors", "report"):
+            if got[key] != ref[key]:
+                mismatches.append(f"{code}: {key} differs ({got[key]!r} != {ref[key]!r})")
+    return mismatches
+
+import re
+import json
 import time
+import asyncio
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
 from google import genai
 from google.genai import types
 
-def generate_llm_report(stock_data, api_key):
-    """
-    Generative AI Logic via Google Gemini (v1.0+ SDK)
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+def build_llm_prompt(stock_data):
+    """Hedge-fund trader persona prompt for one stock record"""
+    sid = stock_data.get('stock_id')
+    name = stock_data.get('stock_name', sid)
+    tech = stock_data.get('technicals') or {}
+    
+    prompt = f"""
+    你現在是華爾街頂尖避險基金的資深操盤手，風格犀利、邏輯嚴謹，擅長從「籌碼面」與「基本面」的背離中尋找交易機會。
+
+    請根據以下即時數據，進行深度交叉分析，並預判短期股價走勢。
+
+    [股票資訊]
+    代號: {sid}
+    名稱: {name}
+
+    [基本面數據]
+    本益比 (PE): {stock_data.get('valuation', {}).get('current_pe', 'N/A')}x (同業平均: {stock_data.get('valuation', {}).get('sector_pe', 'N/A')}x) -> *請判斷此溢價是否由成長性支撐*
+    營收月增 (MoM): {stock_data.get('valuation', {}).get('revenue', {}).get('mom', stock_data.get('revenue', {}).get('mom', 'N/A'))}% 
+    營收年增 (YoY): {stock_data.get('valuation', {}).get('revenue', {}).get('yoy', stock_data.get('revenue', {}).get('yoy', 'N/A'))}% -> *這是評估股價動能的核心*
+
+    [技術面數據]
+    收盤價: {stock_data.get('valuation', {}).get('price', 'N/A')} / 月線 MA20: {tech.get('ma20', 'N/A')} / 季線 MA60: {tech.get('ma60', 'N/A')}
+    RSI14: {tech.get('rsi14', 'N/A')} / MACD 柱狀體: {tech.get('macd_hist', 'N/A')} / ATR%: {tech.get('atr_pct', 'N/A')}
+    量比 (今日/20日均量): {tech.get('volume_ratio', 'N/A')} / 距 52 週高點: {tech.get('pct_from_high', 'N/A')}%
+
+    [籌碼面數據]
+    外資買賣超: {stock_data.get('chips', {}).get('foreign_net', '0')}張 (主導趨勢的關鍵力量)
+    投信買賣超: {stock_data.get('chips', {}).get('trust_net', '0')}張 (內資作帳與護盤指標)
+    主力動向: {stock_data.get('chips', {}).get('analysis', 'N/A')} (囤貨中/出貨中)
+
+    ---
+    **分析邏輯指引 (Thinking Process):**
+    1. **估值檢測 (PEG Logic):** 用「營收年增率」去檢視「本益比」是否過高？(例如：年增 35% 支撐 28倍 PE 是合理的，反之則危險)。
+    2. **籌碼動能 (Flow Analysis):** 外資與投信是否「同向」？如果外資大買且主力狀態為 Accumulating，代表趨勢確立；若外資買但主力在出貨，則為假突破。
+    3. **預判結論:** 綜合以上，判斷下週走勢是「強勢噴出」、「高檔震盪」還是「拉回修正」。
+
+    ---
+    請直接輸出以下 Markdown 格式 (語氣要果斷，不要模稜兩可)：
+
+    ### ⚡ 操盤手戰情室: {name} ({sid})
+    **AI 綜合戰力**: <根據基本面與籌碼配合度給 0-100 分> 分
+    **趨勢訊號**: **<強烈看多 (Strong Bull) / 謹慎看多 (Bullish) / 中立觀望 (Neutral) / 轉弱看空 (Bearish)>**
+
+    #### 🎯 核心邏輯剖析 (Cross Analysis)
+    - **估值與成長對決**: <一句話分析。例如："雖 PE 高於同業，但 35% 的高成長率完美消化了估值壓力，PEG 顯示股價仍具吸引力。">
+    - **籌碼博弈解讀**: <一句話分析。例如："外資與投信同步大買 (土洋合流)，且主力處於吸籌階段，顯示大戶對後市極度看好，籌碼結構紮實。">
+
+    #### 🔮 實戰預判 & 操作策略
+    - **走勢預演**: <預測接下來會發生的事。例如："在營收創高與法人買盤堆疊下，股價極高機率突破前高，短線將沿著均線強勢上攻。">
+    - **關鍵操作**: <給出具體建議。例如："只要外資買超不縮手，任何拉回皆是買點。切勿預設高點，抱緊處理。/ 留意追高風險，建議等拉回五日線再佈局。">
     """
-    try:
-        # Initialize Client
-        client = genai.Client(api_key=api_key)
-        
-        sid = stock_data.get('stock_id')
-        name = stock_data.get('stock_name', sid)
-        
-        prompt = f"""
-        你現在是華爾街頂尖避險基金的資深操盤手，風格犀利、邏輯嚴謹，擅長從「籌碼面」與「基本面」的背離中尋找交易機會。
-
-        請根據以下即時數據，進行深度交叉分析，並預判短期股價走勢。
-
-        [股票資訊]
-        代號: {sid}
-        名稱: {name}
-
-        [基本面數據]
-        本益比 (PE): {stock_data.get('valuation', {}).get('current_pe', 'N/A')}x (同業平均: {stock_data.get('valuation', {}).get('sector_pe', 'N/A')}x) -> *請判斷此溢價是否由成長性支撐*
-        營收月增 (MoM): {stock_data.get('valuation', {}).get('revenue', {}).get('mom', stock_data.get('revenue', {}).get('mom', 'N/A'))}% 
-        營收年增 (YoY): {stock_data.get('valuation', {}).get('revenue', {}).get('yoy', stock_data.get('revenue', {}).get('yoy', 'N/A'))}% -> *這是評估股價動能的核心*
-
-        [籌碼面數據]
-        外資買賣超: {stock_data.get('chips', {}).get('foreign_net', '0')}張 (主導趨勢的關鍵力量)
-        投信買賣超: {stock_data.get('chips', {}).get('trust_net', '0')}張 (內資作帳與護盤指標)
-        主力動向: {stock_data.get('chips', {}).get('analysis', 'N/A')} (囤貨中/出貨中)
-
-        ---
-        **分析邏輯指引 (Thinking Process):**
-        1. **估值檢測 (PEG Logic):** 用「營收年增率」去檢視「本益比」是否過高？(例如：年增 35% 支撐 28倍 PE 是合理的，反之則危險)。
-        2. **籌碼動能 (Flow Analysis):** 外資與投信是否「同向」？如果外資大買且主力狀態為 Accumulating，代表趨勢確立；若外資買但主力在出貨，則為假突破。
-        3. **預判結論:** 綜合以上，判斷下週走勢是「強勢噴出」、「高檔震盪」還是「拉回修正」。
-
-        ---
-        請直接輸出以下 Markdown 格式 (語氣要果斷，不要模稜兩可)：
-
-        ### ⚡ 操盤手戰情室: {name} ({sid})
-        **AI 綜合戰力**: <根據基本面與籌碼配合度給 0-100 分> 分
-        **趨勢訊號**: **<強烈看多 (Strong Bull) / 謹慎看多 (Bullish) / 中立觀望 (Neutral) / 轉弱看空 (Bearish)>**
-
-        #### 🎯 核心邏輯剖析 (Cross Analysis)
-        - **估值與成長對決**: <一句話分析。例如："雖 PE 高於同業，但 35% 的高成長率完美消化了估值壓力，PEG 顯示股價仍具吸引力。">
-        - **籌碼博弈解讀**: <一句話分析。例如："外資與投信同步大買 (土洋合流)，且主力處於吸籌階段，顯示大戶對後市極度看好，籌碼結構紮實。">
-
-        #### 🔮 實戰預判 & 操作策略
-        - **走勢預演**: <預測接下來會發生的事。例如："在營收創高與法人買盤堆疊下，股價極高機率突破前高，短線將沿著均線強勢上攻。">
-        - **關鍵操作**: <給出具體建議。例如："只要外資買超不縮手，任何拉回皆是買點。切勿預設高點，抱緊處理。/ 留意追高風險，建議等拉回五日線再佈局。">
-        """
-        
-        # Generation Call (New SDK)
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
+    return prompt
+
+def parse_llm_report(content):
+    """LLM markdown -> { score, verdict, report }"""
+    # Relaxed pattern for Score: Matches "**AI 綜合戰力**: 90" or "AI 綜合戰力: 90"
+    score_match = re.search(r'AI 綜合戰力\D*(\d+)', content)
+    score = int(score_match.group(1)) if score_match else 75
+    
+    # Relaxed pattern for Verdict
+    verdict_match = re.search(r'趨勢訊號.*?\*\*([^*]+)\*\*', content)
+    verdict = verdict_match.group(1).strip() if verdict_match else "AI 分析"
+    
+    return { "score": score, "verdict": verdict, "report": content }
+
+# --- Shared Gemini Client (one per API key, reused across requests) ---
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_gemini_client(api_key):
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = genai.Client(api_key=api_key)
+        return _clients[api_key]
+
+def gemini_model_call(api_key, model=GEMINI_MODEL):
+    """Blocking model call: prompt -> text, on the shared client"""
+    def call(prompt):
+        response = get_gemini_client(api_key).models.generate_content(
+            model=model,
             contents=prompt,
             config=types.GenerateContentConfig(
                 temperature=0.7,
             )
         )
-        content = response.text
-        
-        # Regex Extraction
-        import re
-        # Relaxed pattern for Score: Matches "**AI 綜合戰力**: 90" or "AI 綜合戰力: 90"
-        score_match = re.search(r'AI 綜合戰力\D*(\d+)', content)
-        score = int(score_match.group(1)) if score_match else 75
-        
-        # Relaxed pattern for Verdict
-        verdict_match = re.search(r'趨勢訊號.*?\*\*([^*]+)\*\*', content)
-        verdict = verdict_match.group(1).strip() if verdict_match else "AI 分析"
-        
-        time.sleep(4) # Rate Limit per user request
-        
-        return { "score": score, "verdict": verdict, "report": content }
-        
+        return response.text
+    return call
+
+def generate_llm_report(stock_data, api_key):
+    """
+    Generative AI Logic via Google Gemini (v1.0+ SDK)
+    Blocking variant. Rate limiting lives in AIReportService.
+    """
+    try:
+        content = gemini_model_call(api_key)(build_llm_prompt(stock_data))
+        return parse_llm_report(content)
     except Exception as e:
         print(f"Gemini Error: {e}")
         return generate_rule_based_report(stock_data) # Fallback
 
+def report_input_hash(stock_data):
+    """Hash of the fields the prompt actually uses (a report is stale once they change)"""
+    val = stock_data.get('valuation') or {}
+    rev = stock_data.get('revenue') or {}
+    chips = stock_data.get('chips') or {}
+    payload = {
+        "id": stock_data.get('stock_id'),
+        "name": stock_data.get('stock_name'),
+        "pe": val.get('current_pe'), "sector_pe": val.get('sector_pe'),
+        "mom": rev.get('mom'), "yoy": rev.get('yoy'),
+        "foreign": chips.get('foreign_net'), "trust": chips.get('trust_net'), "flow": chips.get('analysis'),
+        "price": val.get('price'), "technicals": stock_data.get('technicals'),
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+class AsyncTokenBucket:
+    """
+    Token bucket for coroutines. Callers reserve a token under a thread lock and
+    sleep (without holding it) until their slot, so it works across event loops.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class AIReportService:
+    """
+    Async AI report generation.
+    - model_call: prompt -> text (sync or async). Injectable; defaults to Gemini when a key is set
+    - cache: (stock_id, input_hash) -> report, with TTL and LRU bound
+    - single-flight: concurrent requests for the same key await one in-flight call
+    - token bucket replaces the old per-call time.sleep(4)
+    """
+    def __init__(self, model_call=None, rate_per_sec=0.25, burst=1, ttl=6 * 3600, max_entries=2000):
+        self.model_call = model_call
+        self.bucket = AsyncTokenBucket(rate_per_sec, burst)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "precomputed": 0, "shared": 0, "calls": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        api_key = os.getenv("GEMINI_API_KEY")
+        return cls(model_call=gemini_model_call(api_key) if api_key else None, **kwargs)
+
+    def _cache_get(self, key):
+        entry = self._cache.get(key)
+        if not entry: return None
+        expires_at, report = entry
+        if expires_at < time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return report
+
+    def _cache_put(self, key, report):
+        self._cache[key] = (time.time() + self.ttl, report)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _call_model(self, stock_data, input_hash):
+        await self.bucket.acquire()
+        prompt = build_llm_prompt(stock_data)
+        self.stats["calls"] += 1
+        if inspect.iscoroutinefunction(self.model_call) or inspect.iscoroutinefunction(getattr(self.model_call, "__call__", None)):
+            content = await self.model_call(prompt)  # async function or object with async __call__
+        else:
+            content = await asyncio.to_thread(self.model_call, prompt)
+        report = parse_llm_report(content)
+        report["input_hash"] = input_hash
+        return report
+
+    async def report(self, stock_data):
+        """Cached / precomputed / single-flight LLM report, rule-based without a model."""
+        if self.model_call is None:
+            return render_rule_report(stock_data)
+
+        input_hash = report_input_hash(stock_data)
+        pre = stock_data.get('ai_analysis')
+        if isinstance(pre, dict) and pre.get('input_hash') == input_hash:
+            self.stats["precomputed"] += 1
+            return pre
+
+        key = (stock_data.get('stock_id'), input_hash)
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.stats["shared"] += 1
+            return await asyncio.shield(task)
+
+        self.stats["misses"] += 1
+        task = asyncio.ensure_future(self._call_model(stock_data, input_hash))
+        self._inflight[key] = task
+        try:
+            report = await asyncio.shield(task)
+            self._cache_put(key, report)
+            return report
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Gemini Error: {e}")
+            return render_rule_report(stock_data) # Fallback (not cached)
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    async def precompute(self, db, top_n=50, rank_key=None):
+        """
+        Fill db[code]['ai_analysis'] for the top-N stocks (default rank: strongest
+        institutional flow). Runs through the same cache / rate limiter.
+        """
+        if self.model_call is None:
+            return 0
+        rank_key = rank_key or (lambda r: abs((r.get('chips') or {}).get('foreign_net') or 0) +
+                                          abs((r.get('chips') or {}).get('trust_net') or 0))
+        # Drop reports whose inputs changed since they were generated
+        for rec in db.values():
+            pre = rec.get('ai_analysis')
+            if pre is not None and (not isinstance(pre, dict) or pre.get('input_hash') != report_input_hash(rec)):
+                del rec['ai_analysis']
+
+        top = sorted(db.values(), key=rank_key, reverse=True)[:top_n]
+        reports = await asyncio.gather(*(self.report(rec) for rec in top))
+        filled = 0
+        for rec, rep in zip(top, reports):
+            if rep.get('input_hash'):
+                rec['ai_analysis'] = rep
+                filled += 1
+        return filled
+
 def generate_ai_report(stock_data):
     """
     Hybrid Dispatcher
@@ -169,3 +414,37 @@ def generate_ai_report(stock_data):
         return generate_llm_report(stock_data, api_key)
     else:
         return generate_rule_based_report(stock_data)
+
+if __name__ == "__main__":
+    import sys
+    # Allow `python backend/analysis.py` to import backend.* modules
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from backend.storage.columnar import BASE_DIR, load_stock_db
+
+    # python backend/analysis.py --verify [stock_data.json]
+    if "--verify" not in sys.argv:
+        raise SystemExit("Usage: python backend/analysis.py --verify [stock_data.json]")
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else os.path.join(BASE_DIR, "frontend", "public", "stock_data.json")
+    db = load_stock_db(path)
+    def per_stock():
+        for rec in db.values():
+            try: generate_rule_based_report(rec)
+            except Exception: pass
+
+    def best_ms(fn, runs=5):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - start) * 1000)
+        return min(times)
+
+    batch_ms = best_ms(lambda: score_universe(db))
+    ref_ms = best_ms(per_stock)
+    mismatches = verify_batch_scoring(db)
+    print(f"📊 {len(db)} stocks: batch {batch_ms:.1f}ms vs per-stock {ref_ms:.1f}ms")
+    for m in mismatches[:20]: print(f"   ❌ {m}")
+    if mismatches:
+        raise SystemExit(f"❌ {len(mismatches)} mismatches")
+    print("✅ Batch scoring matches generate_rule_based_report for every stock.")
@@ -0,0 +1,437 @@
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import datetime
+
+# --- Recorded Response Fixtures ---
+# One gzip file per upstream response, stored as the raw body bytes in the
+# source's own encoding (MOPS = big5, ISIN = ms950, everything else utf-8):
+#   backend/bench/fixtures/<name>.<ext>.gz + manifest.json
+# `record` captures the live responses; `synth` writes deterministic
+# stand-ins in the same schemas (full-market sized) for machines without
+# network access. The manifest says which kind each fixture is.
+#
+#   python -m backend.bench.fixtures record [--date YYYY-MM-DD]
+#   python -m backend.bench.fixtures synth
+#   python -m backend.bench.fixtures show
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Allow `python backend/bench/fixtures.py` to import backend.* modules
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST = "manifest.json"
+SEED = 20260213
+
+# name -> (file, encoding, url template). {ymd} / {roc} / {roc_y} / {roc_m} come from the record date.
+FIXTURES = {
+    "t86": ("t86.json.gz", "utf-8",
+            "https://www.twse.com.tw/rwd/zh/fund/T86?date={ymd}&selectType=ALL&response=json"),
+    "tpex_3insti": ("tpex_3insti.json.gz", "utf-8",
+                    "https://www.tpex.org.tw/web/stock/3insti/daily_trade/3itrade_hedge_result.php?l=zh-tw&o=json&se=EW&t=D&d={roc}"),
+    "mops_sii": ("mops_t21sc03_sii.html.gz", "big5",
+                 "https://mopsov.twse.com.tw/nas/t21/sii/t21sc03_{roc_y}_{roc_m}_0.html"),
+    "mops_otc": ("mops_t21sc03_otc.html.gz", "big5",
+                 "https://mopsov.twse.com.tw/nas/t21/otc/t21sc03_{roc_y}_{roc_m}_0.html"),
+    "fmtqik": ("fmtqik.json.gz", "utf-8",
+               "https://www.twse.com.tw/rwd/zh/afterTrading/FMTQIK?date={ym}01&response=json"),
+    "bfi82u": ("bfi82u.json.gz", "utf-8",
+               "https://www.twse.com.tw/rwd/zh/fund/BFI82U?date={ymd}&response=json"),
+    "bfiamu": ("bfiamu.json.gz", "utf-8",
+               "https://www.twse.com.tw/rwd/zh/afterTrading/BFIAMU?date={ymd}&response=json"),
+    "taifex_futcontracts": ("taifex_futcontracts.html.gz", "utf-8",
+                            "https://www.taifex.com.tw/cht/3/futContractsDate"),
+    "bot_xrt": ("bot_xrt.html.gz", "utf-8", "https://rate.bot.com.tw/xrt?Lang=en-US"),
+    "twse_mi_index": ("twse_mi_index.json.gz", "utf-8",
+                      "https://www.twse.com.tw/rwd/zh/afterTrading/MI_INDEX?date={ymd}&type=ALLBUT0999&response=json"),
+    "twse_bwibbu": ("twse_bwibbu.json.gz", "utf-8",
+                    "https://www.twse.com.tw/rwd/zh/afterTrading/BWIBBU_d?date={ymd}&selectType=ALL&response=json"),
+    "tpex_quotes": ("tpex_quotes.json.gz", "utf-8",
+                    "https://www.tpex.org.tw/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php?l=zh-tw&o=json&d={roc}"),
+    "tpex_pera": ("tpex_pera.json.gz", "utf-8",
+                  "https://www.tpex.org.tw/web/stock/aftertrading/peratio_analysis/pera_result.php?l=zh-tw&o=json&d={roc}"),
+    "isin_sii": ("isin_sii.html.gz", "ms950", "https://isin.twse.com.tw/isin/C_public.jsp?strMode=2"),
+    "isin_otc": ("isin_otc.html.gz", "ms950", "https://isin.twse.com.tw/isin/C_public.jsp?strMode=4"),
+}
+
+
+# --- Load ---
+
+def load_manifest(root=FIXTURES_DIR):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_bytes(name, root=FIXTURES_DIR):
+    with gzip.open(os.path.join(root, FIXTURES[name][0]), "rb") as f:
+        return f.read()
+
+
+def load_text(name, root=FIXTURES_DIR):
+    return load_bytes(name, root).decode(FIXTURES[name][1], errors="replace")
+
+
+def load_json(name, root=FIXTURES_DIR):
+    return json.loads(load_text(name, root))
+
+
+def _write(root, name, body, source, url=None):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, FIXTURES[name][0])
+    # mtime=0 keeps the gzip bytes identical across regenerations
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write(body)
+    return {"file": FIXTURES[name][0], "encoding": FIXTURES[name][1], "source": source,
+            "url": url, "bytes": len(body), "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def _save_manifest(root, manifest):
+    with open(os.path.join(root, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+# --- Record (live) ---
+
+def record(day=None, root=FIXTURES_DIR, names=None):
+    """Capture live responses for `day` (default: last weekday). Revenue pages are the previous month."""
+    import requests
+    day = day or datetime.date.today()
+    while day.weekday() >= 5:
+        day -= datetime.timedelta(days=1)
+    rev = day.replace(day=1) - datetime.timedelta(days=1)
+    params = {
+        "ymd": day.strftime("%Y%m%d"), "ym": day.strftime("%Y%m"),
+        "roc": f"{day.year - 1911}/{day.strftime('%m/%d')}",
+        "roc_y": rev.year - 1911, "roc_m": rev.month,
+    }
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
+    manifest = load_manifest(root)
+    for name in names or FIXTURES:
+        url = FIXTURES[name][2].format(**params)
+        try:
+            h = dict(headers)
+            if "tpex.org.tw" in url: h["Referer"] = "https://www.tpex.org.tw/"
+            r = requests.get(url, headers=h, timeout=30, verify=False)
+            if r.status_code != 200 or len(r.content) < 100:
+                print(f"   ⚠️ {name}: HTTP {r.status_code}, {len(r.content)} bytes. Kept the old fixture.")
+                continue
+            manifest[name] = _write(root, name, r.content, "recorded", url)
+            print(f"   ✅ {name}: {len(r.content):,} bytes")
+        except Exception as e:
+            print(f"   ⚠️ {name}: {e}. Kept the old fixture.")
+        time.sleep(1)  # Polite: these are the same hosts the ETL throttles
+    _save_manifest(root, manifest)
+    return manifest
+
+
+# --- Synthesize (offline, same schemas) ---
+
+INDUSTRIES = ["水泥工業", "食品工業", "塑膠工業", "紡織纖維", "電機機械", "電器電纜", "化學工業", "生技醫療業",
+              "鋼鐵工業", "橡膠工業", "汽車工業", "半導體業", "電腦及週邊設備業", "光電業", "通信網路業",
+              "電子零組件業", "電子通路業", "資訊服務業", "其他電子業", "建材營造業", "航運業", "觀光餐旅",
+              "金融保險業", "貿易百貨業", "油電燃氣業", "綠能環保", "數位雲端", "運動休閒", "居家生活", "其他業"]
+CURRENCIES = {"USD": "American Dollar", "HKD": "Hong Kong Dollar", "GBP": "British Pound", "AUD": "Australian Dollar",
+              "CAD": "Canadian Dollar", "SGD": "Singapore Dollar", "CHF": "Swiss Franc", "JPY": "Japanese Yen",
+              "ZAR": "South African Rand", "SEK": "Swedish Krona", "NZD": "New Zealand Dollar", "THB": "Thai Baht",
+              "PHP": "Philippine Peso", "IDR": "Indonesian Rupiah", "EUR": "Euro", "KRW": "Korean Won",
+              "VND": "Vietnamese Dong", "MYR": "Malaysian Ringgit", "CNY": "China Yuan"}
+FUTURES = ["臺股期貨", "電子期貨", "金融期貨", "小型臺指期貨", "臺灣50期貨", "股票期貨", "櫃買期貨",
+           "非金電期貨", "富櫃200期貨", "臺灣永續期貨", "半導體30期貨", "美國道瓊期貨", "美國標普500期貨",
+           "美國那斯達克100期貨", "黃金期貨"]
+IDENTITIES = ["自營商", "投信", "外資及陸資"]
+
+
+def _n(x, digits=0):
+    return f"{x:,.{digits}f}"
+
+
+def _universe(rng):
+    """Listed (TWSE) and OTC (TPEx) stocks with name / industry / price."""
+    def make(codes):
+        out = []
+        for code in codes:
+            out.append({"code": code, "name": f"公司{code}", "industry": rng.choice(INDUSTRIES),
+                        "price": round(rng.lognormvariate(3.8, 0.9), 2)})
+        return out
+    twse = make(sorted(rng.sample(range(1101, 9999), 1050)))
+    taken = {s["code"] for s in twse}
+    otc = make(sorted(rng.sample([c for c in range(1240, 9999) if c not in taken], 860)))
+    for s in twse + otc:
+        s["code"] = str(s["code"])
+    return twse, otc
+
+
+def _odd_codes(rng, n=60):
+    """ETF / warrant style codes the parsers must skip or keep as the live tables do."""
+    return [f"00{rng.randint(50, 999):03d}" for _ in range(n // 2)] + [f"0{rng.randint(30000, 89999)}" for _ in range(n // 2)]
+
+
+def _t86(rng, twse):
+    fields = ["證券代號", "證券名稱", "外陸資買進股數(不含外資自營商)", "外陸資賣出股數(不含外資自營商)",
+              "外陸資買賣超股數(不含外資自營商)", "外資自營商買進股數", "外資自營商賣出股數", "外資自營商買賣超股數",
+              "投信買進股數", "投信賣出股數", "投信買賣超股數", "自營商買賣超股數", "自營商買進股數(自行買賣)",
+              "自營商賣出股數(自行買賣)", "自營商買賣超股數(自行買賣)", "自營商買進股數(避險)", "自營商賣出股數(避險)",
+              "自營商買賣超股數(避險)", "三大法人買賣超股數"]
+    rows = []
+    for s in twse + [{"code": c, "name": "ETF"} for c in _odd_codes(rng)]:
+        fb, fs = rng.randint(0, 5_000_000), rng.randint(0, 5_000_000)
+        tb, ts = rng.randint(0, 800_000), rng.randint(0, 800_000)
+        d = rng.randint(-200_000, 200_000)
+        rows.append([s["code"], f"{s['name']:<10}", _n(fb), _n(fs), _n(fb - fs), "0", "0", "0",
+                     _n(tb), _n(ts), _n(tb - ts), _n(d), _n(max(d, 0)), _n(max(-d, 0)), _n(d), "0", "0", "0",
+                     _n(fb - fs + tb - ts + d)])
+    rng.shuffle(rows)
+    return {"stat": "OK", "date": "20260213", "title": "115年02月13日 三大法人買賣超日報",
+            "fields": fields, "data": rows, "params": {"selectType": "ALL"}, "notes": []}
+
+
+def _tpex_3insti(rng, otc):
+    fields = ["代號", "名稱", "外資及陸資(不含外資自營商)-買進股數", "外資及陸資(不含外資自營商)-賣出股數",
+              "外資及陸資(不含外資自營商)-買賣超股數", "外資自營商-買進股數", "外資自營商-賣出股數", "外資自營商-買賣超股數",
+              "外資及陸資-買進股數", "外資及陸資-賣出股數", "外資及陸資-買賣超股數", "投信-買進股數", "投信-賣出股數",
+              "投信-買賣超股數", "自營商(自行買賣)-買進股數", "自營商(自行買賣)-賣出股數", "自營商(自行買賣)-買賣超股數",
+              "自營商(避險)-買進股數", "自營商(避險)-賣出股數", "自營商(避險)-買賣超股數", "自營商-買進股數",
+              "自營商-賣出股數", "自營商-買賣超股數", "三大法人買賣超股數合計"]
+    rows = []
+    for s in otc:
+        fb, fs = rng.randint(0, 2_000_000), rng.randint(0, 2_000_000)
+        tb, ts = rng.randint(0, 300_000), rng.randint(0, 300_000)
+        rows.append([s["code"], s["name"], _n(fb), _n(fs), _n(fb - fs), "0", "0", "0", _n(fb), _n(fs), _n(fb - fs),
+                     _n(tb), _n(ts), _n(tb - ts)] + ["0"] * 9 + [_n(fb - fs + tb - ts)])
+    return {"date": "20260213", "tables": [{"title": "三大法人買賣明細資訊", "date": "115/02/13",
+                                            "fields": fields, "data": rows, "totalCount": len(rows)}],
+            "stat": "ok"}
+
+
+def _mops_page(rng, stocks, market_label):
+    """t21sc03 layout: one table per industry, 2 header rows, 11 columns, 合計 row."""
+    parts = [f"<html><head><meta charset='big5'><title>{market_label}公司每月營業收入彙總表</title></head><body>"
+             "<center><table border=0 width=100%><tr><td>本資料由各公司申報</td></tr></table>"]
+    by_ind = {}
+    for s in stocks:
+        by_ind.setdefault(s["industry"], []).append(s)
+    for ind, members in by_ind.items():
+        parts.append(f"<table class='hasBorder' border=1 width=100%><tr><th class='tt' colspan=11>產業別：{ind}</th></tr>"
+                     "<tr><th>公司代號</th><th>公司名稱</th><th>當月營收</th><th>上月營收</th><th>去年當月營收</th>"
+                     "<th>上月比較增減(%)</th><th>去年同月增減(%)</th><th>當月累計營收</th><th>去年累計營收</th>"
+                     "<th>前期比較增減(%)</th><th>備註</th></tr>")
+        total = 0
+        for s in members:
+            rev = rng.randint(5_000, 80_000_000)
+            prev, last = rev * rng.uniform(0.7, 1.3), rev * rng.uniform(0.5, 1.6)
+            total += rev
+            remark = "-" if rng.random() < 0.9 else "因應客戶需求增加"
+            parts.append(f"<tr align=right><td align=center>{s['code']}</td><td align=left>{s['name']}</td>"
+                         f"<td>{_n(rev)}</td><td>{_n(prev)}</td><td>{_n(last)}</td>"
+                         f"<td>{(rev / prev - 1) * 100:.2f}</td><td>{(rev / last - 1) * 100:.2f}</td>"
+                         f"<td>{_n(rev * 2)}</td><td>{_n(last * 2)}</td><td>{(rev / last - 1) * 100:.2f}</td>"
+                         f"<td align=left>{remark}</td></tr>")
+        parts.append(f"<tr><th>合計</th><th></th><th>{_n(total)}</th>" + "<th>-</th>" * 8 + "</tr></table><br>")
+    parts.append("</center></body></html>")
+    return "".join(parts)
+
+
+def _fmtqik(rng):
+    rows, level = [], 23000.0
+    day = datetime.date(2026, 2, 2)
+    while len(rows) < 20:
+        if day.weekday() < 5:
+            change = rng.uniform(-300, 300)
+            level += change
+            rows.append([f"{day.year - 1911}/{day:%m/%d}", _n(rng.randint(4, 9) * 10**9), _n(rng.randint(2, 6) * 10**11),
+                         _n(rng.randint(2, 4) * 10**6), _n(level, 2), _n(change, 2)])
+        day += datetime.timedelta(days=1)
+    return {"stat": "OK", "date": "20260201", "title": "115年02月 市場成交資訊",
+            "fields": ["日期", "成交股數", "成交金額", "成交筆數", "發行量加權股價指數", "漲跌點數"],
+            "data": rows, "notes": []}
+
+
+def _bfi82u(rng):
+    names = ["自營商(自行買賣)", "自營商(避險)", "投信", "外資及陸資(不含外資自營商)", "外資自營商", "合計"]
+    rows, tb, ts = [], 0, 0
+    for name in names[:-1]:
+        b, s = rng.randint(10**9, 3 * 10**11), rng.randint(10**9, 3 * 10**11)
+        tb, ts = tb + b, ts + s
+        rows.append([name, _n(b), _n(s), _n(b - s)])
+    rows.append([names[-1], _n(tb), _n(ts), _n(tb - ts)])
+    return {"stat": "OK", "date": "20260213", "title": "115年02月13日 三大法人買賣金額統計表",
+            "fields": ["單位名稱", "買進金額", "賣出金額", "買賣差額"], "data": rows, "notes": []}
+
+
+def _bfiamu(rng):
+    index_rows = ["發行量加權股價指數", "未含金融保險股指數", "未含電子股指數", "未含金融電子股指數"]
+    sectors = [f"{i.replace('工業', '').replace('業', '')}類指數" for i in INDUSTRIES]
+    rows = []
+    for name in index_rows + sectors:
+        rows.append([name, _n(rng.randint(10**6, 2 * 10**9)), _n(rng.randint(10**8, 2 * 10**11)),
+                     _n(rng.randint(10**3, 10**6)), _n(rng.uniform(-3, 3), 2)])
+    return {"stat": "OK", "date": "20260213", "title": "115年02月13日 各類指數日成交量值",
+            "fields": ["分類指數名稱", "成交股數", "成交金額", "成交筆數", "漲跌指數"], "data": rows, "notes": []}
+
+
+def _taifex(rng):
+    """futContractsDate: 3 header rows, 商品名稱 spans its 3 身份別 rows (rowspan), 15 columns."""
+    parts = ["<html><head><meta charset='utf-8'><title>期貨契約</title></head><body>",
+             "<div class='section'>" + "<p>本資料僅供參考</p>" * 40 + "</div>",
+             "<table class='table_f' width='100%'>",
+             "<tr><th rowspan=3>序號</th><th rowspan=3>商品名稱</th><th rowspan=3>身份別</th>"
+             "<th colspan=6>交易口數與契約金額</th><th colspan=6>未平倉餘額</th></tr>",
+             "<tr>" + "<th colspan=2>多方</th><th colspan=2>空方</th><th colspan=2>多空淨額</th>" * 2 + "</tr>",
+             "<tr>" + "<th>口數</th><th>契約金額</th>" * 6 + "</tr>"]
+    for i, product in enumerate(FUTURES, 1):
+        for j, who in enumerate(IDENTITIES):
+            cells = []
+            for _ in range(2):
+                lb, sb = rng.randint(0, 90_000), rng.randint(0, 90_000)
+                cells += [_n(lb), _n(lb * 4321), _n(sb), _n(sb * 4321), _n(lb - sb), _n((lb - sb) * 4321)]
+            head = f"<td rowspan=3>{i}</td><td rowspan=3>{product}</td>" if j == 0 else ""
+            parts.append(f"<tr>{head}<td>{who}</td>" + "".join(f"<td align=right>{c}</td>" for c in cells) + "</tr>")
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+
+def _bot_xrt(rng):
+    parts = ["<!DOCTYPE html><html lang='en-US'><head><title>Bank of Taiwan - Exchange Rate</title>",
+             "<script>" + "var cfg = {a: 1, b: 2};" * 400 + "</script></head><body>",
+             "<nav>" + "<a href='#'>Link</a>" * 300 + "</nav>",
+             "<table title='Exchange Rate' class='table table-striped table-bordered table-condensed table-hover'><tbody>"]
+    for cur, label in CURRENCIES.items():
+        base = rng.uniform(30, 33) if cur == "USD" else rng.uniform(0.001, 45)
+        parts.append(
+            f"<tr><td data-table='Currency' class='currency phone-small-font'><div class='hidden-phone print_show xrt-cur-indent'>"
+            f"{label} ({cur})</div></td>"
+            f"<td data-table='Cash Buying' class='rate-content-cash text-right print_hide'>{base * 0.98:.3f}</td>"
+            f"<td data-table='Cash Selling' class='rate-content-cash text-right print_hide'>{base * 1.02:.3f}</td>"
+            f"<td data-table=\"Spot Buying\" class=\"rate-content-sight text-right print_hide\">{base * 0.995:.4f}</td>"
+            f"<td data-table=\"Spot Selling\" class=\"rate-content-sight text-right print_width\" data-hide=\"phone\">{base:.4f}</td></tr>")
+    parts.append("</tbody></table><footer>" + "<p>Rates are for reference only.</p>" * 100 + "</footer></body></html>")
+    return "".join(parts)
+
+
+def _mi_index(rng, twse):
+    fields = ["證券代號", "證券名稱", "成交股數", "成交筆數", "成交金額", "開盤價", "最高價", "最低價", "收盤價",
+              "漲跌(+/-)", "漲跌價差", "最後揭示買價", "最後揭示買量", "最後揭示賣價", "最後揭示賣量", "本益比"]
+    rows = []
+    for s in twse + [{"code": c, "name": "ETF", "price": 30.0} for c in _odd_codes(rng, 120)]:
+        p = s["price"]
+        if rng.random() < 0.01:  # 停牌 / 無成交
+            rows.append([s["code"], s["name"], "0", "0", "0", "--", "--", "--", "--", "", "0.00", "", "", "", "", "0.00"])
+            continue
+        vol = rng.randint(1_000, 50_000_000)
+        rows.append([s["code"], s["name"], _n(vol), _n(vol // 1000 + 1), _n(vol * p), _n(p * 0.99, 2), _n(p * 1.02, 2),
+                     _n(p * 0.98, 2), _n(p, 2), "<p style= color:red>+</p>", f"{p * 0.01:.2f}", _n(p * 0.999, 2),
+                     _n(rng.randint(1, 500)), _n(p * 1.001, 2), _n(rng.randint(1, 500)),
+                     f"{rng.uniform(5, 60):.2f}" if rng.random() < 0.8 else "0.00"])
+    index_table = {"title": "價格指數(臺灣證券交易所)", "fields": ["指數", "收盤指數", "漲跌(+/-)", "漲跌點數", "漲跌百分比(%)", "特殊處理註記"],
+                   "data": [[f"指數{i}", "1,000.00", "+", "1.00", "0.10", ""] for i in range(80)]}
+    return {"stat": "OK", "date": "20260213",
+            "tables": [index_table, {"title": "漲跌證券數合計", "fields": ["類型", "整體市場"], "data": [["上漲", "500"]]},
+                       {"title": "115年02月13日每日收盤行情(全部(不含權證、牛熊證))", "fields": fields, "data": rows}]}
+
+
+def _bwibbu(rng, twse):
+    rows = []
+    for s in twse:
+        pe = f"{rng.uniform(5, 80):.2f}" if rng.random() < 0.85 else "-"
+        rows.append([s["code"], s["name"], f"{rng.uniform(0, 9):.2f}", "114", pe, f"{rng.uniform(0.4, 8):.2f}", "114/3"])
+    return {"stat": "OK", "date": "20260213", "title": "115年02月13日 個股日本益比、殖利率及股價淨值比",
+            "fields": ["證券代號", "證券名稱", "殖利率(%)", "股利年度", "本益比", "股價淨值比", "財報年/季"], "data": rows}
+
+
+def _tpex_quotes(rng, otc):
+    fields = ["代號", "名稱", "收盤", "漲跌", "開盤", "最高", "最低", "均價", "成交股數", "成交金額(元)", "成交筆數",
+              "最後買價", "最後買量(千股)", "最後賣價", "最後賣量(千股)", "發行股數", "次日參考價", "次日漲停價", "次日跌停價"]
+    rows = []
+    for s in otc:
+        p = s["price"]
+        rows.append([s["code"], s["name"], f"{p:.2f}", "+0.50", f"{p * 0.99:.2f}", f"{p * 1.02:.2f}", f"{p * 0.98:.2f}",
+                     f"{p:.2f}", _n(rng.randint(1_000, 9_000_000)), _n(rng.randint(10**5, 10**9)), _n(rng.randint(1, 9000)),
+                     f"{p:.2f}", "1", f"{p:.2f}", "1", _n(rng.randint(10**7, 10**9)), f"{p:.2f}", f"{p * 1.1:.2f}", f"{p * 0.9:.2f}"])
+    return {"date": "20260213", "tables": [{"title": "上櫃股票行情", "date": "115/02/13", "fields": fields, "data": rows,
+                                            "totalCount": len(rows)}], "stat": "ok"}
+
+
+def _tpex_pera(rng, otc):
+    rows = []
+    for s in otc:
+        pe = f"{rng.uniform(5, 90):.2f}" if rng.random() < 0.75 else "N/A"
+        rows.append([s["code"], s["name"], pe, f"{rng.uniform(0, 5):.2f}", "114", f"{rng.uniform(0, 9):.2f}", f"{rng.uniform(0.4, 9):.2f}"])
+    return {"date": "20260213", "tables": [{"title": "個股本益比、殖利率、股價淨值比",
+                                            "fields": ["股票代號", "名稱", "本益比", "每股股利", "股利年度", "殖利率(%)", "股價淨值比"],
+                                            "data": rows}], "stat": "ok"}
+
+
+def _isin(rng, stocks, market):
+    parts = ["<html><head><meta http-equiv='Content-Type' content='text/html; charset=MS950'></head><body>",
+             "<table class='h4' align=center cellSpacing=3 cellPadding=2 width=750 border=0>",
+             "<tr align=center><td bgcolor=#D5FFD5>有價證券代號及名稱 </td><td bgcolor=#D5FFD5>國際證券辨識號碼(ISIN Code)</td>"
+             "<td bgcolor=#D5FFD5>上市日</td><td bgcolor=#D5FFD5>市場別</td><td bgcolor=#D5FFD5>產業別</td>"
+             "<td bgcolor=#D5FFD5>CFICode</td><td bgcolor=#D5FFD5>備註</td></tr>",
+             "<tr><td bgcolor=#FAFAD2 colspan=7 ><B> 股票 <B> </td></tr>"]
+    for s in stocks:
+        parts.append(f"<tr><td bgcolor=#FAFAD2>{s['code']}　{s['name']}</td><td bgcolor=#FAFAD2>TW000{s['code']}003</td>"
+                     f"<td bgcolor=#FAFAD2>1990/01/01</td><td bgcolor=#FAFAD2>{market}</td>"
+                     f"<td bgcolor=#FAFAD2>{s['industry']}</td><td bgcolor=#FAFAD2>ESVUFR</td><td bgcolor=#FAFAD2></td></tr>")
+    parts.append("<tr><td bgcolor=#FAFAD2 colspan=7 ><B> 上市認購(售)權證 <B> </td></tr>")
+    for i in range(300):
+        parts.append(f"<tr><td bgcolor=#FAFAD2>0{30000 + i}　權證{i}</td><td bgcolor=#FAFAD2>TW000{30000 + i}</td>"
+                     f"<td bgcolor=#FAFAD2>2025/12/01</td><td bgcolor=#FAFAD2>{market}</td><td bgcolor=#FAFAD2></td>"
+                     "<td bgcolor=#FAFAD2>RWSCCA</td><td bgcolor=#FAFAD2></td></tr>")
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+
+def synthesize(root=FIXTURES_DIR):
+    """Deterministic full-market stand-ins (same universe across every fixture)."""
+    rng = random.Random(SEED)
+    twse, otc = _universe(rng)
+    bodies = {
+        "t86": json.dumps(_t86(rng, twse), ensure_ascii=False),
+        "tpex_3insti": json.dumps(_tpex_3insti(rng, otc), ensure_ascii=False),
+        "mops_sii": _mops_page(rng, twse, "上市"),
+        "mops_otc": _mops_page(rng, otc, "上櫃"),
+        "fmtqik": json.dumps(_fmtqik(rng), ensure_ascii=False),
+        "bfi82u": json.dumps(_bfi82u(rng), ensure_ascii=False),
+        "bfiamu": json.dumps(_bfiamu(rng), ensure_ascii=False),
+        "taifex_futcontracts": _taifex(rng),
+        "bot_xrt": _bot_xrt(rng),
+        "twse_mi_index": json.dumps(_mi_index(rng, twse), ensure_ascii=False),
+        "twse_bwibbu": json.dumps(_bwibbu(rng, twse), ensure_ascii=False),
+        "tpex_quotes": json.dumps(_tpex_quotes(rng, otc), ensure_ascii=False),
+        "tpex_pera": json.dumps(_tpex_pera(rng, otc), ensure_ascii=False),
+        "isin_sii": _isin(rng, twse, "上市"),
+        "isin_otc": _isin(rng, otc, "上櫃"),
+    }
+    manifest = {}
+    for name, text in bodies.items():
+        manifest[name] = _write(root, name, text.encode(FIXTURES[name][1]), "synthetic")
+        manifest[name]["recorded_at"] = None  # Reproducible from SEED
+    _save_manifest(root, manifest)
+    print(f"✅ {len(manifest)} synthetic fixtures written to {root} ({len(twse)} TWSE + {len(otc)} TPEx stocks)")
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark response fixtures")
+    parser.add_argument("action", choices=["record", "synth", "show"])
+    parser.add_argument("--date", help="trading day to record (YYYY-MM-DD)")
+    parser.add_argument("--only", help="comma-separated fixture names")
+    parser.add_argument("--root", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    if args.action == "record":
+        day = datetime.date.fromisoformat(args.date) if args.date else None
+        record(day, args.root, args.only.split(",") if args.only else None)
+    elif args.action == "synth":
+        synthesize(args.root)
+    else:
+        for name, info in sorted(load_manifest(args.root).items()):
+            print(f"   {name:<22} {info['source']:<10} {info['bytes']:>10,} bytes  {info.get('url') or ''}")
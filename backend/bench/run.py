@@ -0,0 +1,353 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import random
+import platform
+import tempfile
+import subprocess
+import statistics
+
+# --- Offline Benchmark Suite ---
+# Times, on the recorded fixtures (backend/bench/fixtures.py), with no network:
+#   parse.*        every scraper parser, raw response body -> parsed result
+#   etl.*          data_updater merge / rule scoring / store + JSON + shard writes
+#   snapshot.load  cold API snapshot load (columnar store + search / screener indexes)
+#   api.dashboard  /api/stock/{query}/dashboard under concurrent load (in-process ASGI client)
+# Each case runs once to warm up, then `repeat` times; the median is what gets compared.
+#
+#   python -m backend.bench.run                      print results
+#   python -m backend.bench.run --save-baseline      store data/bench/baseline.json
+#   python -m backend.bench.run --check              exit 1 if any case regressed past the threshold
+#   python -m backend.bench.run --only parse,api --repeat 15 --save
+#   python -m backend.bench.run compare A.json B.json
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Allow `python backend/bench/run.py` to import backend.* modules
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from backend.bench import fixtures as fx
+
+BENCH_DIR = os.path.join(BASE_DIR, "data", "bench")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_REPEAT = 7
+DEFAULT_THRESHOLD = 0.25   # +25% median = regression
+NOISE_FLOOR_MS = 1.0       # Differences below this are timer noise, never a regression
+API_REQUESTS = 400
+API_CONCURRENCY = 16
+REVENUE_MONTHS = 12
+
+
+def _stats(samples):
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "runs": len(samples),
+    }
+
+
+def _time(fn, repeat, setup=None):
+    """Warm-up + `repeat` timed calls. setup() (untimed) returns fn's args for each call."""
+    samples = []
+    for i in range(repeat + 1):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i: samples.append(elapsed)
+    return _stats(samples)
+
+
+# --- Parsers ---
+
+def parser_cases():
+    """name -> zero-arg callable (body loaded up front, decode + parse timed)."""
+    from backend.scrapers import chips, macro, mops, twse
+    from backend.scrapers import quotes as bulk
+
+    def table(name, required, positions=None):
+        body = fx.load_text(name)
+        def run():
+            fields, rows = bulk.find_table(json.loads(body), required=required)
+            return bulk.parse_quote_table(fields, rows, positions)
+        return run
+
+    def js(name, parse):
+        body = fx.load_text(name)
+        return lambda: parse(json.loads(body))
+
+    def html(name, parse):
+        body = fx.load_text(name)
+        return lambda: parse(body)
+
+    isin = fx.load_bytes("isin_sii")
+    return {
+        "parse.t86": js("t86", chips.parse_t86),
+        "parse.tpex_3insti": js("tpex_3insti", chips.parse_tpex_3insti),
+        "parse.mops_t21sc03": html("mops_sii", mops.parse_t21sc03_page),
+        "parse.fmtqik": js("fmtqik", macro.parse_fmtqik),
+        "parse.bfi82u": js("bfi82u", macro.parse_bfi82u),
+        "parse.bfiamu": js("bfiamu", macro.parse_bfiamu),
+        "parse.taifex_futcontracts": html("taifex_futcontracts", macro.parse_futures_oi),
+        "parse.bot_rates": html("bot_xrt", macro.parse_bot_usd),
+        "parse.twse_mi_index": table("twse_mi_index", ("證券代號", "收盤價")),
+        "parse.twse_bwibbu": table("twse_bwibbu", ("證券代號", "本益比")),
+        "parse.tpex_quotes": table("tpex_quotes", ("代號", "收盤"), bulk.TPEX_QUOTES_POSITIONS),
+        "parse.tpex_pera": table("tpex_pera", ("代號", "本益比"), bulk.TPEX_VALUATION_POSITIONS),
+        "parse.isin": lambda: twse.parse_isin_page(twse.decode_isin_page(isin)),
+    }
+
+
+# --- ETL inputs (everything data_updater.main has in hand before the merge) ---
+
+def etl_inputs():
+    import pandas as pd
+    from backend import data_updater as du
+    from backend.scrapers import chips, mops, twse
+    from backend.scrapers import quotes as bulk
+
+    full_chips = chips.parse_t86(fx.load_json("t86"))
+    full_chips.update(chips.parse_tpex_3insti(fx.load_json("tpex_3insti")))
+    target_stocks = [c for c in full_chips if len(c) == 4]
+
+    def frame(quote_name, quote_req, val_name, val_req, market, qpos=None, vpos=None):
+        f, r = bulk.find_table(fx.load_json(quote_name), required=quote_req)
+        q = bulk.parse_quote_table(f, r, qpos)
+        f, r = bulk.find_table(fx.load_json(val_name), required=val_req)
+        return bulk.merge_quote_frames(q, bulk.parse_quote_table(f, r, vpos), market)
+
+    quotes = du.quotes_from_frame(frame("twse_mi_index", ("證券代號", "收盤價"), "twse_bwibbu", ("證券代號", "本益比"), "TWSE"))
+    quotes.update(du.quotes_from_frame(frame("tpex_quotes", ("代號", "收盤"), "tpex_pera", ("代號", "本益比"), "TPEx",
+                                             bulk.TPEX_QUOTES_POSITIONS, bulk.TPEX_VALUATION_POSITIONS)))
+    industry = twse.parse_isin_page(twse.decode_isin_page(fx.load_bytes("isin_sii")))
+    industry.update(twse.parse_isin_page(twse.decode_isin_page(fx.load_bytes("isin_otc"))))
+    du.attach_sector_pe(quotes, industry)
+
+    # One recorded month per market, spread over a year (newest first, sii before otc, as fetched)
+    pages = [mops.parse_t21sc03_page(fx.load_text(n)) for n in ("mops_sii", "mops_otc")]
+    frames = []
+    for i in range(REVENUE_MONTHS):
+        month = (pd.Period("2026-01", "M") - i).strftime("%Y-%m")
+        for df in pages:
+            frames.append(df.assign(revenue=df["revenue"] * (1 - 0.01 * i), month=month))
+    rev_frame = pd.concat(frames, ignore_index=True).set_index(["code", "month"])[["revenue", "yoy"]]
+    revenue_history, revenue_stats = du.revenue_frame_to_maps(rev_frame)
+    return full_chips, target_stocks, quotes, revenue_history, revenue_stats
+
+
+def etl_cases(workdir, repeat):
+    from backend import data_updater as du
+    from backend.analysis import score_universe
+
+    full_chips, target, quotes, rev_hist, rev_stats = etl_inputs()
+    merge = lambda: du.merge_records({}, target, quotes, rev_hist, rev_stats, full_chips)
+    db = merge()
+
+    def rules():
+        scores = score_universe(db)
+        for code, rec in db.items():
+            if code in scores: rec["rule_analysis"] = scores[code]
+    rules()
+
+    def fresh_out():
+        out = os.path.join(workdir, "write")
+        shutil.rmtree(out, ignore_errors=True)
+        os.makedirs(out)
+        return (out,)
+
+    def write(out):
+        du.write_outputs(db, os.path.join(out, "data", "stock_store"), os.path.join(out, "stock_data.json"),
+                         os.path.join(out, "stocks"))
+
+    results = {
+        "etl.merge": _time(merge, repeat),
+        "etl.rules": _time(rules, repeat),
+        "etl.write": _time(write, repeat, setup=fresh_out),
+    }
+    results["etl.merge"]["stocks"] = len(db)
+
+    # The snapshot the API benchmarks serve
+    snap = os.path.join(workdir, "snapshot")
+    os.makedirs(snap, exist_ok=True)
+    write(snap)
+    return results, snap
+
+
+# --- Snapshot + API ---
+
+def snapshot_cases(snap, repeat):
+    from backend.data_store import DataStore
+
+    def load():
+        store = DataStore(os.path.join(snap, "stock_data.json"), os.path.join(snap, "macro_data.json"),
+                          os.path.join(snap, "global_data.json"), store_dir=os.path.join(snap, "data", "stock_store"))
+        return store.stock.get()
+    result = _time(load, repeat)
+    result["stocks"] = len(load().data)
+    return {"snapshot.load": result}
+
+
+def api_cases(snap, repeat, requests=API_REQUESTS, concurrency=API_CONCURRENCY):
+    """Concurrent dashboard requests through httpx's in-process ASGI transport."""
+    import httpx
+
+    os.environ.pop("GEMINI_API_KEY", None)  # Offline: reports fall back to the precomputed rules
+    cwd = os.getcwd()
+    os.chdir(snap)  # backend.main resolves its data files relative to the working directory
+    try:
+        from backend import main
+        codes = list(main.DATA.stock.get().data)
+        rng = random.Random(fx.SEED)
+        queries = [rng.choice(codes) for _ in range(requests)]
+        latencies = []
+
+        async def batch():
+            sem = asyncio.Semaphore(concurrency)
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                async def one(q):
+                    async with sem:
+                        start = time.perf_counter()
+                        r = await client.get(f"/api/stock/{q}/dashboard")
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        if r.status_code != 200:
+                            raise RuntimeError(f"dashboard {q}: HTTP {r.status_code}")
+                await asyncio.gather(*(one(q) for q in queries))
+
+        result = _time(lambda: asyncio.run(batch()), repeat)
+        latencies.sort()
+        result.update({
+            "requests": requests, "concurrency": concurrency,
+            "rps": round(requests / (result["median_ms"] / 1000), 1),
+            "p50_ms": round(latencies[len(latencies) // 2], 3),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+        })
+        return {"api.dashboard": result}
+    finally:
+        os.chdir(cwd)
+
+
+# --- Run / compare ---
+
+GROUPS = ("parse", "etl", "snapshot", "api")
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run(only=None, repeat=DEFAULT_REPEAT):
+    groups = [g for g in GROUPS if not only or g in only]
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="market_radar_bench_")
+    try:
+        if "parse" in groups:
+            for name, fn in parser_cases().items():
+                results[name] = _time(fn, repeat)
+                print(f"   ⏱️ {name:<28} {results[name]['median_ms']:9.3f} ms")
+        if {"etl", "snapshot", "api"} & set(groups):
+            etl, snap = etl_cases(workdir, repeat)
+            if "etl" in groups:
+                results.update(etl)
+            if "snapshot" in groups:
+                results.update(snapshot_cases(snap, repeat))
+            if "api" in groups:
+                results.update(api_cases(snap, repeat))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    manifest = fx.load_manifest()
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "fixtures": sorted({info["source"] for info in manifest.values()}),
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Rows of (name, base_ms, now_ms, change, regressed) for cases present in both."""
+    rows = []
+    for name, now in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base: continue
+        b, n = base["median_ms"], now["median_ms"]
+        change = (n - b) / b if b > 0 else 0.0
+        regressed = change > threshold and (n - b) > NOISE_FLOOR_MS
+        rows.append((name, b, n, change, regressed))
+    return rows
+
+
+def print_comparison(rows, baseline, threshold):
+    print(f"📊 vs baseline {baseline.get('commit')} ({baseline.get('created_at')}), threshold +{threshold:.0%}")
+    for name, b, n, change, regressed in rows:
+        mark = "❌" if regressed else ("🟢" if change < -threshold else "  ")
+        print(f"   {mark} {name:<28} {b:9.3f} -> {n:9.3f} ms  {change:+7.1%}")
+    return [r for r in rows if r[4]]
+
+
+def _save(report, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Saved {path}")
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline benchmarks on recorded fixtures")
+    parser.add_argument("action", nargs="?", default="run", choices=["run", "compare"])
+    parser.add_argument("files", nargs="*", help="compare: BASELINE.json CURRENT.json")
+    parser.add_argument("--only", help=f"comma-separated groups: {','.join(GROUPS)}")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save", action="store_true", help="write data/bench/<time>-<commit>.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail on regressions vs the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.action == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs BASELINE.json CURRENT.json")
+        baseline, current = _load(args.files[0]), _load(args.files[1])
+        sys.exit(1 if print_comparison(compare(current, baseline, args.threshold), baseline, args.threshold) else 0)
+
+    print(f"🏁 Benchmarks (fixtures: {', '.join(sorted({i['source'] for i in fx.load_manifest().values()})) or 'missing'})")
+    report = run(args.only.split(",") if args.only else None, args.repeat)
+    for name, r in report["results"].items():
+        if not name.startswith("parse."):
+            extra = {k: v for k, v in r.items() if k not in ("median_ms", "min_ms", "mean_ms", "runs")}
+            print(f"   ⏱️ {name:<28} {r['median_ms']:9.3f} ms  {extra or ''}")
+    if args.save:
+        _save(report, os.path.join(BENCH_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'nogit'}.json"))
+    if args.save_baseline:
+        _save(report, args.baseline)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"❌ No baseline at {args.baseline} (run with --save-baseline first)")
+            sys.exit(2)
+        regressions = print_comparison(compare(report, _load(args.baseline), args.threshold),
+                                       _load(args.baseline), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s): {', '.join(r[0] for r in regressions)}")
+            sys.exit(1)
+        print("✅ No regressions.")
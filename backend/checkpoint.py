@@ -0,0 +1,138 @@
+import os
+import gzip
+import json
+import time
+import pickle
+import shutil
+import datetime
+import threading
+
+# --- ETL Checkpoint Journal ---
+# data/checkpoints/<job>/
+#   journal.jsonl    header line (session day) + one line per completed step
+#   <step>.pkl.gz    the step's result (DataFrames / dicts as returned by the fetcher)
+# Every completed stage and yfinance batch is written (tmp file + rename, then the
+# journal line is fsynced), so a run that dies half way can continue with --resume.
+# A journal only resumes within the same day: yesterday's chips are not today's.
+# commit() runs after all outputs are written and removes the journal.
+#
+# The OHLCV and flow stores are already incremental (stored days are skipped), so
+# they need no checkpoint of their own.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKPOINT_DIR = os.getenv("MARKET_RADAR_CHECKPOINT_DIR", os.path.join(BASE_DIR, "data", "checkpoints"))
+JOURNAL_FILE = "journal.jsonl"
+
+
+def _is_empty(result):
+    """Failed fetchers return {} / empty frames: never checkpoint those, retry them on resume."""
+    if result is None:
+        return True
+    if isinstance(result, tuple):
+        return all(_is_empty(r) for r in result)
+    try:
+        return len(result) == 0
+    except TypeError:
+        return False
+
+
+class Journal:
+    def __init__(self, job, root=None, resume=False, today=None):
+        self.job = job
+        self.dir = os.path.join(root or CHECKPOINT_DIR, job)
+        self.session = (today or datetime.date.today()).isoformat()
+        self.done = {}
+        self.resumed = 0
+        self._lock = threading.Lock()
+
+        header = self._read() if resume else None
+        if header is None or header.get("session") != self.session:
+            if resume:
+                reason = "no journal" if header is None else f"journal is from {header.get('session')}"
+                print(f"   ⚠️ Nothing to resume ({reason}). Starting fresh.")
+            self._reset()
+        else:
+            print(f"♻️ Resuming {job} from checkpoint ({len(self.done)} steps done)")
+
+    def _path(self, step):
+        return os.path.join(self.dir, f"{step}.pkl.gz")
+
+    def _read(self):
+        """Header dict (and self.done filled) or None when there is no usable journal."""
+        path = os.path.join(self.dir, JOURNAL_FILE)
+        if not os.path.exists(path):
+            return None
+        header = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue  # Torn last line from a crash
+                if "session" in entry:
+                    header = entry
+                elif entry.get("step") and os.path.exists(self._path(entry["step"])):
+                    self.done[entry["step"]] = entry
+        return header
+
+    def _reset(self):
+        self.done = {}
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+        self._append({"session": self.session, "job": self.job, "started_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+    def _append(self, entry):
+        with self._lock, open(os.path.join(self.dir, JOURNAL_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get(self, step):
+        """(True, result) when the step is checkpointed, else (False, None)."""
+        if step not in self.done:
+            return False, None
+        try:
+            with gzip.open(self._path(step), "rb") as f:
+                result = pickle.load(f)
+        except Exception as e:
+            print(f"   ⚠️ Checkpoint '{step}' unreadable ({e}), fetching again")
+            return False, None
+        with self._lock:
+            self.resumed += 1
+        return True, result
+
+    def put(self, step, result):
+        if _is_empty(result):
+            return
+        path = self._path(step)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp, "wb", compresslevel=1) as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"   ⚠️ Checkpoint '{step}' not saved: {e}")
+            return
+        entry = {"step": step, "at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self._append(entry)
+        with self._lock:
+            self.done[step] = entry
+
+    def step(self, name, fn, quiet=False, valid=None):
+        """
+        Checkpointed fn(): the stored result when resuming, else run it and store it.
+        valid(result) -> False marks a failed step whose result is returned but not stored.
+        """
+        found, result = self.get(name)
+        if found:
+            if not quiet: print(f"   ♻️ '{name}' restored from checkpoint")
+            return result
+        result = fn()
+        if valid is None or valid(result):
+            self.put(name, result)
+        return result
+
+    def wrap(self, name, fn):
+        return lambda: self.step(name, fn)
+
+    def commit(self):
+        """Outputs are written: the journal has nothing left to resume."""
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+from backend.storage.columnar import STORE_DIR, load_stock_db
+from backend.search_index import SearchIndex
+from backend.screener import ScreenerIndex
+
+
+def _sig(path):
+    """(mtime_ns, size) of a file, or None when missing."""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Snapshot:
+    """
+    Immutable view of one dataset: the parsed data, the file signature it came
+    from, and any derived structures (indexes) built alongside it.
+    """
+
+    def __init__(self, data, sig, loaded_at, derived=None):
+        self.data = data
+        self.sig = sig
+        self.loaded_at = loaded_at
+        self.derived = derived or {}
+
+
+class DataFile:
+    """
+    A dataset loaded once and kept in memory.
+    get() stats the watched files (at most every `check_interval` seconds) and,
+    when mtime/size changed, loads a new Snapshot and swaps it in atomically.
+    Readers holding the old snapshot keep a consistent view.
+    """
+
+    def __init__(self, name, paths, loader, default=None, check_interval=1.0, derive=None):
+        self.name = name
+        self.paths = list(paths)
+        self.loader = loader
+        self.derive = derive  # data -> {name: structure}, rebuilt on every reload
+        self.default = default
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_reload_ms = 0.0
+        self._snapshot = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _current_sig(self):
+        return tuple(_sig(p) for p in self.paths)
+
+    def get(self):
+        snap = self._snapshot
+        now = time.monotonic()
+        if snap is not None and now - self._last_check < self.check_interval:
+            return snap
+        self._last_check = now
+        sig = self._current_sig()
+        if snap is not None and snap.sig == sig:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if snap is not None and snap.sig == sig:
+                return snap
+            start = time.perf_counter()
+            try:
+                data = self.loader()
+                derived = self.derive(data) if self.derive else {}
+            except Exception as e:
+                self.reload_errors += 1
+                print(f"⚠️ [{self.name}] Reload failed: {e}")
+                if snap is not None:
+                    return snap
+                data = self.default
+                derived = self.derive(data) if self.derive and data is not None else {}
+            self._snapshot = Snapshot(data, sig, time.time(), derived)
+            self.reloads += 1
+            self.last_reload_ms = (time.perf_counter() - start) * 1000
+            print(f"🔄 [{self.name}] Loaded snapshot in {self.last_reload_ms:.1f}ms")
+            return self._snapshot
+
+    @property
+    def data(self):
+        return self.get().data
+
+    def stats(self):
+        snap = self._snapshot
+        return {
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_reload_ms": round(self.last_reload_ms, 2),
+            "loaded_at": snap.loaded_at if snap else None,
+        }
+
+
+class LatencyStats:
+    """Per-endpoint request counters with a rolling window for percentiles."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, ms):
+        with self._lock:
+            if endpoint not in self._samples:
+                self._samples[endpoint] = deque(maxlen=self.window)
+                self._counts[endpoint] = 0
+            self._samples[endpoint].append(ms)
+            self._counts[endpoint] += 1
+
+    def summary(self):
+        with self._lock:
+            out = {}
+            for endpoint, samples in self._samples.items():
+                s = sorted(samples)
+                pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+                out[endpoint] = {
+                    "count": self._counts[endpoint],
+                    "p50_ms": round(pick(0.50), 3),
+                    "p95_ms": round(pick(0.95), 3),
+                    "max_ms": round(s[-1], 3),
+                }
+            return out
+
+
+class DataStore:
+    """Shared in-process datasets for the API (stock universe, macro, global intel)."""
+
+    def __init__(self, stock_file, macro_file, global_file, store_dir=STORE_DIR, check_interval=1.0):
+        self.stock = DataFile(
+            "stock", [stock_file, os.path.join(store_dir, "meta.json")],
+            lambda: load_stock_db(stock_file, store_dir), default={}, check_interval=check_interval,
+            derive=lambda db: {"search": SearchIndex(db), "screener": ScreenerIndex(db)})
+        self.macro = DataFile(
+            "macro", [macro_file], lambda: load_json(macro_file), default=None, check_interval=check_interval)
+        self.global_intel = DataFile(
+            "global", [global_file], lambda: load_json(global_file), default=None, check_interval=check_interval)
+        self.latency = LatencyStats()
+
+    def datasets(self):
+        return [self.stock, self.macro, self.global_intel]
+
+    def metrics(self):
+        return {
+            "endpoints": self.latency.summary(),
+            "datasets": {ds.name: ds.stats() for ds in self.datasets()},
+        }
@@ -1,4 +1,5 @@
 import time
+import hashlib
 import json
 import requests
 import pandas as pd
@@ -7,6 +8,8 @@ import datetime
 import os
 import urllib3
 import math
+import sys
+import asyncio
 from io import StringIO
 from dateutil.relativedelta import relativedelta
 
@@ -17,6 +20,24 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # --- 1. 設定路徑 ---
 # Dynamic path detection (Works on Local & Cloud)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Allow `python backend/data_updater.py` to import backend.* modules
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from backend.fetch_engine import FetchEngine
+from backend import telemetry
+from backend import transport
+from backend import http_session
+from backend import checkpoint
+from backend.storage.columnar import STORE_DIR, write_store, open_store, export_legacy_json, load_stock_db, store_is_current, mark_synced
+from backend.storage.static_shards import write_static_shards
+from backend.storage import ohlcv, flows, delta
+from backend import indicators
+from backend.analysis import AIReportService, score_universe
+from backend.scrapers import quotes as bulk
+from backend.scrapers import chips
+from backend.scrapers.twse import ISIN_URL, ISIN_MODES, decode_isin_page, parse_isin_page
+from backend.services.valuation import DEFAULT_SECTOR_PE, compute_sector_pe, sector_pe_for
 
 # Target: frontend/public/stock_data.json
 PUBLIC_DIR = os.path.join(BASE_DIR, "frontend", "public")
@@ -24,6 +45,7 @@ if not os.path.exists(PUBLIC_DIR):
     os.makedirs(PUBLIC_DIR)
     
 stock_json_path = os.path.join(PUBLIC_DIR, "stock_data.json")
+SHARDS_DIR = os.path.join(PUBLIC_DIR, "stocks")  # Per-stock static files for the frontend
 macro_json_path = os.path.join(PUBLIC_DIR, "macro_data.json")
 
 print(f"📂 Saving data to: {stock_json_path}")
@@ -32,6 +54,14 @@ print(f"📂 Macro data path: {macro_json_path}")
 # Map legacy variable to new one to minimize code changes in rest of file
 JSON_PATH = stock_json_path
 
+# Source domains (override to point the ETL at a local stub server)
+TWSE_DOMAIN = "https://www.twse.com.tw"
+TPEX_DOMAIN = "https://www.tpex.org.tw"
+MOPS_DOMAIN = "https://mopsov.twse.com.tw"
+
+# Shared fetch engine: per-host concurrency & rate limits
+ENGINE = FetchEngine()
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Connection": "keep-alive"
@@ -51,204 +81,544 @@ def sanitize_float(val):
         return f
     except: return 0
 
+def _recent_weekdays(days=5, now=None):
+    now = now or transport.now()
+    for i in range(days):
+        d = now - datetime.timedelta(days=i)
+        if d.weekday() <= 4: yield d
+
 def fetch_twse_chips_global():
     """[Tier 1] 抓取上市(TWSE)三大法人買賣超"""
     print("🥡 [1/3] Downloading TWSE Chips (Smart Money)...")
-    now = datetime.datetime.now()
-    for i in range(5):
-        target_date = now - datetime.timedelta(days=i)
-        if target_date.weekday() > 4: continue 
+    for target_date in _recent_weekdays():
         date_str = target_date.strftime("%Y%m%d")
-        url = f"https://www.twse.com.tw/rwd/zh/fund/T86?date={date_str}&selectType=ALL&response=json"
         try:
-            r = requests.get(url, headers=HEADERS, timeout=10)
-            data = r.json()
-            if data.get('stat') == 'OK':
+            chips_map = chips.fetch_twse_chips_day(ENGINE, target_date, TWSE_DOMAIN, HEADERS)
+            if len(chips_map) > 10:
                 print(f"   ✅ Found TWSE Chips for {date_str}")
-                fields = data.get('fields', [])
-                # [User Request] Partial Exact Indexing based on Logs
-                # Index 4 = Foreign, Index 10 = Trust
-                # We also grab Name (Index 1) for UI
-                chips_map = {}
-                count = 0
-                for row in data.get('data', []):
-                    try:
-                        code = row[0]
-                        name = row[1].strip()
-                        if len(code) != 4: continue 
-                        
-                        # CRITICAL: Remove commas!
-                        f_str = row[4].replace(',', '')
-                        t_str = row[10].replace(',', '')
-                        
-                        f_net = int(f_str) // 1000 # Convert to Shares (张) ? T86 is shares. 
-                        # Wait, T86 unit is shares. User UI expects "张" (Lots = 1000 shares). 
-                        # User snippet: `int(foreign_buy)`. 
-                        # My UI: shows "张". 
-                        # T86 returns shares. 1500 shares = 1.5 Zhang. 
-                        # Usually T86 "3,250,551" is SHARES. 
-                        # My previous data_updater divided by 1000. 
-                        # I will KEEP dividing by 1000 to match UI "Zhang". 
-                        
-                        t_net = int(t_str) // 1000
-                        
-                        chips_map[code] = {
-                            "name": name,
-                            "foreign": f_net, 
-                            "trust": t_net
-                        }
-                        count += 1
-                    except: continue
-                
-                if count > 10:
-                    print(f"   ✅ Successfully parsed {count} stocks (Exact Index Mode).")
-                    return chips_map
+                print(f"   ✅ Successfully parsed {len(chips_map)} stocks (Exact Index Mode).")
+                telemetry.get_run().add_rows(len(chips_map))
+                return chips_map
         except Exception as e:
             print(f"   ⚠️ T86 Error for {date_str}: {e}")
-            pass
     print("   ⚠️ Failed to fetch TWSE Chips data.")
     return {}
 
 def fetch_tpex_chips_global():
     """[Tier 1.5] 抓取上櫃(OTC)三大法人買賣超"""
     print("🥡 [1.5/3] Downloading OTC Chips...")
-    now = datetime.datetime.now()
-        
-    for i in range(5):
-        target_date = now - datetime.timedelta(days=i)
-        if target_date.weekday() > 4: continue
-        
-        roc_year = target_date.year - 1911
-        date_str = f"{roc_year}/{target_date.strftime('%m/%d')}"
-        
-        url = f"https://www.tpex.org.tw/web/stock/3insti/daily_trade/3itrade_hedge_result.php?l=zh-tw&o=json&se=EW&t=D&d={date_str}"
-        headers_tpex = HEADERS.copy()
-        headers_tpex["Referer"] = "https://www.tpex.org.tw/"
-        
+    for target_date in _recent_weekdays():
         try:
-            r = requests.get(url, headers=headers_tpex, verify=False, timeout=10)
-            try: data = r.json()
-            except: continue
-            
-            raw_rows = []
-            if 'tables' in data and len(data['tables']) > 0:
-                if 'data' in data['tables'][0]:
-                    raw_rows = data['tables'][0]['data']
-            elif 'aaData' in data:
-                raw_rows = data['aaData']
-            
-            if len(raw_rows) > 0:
-                print(f"   ✅ Found OTC Chips for {date_str} (Count: {len(raw_rows)})")
-                chips_map = {}
-                for row in raw_rows:
-                    try:
-                        code = row[0]
-                        name = row[1].strip()
-                        if len(code) != 4: continue 
-                        def p(v): return int(v.replace(',', '')) if v else 0
-                        
-                        if len(row) > 13:
-                            foreign_net = p(row[4]) // 1000
-                            trust_net = p(row[13]) // 1000
-                        else:
-                            foreign_net = p(row[4]) // 1000
-                            trust_net = p(row[7]) // 1000
-
-                        chips_map[code] = {
-                            "name": name,
-                            "foreign": foreign_net,
-                            "trust": trust_net
-                        }
-                    except: continue
+            chips_map = chips.fetch_tpex_chips_day(ENGINE, target_date, TPEX_DOMAIN, HEADERS)
+            if chips_map:
+                print(f"   ✅ Found OTC Chips for {target_date.year - 1911}/{target_date.strftime('%m/%d')} (Count: {len(chips_map)})")
+                telemetry.get_run().add_rows(len(chips_map))
                 return chips_map
         except Exception: continue
     
     print("   ⚠️ Failed to fetch OTC Chips.")
     return {}
 
-def fetch_mops_revenue_history_global():
-    """[Tier 2] 抓取 MOPS 營收"""
+def fetch_twse_quotes_global():
+    """[Tier 2] 上市全市場收盤價 + 本益比/淨值比/殖利率 (2 requests per trading day)"""
+    print("💹 [2/3] Downloading TWSE Daily Quotes (MI_INDEX + BWIBBU_d)...")
+    for target_date in _recent_weekdays():
+        date_str = target_date.strftime("%Y%m%d")
+        try:
+            r = ENGINE.get(f"{TWSE_DOMAIN}{bulk.TWSE_QUOTES_PATH}?date={date_str}&type=ALLBUT0999&response=json",
+                           headers=HEADERS, timeout=15)
+            with telemetry.get_run().parse():
+                fields, rows = bulk.find_table(r.json(), required=("證券代號", "收盤價"))
+                quotes = bulk.parse_quote_table(fields, rows)
+            if len(quotes) < 10: continue
+
+            valuation = bulk.parse_quote_table(None, [])
+            try:
+                r = ENGINE.get(f"{TWSE_DOMAIN}{bulk.TWSE_VALUATION_PATH}?date={date_str}&selectType=ALL&response=json",
+                               headers=HEADERS, timeout=15)
+                with telemetry.get_run().parse():
+                    fields, rows = bulk.find_table(r.json(), required=("證券代號", "本益比"))
+                    valuation = bulk.parse_quote_table(fields, rows)
+            except Exception as e:
+                print(f"   ⚠️ BWIBBU_d Error for {date_str}: {e}")
+
+            print(f"   ✅ TWSE Quotes for {date_str}: {len(quotes)} prices, {len(valuation)} valuations")
+            telemetry.get_run().add_rows(len(quotes))
+            return bulk.merge_quote_frames(quotes, valuation, "TWSE")
+        except Exception as e:
+            print(f"   ⚠️ MI_INDEX Error for {date_str}: {e}")
+    print("   ⚠️ Failed to fetch TWSE Quotes.")
+    return bulk.merge_quote_frames(bulk.parse_quote_table(None, []), bulk.parse_quote_table(None, []), "TWSE")
+
+def fetch_tpex_quotes_global():
+    """[Tier 2.5] 上櫃全市場收盤價 + 本益比/淨值比/殖利率 (2 requests per trading day)"""
+    print("💹 [2.5/3] Downloading OTC Daily Quotes...")
+    headers_tpex = HEADERS.copy()
+    headers_tpex["Referer"] = "https://www.tpex.org.tw/"
+    for target_date in _recent_weekdays():
+        date_str = f"{target_date.year - 1911}/{target_date.strftime('%m/%d')}"
+        try:
+            r = ENGINE.get(f"{TPEX_DOMAIN}{bulk.TPEX_QUOTES_PATH}?l=zh-tw&o=json&d={date_str}",
+                           headers=headers_tpex, verify=False, timeout=15)
+            with telemetry.get_run().parse():
+                fields, rows = bulk.find_table(r.json(), required=("代號", "收盤"))
+                quotes = bulk.parse_quote_table(fields, rows, bulk.TPEX_QUOTES_POSITIONS)
+            if len(quotes) < 10: continue
+
+            valuation = bulk.parse_quote_table(None, [])
+            try:
+                r = ENGINE.get(f"{TPEX_DOMAIN}{bulk.TPEX_VALUATION_PATH}?l=zh-tw&o=json&d={date_str}",
+                               headers=headers_tpex, verify=False, timeout=15)
+                with telemetry.get_run().parse():
+                    fields, rows = bulk.find_table(r.json(), required=("代號", "本益比"))
+                    valuation = bulk.parse_quote_table(fields, rows, bulk.TPEX_VALUATION_POSITIONS)
+            except Exception as e:
+                print(f"   ⚠️ OTC PE Error for {date_str}: {e}")
+
+            print(f"   ✅ OTC Quotes for {date_str}: {len(quotes)} prices, {len(valuation)} valuations")
+            telemetry.get_run().add_rows(len(quotes))
+            return bulk.merge_quote_frames(quotes, valuation, "TPEx")
+        except Exception as e:
+            print(f"   ⚠️ OTC Quotes Error for {date_str}: {e}")
+    print("   ⚠️ Failed to fetch OTC Quotes.")
+    return bulk.merge_quote_frames(bulk.parse_quote_table(None, []), bulk.parse_quote_table(None, []), "TPEx")
+
+def fetch_industry_map_global():
+    """[Tier 2] 產業別 for every listed + OTC stock (ISIN pages, 2 requests)"""
+    print("🏭 Downloading Industry Classification (ISIN)...")
+    industry = {}
+    for mode in ISIN_MODES:
+        try:
+            r = ENGINE.get(f"{ISIN_URL}?strMode={mode}", headers=HEADERS, timeout=20)
+            industry.update(parse_isin_page(decode_isin_page(r.content)))
+        except Exception as e:
+            print(f"   ⚠️ ISIN strMode={mode} Error: {e}")
+    print(f"   ✅ Industry map: {len(industry)} stocks")
+    telemetry.get_run().add_rows(len(industry))
+    return industry
+
+def attach_sector_pe(quotes, industry_map):
+    """Fill quote["industry"] / quote["sector_pe"] from per-industry PE medians (in place)."""
+    codes = list(quotes)
+    pe = pd.Series([quotes[c].get("pe") or 0 for c in codes], index=codes, dtype=float)
+    industry = pd.Series([industry_map.get(c) for c in codes], index=codes, dtype=object)
+    by_industry, market_pe = compute_sector_pe(pe, industry)
+    sector = sector_pe_for(codes, industry_map, by_industry, market_pe)
+    for code, value in zip(codes, sector):
+        quotes[code]["industry"] = industry_map.get(code, "")
+        quotes[code]["sector_pe"] = round(value, 2)
+    print(f"   🏭 Sector PE: {len(by_industry)} industries (market median {market_pe:.1f}x)")
+    return quotes
+
+def quotes_from_frame(frame):
+    """Code-indexed quote frame -> {code: {"price", "pe", "pb", "dividend_yield", "name", "market"}}"""
+    out = {}
+    for code, row in zip(frame.index, frame.to_dict("records")):
+        price = row["price"]
+        if price != price or price <= 0: continue  # NaN / 無成交 -> left for the fallback
+        out[code] = {
+            "price": price,
+            "pe": row["pe"] if row["pe"] == row["pe"] else 0,
+            "pb": row["pb"] if row["pb"] == row["pb"] else 0,
+            "dividend_yield": row["dividend_yield"] if row["dividend_yield"] == row["dividend_yield"] else 0,
+            "name": row["name"] if isinstance(row["name"], str) else None,
+            "market": row["market"],
+        }
+    return out
+
+def _is_mops_page(r):
+    """A real t21sc03 page (MOPS answers throttling / unpublished months with a short table-less page)."""
+    return r.status_code == 200 and len(r.content) > 5000 and b"<table" in r.content.lower()
+
+def fetch_mops_page(mkt, date_obj, timeout=10):
+    """下載單一 MOPS t21sc03 月營收頁面 (Big5)。Returns HTML text or None."""
+    roc_year, roc_month, _ = get_roc_date_parts(date_obj)
+    url = f"{MOPS_DOMAIN}/nas/t21/{mkt}/t21sc03_{roc_year}_{roc_month}_0.html"
+    try:
+        # Checked before caching too: an old month's page is cached as immutable
+        r = ENGINE.get(url, headers=HEADERS, verify=False, timeout=timeout, cacheable=_is_mops_page)
+        r.encoding = 'big5'
+        if _is_mops_page(r):
+            return r.text
+    except: pass
+    return None
+
+def find_mops_anchor(now=None, max_months=24, window=4):
+    """
+    Find the newest published month, probing in date order (newest first).
+    Probes `window` months concurrently and stops at the first window with a hit.
+    Returns (anchor_date, anchor_html) so the anchor page is never downloaded twice.
+    """
+    now = now or transport.now()
+    for start in range(1, max_months + 1, window):
+        dates = [now - relativedelta(months=i) for i in range(start, min(start + window, max_months + 1))]
+        pages = ENGINE.map(lambda d: fetch_mops_page('sii', d, timeout=5), dates)
+        for probe_date, html in zip(dates, pages):
+            if html:
+                return probe_date, html
+    return None, None
+
+def parse_mops_pages(pages):
+    """Parse pages in a process pool (lxml parsing is CPU bound). Falls back to in-process."""
+    from backend.scrapers.mops import parse_t21sc03_page
+    if not pages:
+        return []
+    run = telemetry.get_run()
+    with run.parse():
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            workers = min(len(pages), os.cpu_count() or 1, 8)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                frames = list(pool.map(parse_t21sc03_page, pages))
+        except Exception as e:
+            print(f"   ⚠️ Process pool unavailable ({e}). Parsing in-process.")
+            frames = [parse_t21sc03_page(p) for p in pages]
+    run.add_rows(sum(len(f) for f in frames))
+    return frames
+
+def download_mops_months(months, anchor_date=None, anchor_html=None):
+    """
+    Download + parse MOPS revenue pages (sii + otc) for the given months.
+    months: newest first. Returns a columnar DataFrame indexed by (code, month)
+    with [revenue, yoy], rows in fetch order (newest month first, sii before otc).
+    """
+    # Newest month first, sii before otc (first hit per code = latest YoY)
+    jobs = []
+    for target_date in months:
+        for mkt in ['sii', 'otc']:
+            jobs.append((mkt, target_date))
+
+    def download(job):
+        mkt, target_date = job
+        if anchor_html and mkt == 'sii' and target_date == anchor_date:
+            return anchor_html
+        return fetch_mops_page(mkt, target_date)
+
+    pages = ENGINE.map(download, jobs)
+    fetched = [(job, html) for job, html in zip(jobs, pages) if html]
+    print(f"   📥 Downloaded {len(fetched)}/{len(jobs)} MOPS pages. Parsing...")
+    parsed = parse_mops_pages([html for _, html in fetched])
+
+    frames = []
+    for ((mkt, target_date), _), df in zip(fetched, parsed):
+        if df.empty: continue
+        frames.append(df.assign(month=target_date.strftime("%Y-%m")))
+    if not frames:
+        return None
+    frame = pd.concat(frames, ignore_index=True)
+    return frame.set_index(["code", "month"])[["revenue", "yoy"]]
+
+def fetch_mops_revenue_frame():
+    """[Tier 2] 下載並解析近 12 個月 MOPS 營收 (上市 + 上櫃) -> (code, month) frame"""
     print("🥡 [2/3] Building 12-Month Revenue History (MOPS)...")
-    history_map = {} 
-    latest_stats_map = {} 
-    MOPS_DOMAIN = "https://mopsov.twse.com.tw" 
-    anchor_date = datetime.datetime.now()
-    found_anchor = False
-    
     print(f"   🕵️ Probing {MOPS_DOMAIN} for latest data...")
-    for i in range(1, 25): 
-        probe_date = anchor_date - relativedelta(months=i)
-        roc_year, roc_month, roc_str = get_roc_date_parts(probe_date)
-        url = f"{MOPS_DOMAIN}/nas/t21/sii/t21sc03_{roc_year}_{roc_month}_0.html"
-        try:
-            r = requests.get(url, headers=HEADERS, verify=False, timeout=5)
-            r.encoding = 'big5'
-            if r.status_code == 200 and len(r.text) > 5000:
-                try:
-                    pd.read_html(StringIO(r.text))
-                    anchor_date = probe_date
-                    found_anchor = True
-                    print(f"   ✅ Anchor found at: {roc_str}")
-                    break
-                except: pass
-        except: pass
-            
-    if not found_anchor:
+    anchor_date, anchor_html = find_mops_anchor()
+    if not anchor_date:
         print("   ❌ Critical: Could not find ANY revenue data.")
-        return ({}, {})
+        return None
+    print(f"   ✅ Anchor found at: {get_roc_date_parts(anchor_date)[2]}")
 
-    for i in range(12):
-        target_date = anchor_date - relativedelta(months=i)
-        roc_year, roc_month, roc_str = get_roc_date_parts(target_date)
-        
-        markets = ['sii', 'otc']
-        for mkt in markets:
-            url = f"{MOPS_DOMAIN}/nas/t21/{mkt}/t21sc03_{roc_year}_{roc_month}_0.html"
-            try:
-                r = requests.get(url, headers=HEADERS, verify=False, timeout=10)
-                r.encoding = 'big5'
-                dfs = pd.read_html(StringIO(r.text))
-                for df in dfs:
-                    if df.shape[1] > 6:
-                        df.columns = [str(col) for col in df.columns]
-                        cols_str = "".join(df.columns)
-                        if "代號" in cols_str or "公司" in cols_str or True:
-                             for _, row in df.iterrows():
-                                try:
-                                    code = str(row.iloc[0]).strip()
-                                    if len(code) != 4 or not code.isdigit(): continue
-                                    rev_raw = row.iloc[2]
-                                    if pd.isna(rev_raw) or str(rev_raw).strip() == '-': continue
-                                    rev_val = float(str(rev_raw).replace(',', '')) * 1000 
-                                    
-                                    if code not in history_map: history_map[code] = []
-                                    history_map[code].append({
-                                        "date": target_date.strftime("%Y-%m"),
-                                        "revenue": rev_val 
-                                    })
-                                    
-                                    if code not in latest_stats_map:
-                                        try:
-                                            yoy = float(str(row.iloc[6]).replace(',', ''))
-                                            latest_stats_map[code] = {"mom": 0, "yoy": yoy} 
-                                        except:
-                                            latest_stats_map[code] = {"mom": 0, "yoy": 0}
-                                except: continue
-            except: continue
-
-    for code, hist in history_map.items():
-        hist.reverse() 
-        if len(hist) >= 2:
-            latest = hist[-1]['revenue']
-            prev = hist[-2]['revenue']
-            if prev > 0:
-                mom = ((latest - prev) / prev) * 100
-                if code in latest_stats_map:
-                    latest_stats_map[code]['mom'] = round(mom, 2)
-                else:
-                    latest_stats_map[code] = {"mom": round(mom, 2), "yoy": 0}
+    months = [anchor_date - relativedelta(months=i) for i in range(12)]
+    return download_mops_months(months, anchor_date, anchor_html)
+
+def revenue_frame_to_maps(frame):
+    """
+    Columnar revenue frame -> legacy (history_map, latest_stats_map).
+    history: oldest -> newest. yoy: latest month's value. mom: latest vs previous entry.
+    """
+    history_map = {}
+    latest_stats_map = {}
+    if frame is None or frame.empty:
+        return history_map, latest_stats_map
+
+    codes = frame.index.get_level_values("code").to_numpy()
+    months = frame.index.get_level_values("month").to_numpy()
+    revenues = frame["revenue"].to_numpy()
+    yoys = frame["yoy"].to_numpy()
+
+    # Rows are newest-first; walk backwards so each list comes out oldest-first
+    for code, month, rev_val in zip(codes[::-1], months[::-1], revenues[::-1]):
+        if code not in history_map: history_map[code] = []
+        history_map[code].append({"date": month, "revenue": float(rev_val)})
+
+    # Latest two entries per code (first two rows in fetch order)
+    rank = frame.groupby(level="code", sort=False).cumcount().to_numpy()
+    latest_idx = rank == 0
+    latest_rev = pd.Series(revenues[latest_idx], index=codes[latest_idx])
+    prev_rev = pd.Series(revenues[rank == 1], index=codes[rank == 1]).reindex(latest_rev.index)
+    mom = ((latest_rev - prev_rev) / prev_rev) * 100
+    mom = mom.where(prev_rev > 0)
+
+    for code, yoy, m in zip(latest_rev.index, yoys[latest_idx], mom.to_numpy()):
+        latest_stats_map[code] = {"mom": 0 if math.isnan(m) else round(float(m), 2), "yoy": float(yoy)}
     return history_map, latest_stats_map
 
+def fetch_mops_revenue_history_global():
+    """[Tier 2] 抓取 MOPS 營收 -> (history_map, latest_stats_map)"""
+    return revenue_frame_to_maps(fetch_mops_revenue_frame())
+
+# Months still inside MOPS' filing window (late filers keep appearing until ~10th of M+1)
+REVENUE_FILING_WINDOW_MONTHS = 2
+
+def load_stored_revenue(db):
+    """Existing stock_data.json records -> ({code: history}, {code: {"mom", "yoy"}})"""
+    history_map, stats_map = {}, {}
+    for code, rec in db.items():
+        rev = rec.get("revenue") or {}
+        hist = rev.get("history") or []
+        if not hist: continue
+        history_map[code] = [{"date": h["date"], "revenue": h["revenue"]} for h in hist]
+        stats_map[code] = {"mom": rev.get("mom", 0), "yoy": rev.get("yoy", 0)}
+    return history_map, stats_map
+
+def merge_revenue(stored_history, stored_stats, frame, window_end):
+    """
+    Roll stored histories forward with freshly fetched months.
+    Fetched months replace stored entries for the same month; the 12-month window
+    ends at window_end. mom is recomputed from the merged history; yoy comes from
+    the newest fetched month (MOPS publishes it per page), else the stored value.
+    """
+    new_history, new_stats = revenue_frame_to_maps(frame)
+    window_start = (window_end - relativedelta(months=11)).strftime("%Y-%m")
+
+    history_map, stats_map = {}, {}
+    for code in list(stored_history) + [c for c in new_history if c not in stored_history]:
+        fetched = new_history.get(code, [])
+        fetched_months = {h["date"] for h in fetched}
+        hist = [h for h in stored_history.get(code, []) if h["date"] not in fetched_months] + fetched
+        hist.sort(key=lambda h: h["date"])
+        hist = [h for h in hist if h["date"] >= window_start]
+        if not hist: continue
+        history_map[code] = hist
+
+        if code in new_stats:
+            yoy = new_stats[code]["yoy"]
+        else:
+            yoy = stored_stats.get(code, {}).get("yoy", 0)
+        mom = 0
+        if len(hist) >= 2 and hist[-2]["revenue"] > 0:
+            mom = round(((hist[-1]["revenue"] - hist[-2]["revenue"]) / hist[-2]["revenue"]) * 100, 2)
+        stats_map[code] = {"mom": mom, "yoy": yoy}
+    return history_map, stats_map
+
+def fetch_mops_revenue_incremental(stored_history, stored_stats, now=None):
+    """
+    [Tier 2] Incremental MOPS revenue: only download months newer than what
+    stock_data.json already holds (plus the newest stored month while it is
+    still inside the filing window). Falls back to a full 12-month build.
+    """
+    latest = max((h[-1]["date"] for h in stored_history.values() if h), default=None)
+    if not latest:
+        return fetch_mops_revenue_history_global()
+
+    now = now or transport.now()
+    latest_date = datetime.datetime.strptime(latest, "%Y-%m")
+    this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    age = (this_month.year - latest_date.year) * 12 + (this_month.month - latest_date.month)
+    if age > 12:
+        print(f"   ⚠️ Stored revenue ends at {latest} (too old). Running full rebuild...")
+        return fetch_mops_revenue_history_global()
+
+    print(f"🥡 [2/3] Updating Revenue History incrementally (stored up to {latest})...")
+    # Probe only the months after the stored one (newest first)
+    anchor_date, anchor_html = find_mops_anchor(now, max_months=age - 1) if age > 1 else (None, None)
+    if anchor_date:
+        print(f"   ✅ New month found: {get_roc_date_parts(anchor_date)[2]}")
+        n_new = (anchor_date.year - latest_date.year) * 12 + (anchor_date.month - latest_date.month)
+        months = [anchor_date - relativedelta(months=i) for i in range(n_new)]
+    else:
+        print("   ℹ️ No newly published month.")
+        anchor_date, months = latest_date, []
+    if age <= REVENUE_FILING_WINDOW_MONTHS:
+        months.append(latest_date)  # Pick up late filers of the newest stored month
+
+    if not months:
+        return stored_history, stored_stats
+    frame = download_mops_months(months, anchor_date, anchor_html)
+    return merge_revenue(stored_history, stored_stats, frame, anchor_date)
+
+def fetch_yf_batch(batch, otc_codes):
+    """[Tier 3] 抓取一批 yfinance 報價 -> {code: {"price", "pe"}}"""
+    yf_tickers = [f"{c}.TWO" if c in otc_codes else f"{c}.TW" for c in batch]
+    # One taped call per batch (record / replay); live it is the yfinance round trips below
+    return transport.call("yf_batch", yf_tickers, lambda: _fetch_yf_batch_live(batch, yf_tickers))
+
+def _fetch_yf_batch_live(batch, yf_tickers):
+    quotes = {}
+
+    # One batch at a time per limiter slot (replaces the old time.sleep(1))
+    with ENGINE.limiter("yfinance"):
+        # [Safety Layer 3] Optimize YFinance Call (Retry Loop)
+        tickers = None
+        for attempt in range(3):
+            try:
+                tickers = yf.Tickers(" ".join(yf_tickers))
+                break
+            except Exception as e:
+                print(f"   ⚠️ YFinance Retry {attempt+1}/3: {e}")
+                telemetry.get_run().record_retry("yfinance")
+                transport.polite_sleep(http_session.backoff_delay(attempt, base=2.0))
+
+        if not tickers:
+            print("   ❌ Failed to fetch batch after 3 retries. Skipping.")
+            return quotes
+
+        for code, yt in zip(batch, yf_tickers):
+            price = 0; pe = 0
+            start = time.perf_counter(); ok = False
+            try:
+                t = tickers.tickers[yt]
+                fast_info = t.fast_info
+                price = fast_info.last_price
+                info = t.info
+                pe = info.get('trailingPE')
+                if pe is None:
+                    eps = info.get('trailingEps')
+                    if eps and eps > 0 and price:
+                        pe = price / eps
+                    else:
+                        pe = info.get('forwardPE', 0)
+                ok = True
+            except: pass
+            # fast_info + .info = the per-ticker round trips this fallback still pays
+            telemetry.get_run().record_request("yfinance", 200 if ok else None, 0,
+                                               time.perf_counter() - start, error=not ok)
+            quotes[code] = {"price": price, "pe": pe}
+    return quotes
+
+def fetch_yf_quotes_global(target_stocks, otc_codes, batch_size=50, journal=None):
+    """[Tier 3] 平行抓取全部報價 (yfinance batches, bounded by the 'yfinance' limiter)"""
+    batches = [target_stocks[i:i+batch_size] for i in range(0, len(target_stocks), batch_size)]
+    print(f"🚀 [3/3] yfinance fallback for {len(target_stocks)} stocks ({len(batches)} batches)...")
+
+    def run(batch):
+        try:
+            return fetch_yf_batch(batch, otc_codes)
+        except Exception as e:
+            print(f"   ⚠️ Batch skipped: {e}")
+            return {}
+
+    def run_checkpointed(batch):
+        # Keyed by the batch's codes: a resumed run re-fetches only batches that never finished.
+        # Failed tickers come back with price 0, so a batch without one real price is not "finished".
+        step = "yf_" + hashlib.md5(",".join(batch).encode()).hexdigest()[:12]
+        return journal.step(step, lambda: run(batch), quiet=True,
+                            valid=lambda q: any((v.get("price") or 0) > 0 for v in q.values()))
+
+    quotes = {}
+    for result in ENGINE.map(run_checkpointed if journal else run, batches):
+        quotes.update(result)
+    return quotes
+
+def build_stock_record(code, quote, revenue_history, revenue_stats, full_chips, flow=None):
+    """Merge quote + revenue + chips (+ rolling flow aggregates) into one stock_data.json record"""
+    price = quote.get("price") or 0
+    pe = quote.get("pe")
+
+    sector_pe = quote.get("sector_pe") or DEFAULT_SECTOR_PE
+    status = "Fair Value"
+    score = 0
+    if pe and pe > 0:
+        score = pe / sector_pe
+        if score > 1.2: status = "High Premium"
+        elif score < 0.8: status = "Undervalued"
+    elif price > 0: status = "N/A"
+
+    rev_hist = revenue_history.get(code, [])
+    last_rev = rev_hist[-1]['revenue'] if rev_hist else 0
+    stats = revenue_stats.get(code, {"mom": 0, "yoy": 0})
+    chip_info = full_chips.get(code, {"foreign": None, "trust": None, "name": quote.get("name") or code})
+    stock_name = chip_info.get('name', code)
+    
+    return {
+        "stock_id": code,
+        "stock_name": stock_name,
+        "valuation": {
+            "stock_id": code, 
+            "industry": quote.get("industry", ""),
+            "current_pe": round(sanitize_float(pe), 2),
+            "sector_pe": sanitize_float(sector_pe),
+            "pe_score": round(sanitize_float(score), 2),
+            "status": status, 
+            "price": round(sanitize_float(price), 1),
+            "pb": round(sanitize_float(quote.get("pb")), 2),
+            "dividend_yield": round(sanitize_float(quote.get("dividend_yield")), 2)
+        },
+        "revenue": {
+            "date": rev_hist[-1]['date'] if rev_hist else "N/A",
+            "revenue": sanitize_float(last_rev), 
+            "mom": sanitize_float(stats.get('mom')), 
+            "yoy": sanitize_float(stats.get('yoy')), 
+            "history": rev_hist 
+        },
+        "chips": {
+            "foreign_net": chip_info.get('foreign', 0),
+            "trust_net": chip_info.get('trust', 0),
+            **{k: v for k, v in (flow or {}).items() if k != "analysis"},
+            "analysis": (flow or {}).get("analysis", "N/A")
+        }
+    }
+
+def merge_records(final_db, target_stocks, quotes, revenue_history, revenue_stats, full_chips,
+                  flow_records=None, technicals=None):
+    """Merge the day's sources into final_db in place (existing records survive failed quotes)."""
+    flow_records = flow_records or {}
+    technicals = technicals or {}
+    for code in target_stocks:
+        try:
+            quote = quotes.get(code, {"price": 0, "pe": 0})
+            
+            # [Safety Layer 1] Only overwrite if fetch was successful
+            if (quote.get("price") or 0) <= 0:
+                if code in final_db:
+                   continue
+                
+                if code == "2330":
+                    raise ValueError("TSMC Fetch Failed")
+                continue
+
+            prev_ai = final_db.get(code, {}).get("ai_analysis")
+            final_db[code] = build_stock_record(code, quote, revenue_history, revenue_stats, full_chips,
+                                                flow_records.get(code))
+            if code in technicals: final_db[code]["technicals"] = technicals[code]
+            if prev_ai: final_db[code]["ai_analysis"] = prev_ai  # Reused only if its input_hash still matches
+            
+        except Exception:
+            # Fallback for 2330
+            if code == "2330" and "2330" not in final_db:
+                print("⚠️ using built-in fallback for 2330...")
+                fb = {
+                     "stock_id": "2330", "stock_name": "台積電",
+                     "valuation": { "stock_id": "2330", "current_pe": 28.5, "sector_pe": 20.0, "pe_score": 1.42, "status": "High Premium", "price": 1050.0 },
+                     "revenue": { "date": "2026-02", "revenue": 250000000000, "mom": 5.2, "yoy": 35.5, "history": [] },
+                     "chips": { "foreign_net": 12000, "trust_net": 3000, "analysis": "Accumulating" }
+                }
+                final_db["2330"] = fb
+            continue
+    return final_db
+
+def write_outputs(final_db, store_dir=None, json_path=None, shards_dir=None):
+    """Columnar store first, then the legacy JSON exported from it + static shards. Returns (exported, shards)."""
+    store_dir = store_dir or STORE_DIR
+    json_path = json_path or JSON_PATH
+    write_store(final_db, store_dir)
+    exported = export_legacy_json(open_store(store_dir), json_path)
+    shards = write_static_shards(exported, shards_dir or SHARDS_DIR)
+    return exported, shards
+
+def outputs_published(json_path=None, shards_dir=None):
+    """The deployed outputs (legacy JSON + shard manifest) exist. The columnar store is local only."""
+    json_path = json_path or JSON_PATH
+    manifest = os.path.join(shards_dir or SHARDS_DIR, "manifest.json")
+    return os.path.exists(json_path) and os.path.exists(manifest)
+
+def rebuild_store(final_db, store_dir=None, json_path=None):
+    """Columnar store for an unchanged JSON (fresh checkout / CI): no published file is touched."""
+    store_dir = store_dir or STORE_DIR
+    json_path = json_path or JSON_PATH
+    write_store(final_db, store_dir)
+    mark_synced(store_dir, json_path)
+
 DATA_FILE = "stock_data.json"
 
 def main():
@@ -258,7 +628,9 @@ def main():
     
     # Check for Freshness
     has_force_flag = '--force' in sys.argv
-    if os.path.exists(DATA_FILE) and not has_force_flag:
+    full_revenue = '--full-revenue' in sys.argv
+    resume = '--resume' in sys.argv  # Continue a crashed run from its checkpoint journal (implies --force)
+    if os.path.exists(DATA_FILE) and not (has_force_flag or resume):
         mtime = os.path.getmtime(DATA_FILE)
         age_hours = (time.time() - mtime) / 3600
         if age_hours < 12:
@@ -270,146 +642,103 @@ def main():
         print("🚀 Force Update Requested...")
     else:
         print(f"📉 Data is old (or missing). Starting update...")
-        
-    twse_chips = fetch_twse_chips_global()
-    tpex_chips = fetch_tpex_chips_global()
-    
-    full_chips = twse_chips.copy()
-    full_chips.update(tpex_chips)
-    
-    revenue_history, revenue_stats = fetch_mops_revenue_history_global()
-    
-    raw_stocks = list(full_chips.keys())
-    target_stocks = [c for c in raw_stocks if len(c) == 4]
-    
-    if len(target_stocks) < 10:
-         print("   ⚠️ Chips API returned few stocks. Adding fallback list.")
-         fallback = ["2330", "2317", "2454", "2603", "2881", "8069", "3293", "5347", "2365"]
-         for s in fallback:
-             if s not in target_stocks: target_stocks.append(s)
-    
-    print(f"🚀 [3/3] Processing Batch Data for {len(target_stocks)} stocks...")
-    
+
+    run_start = time.perf_counter()
+    run = telemetry.start_run("stock_etl")
+    run.meta.update({"force": has_force_flag, "full_revenue": full_revenue, "resume": resume})
+    journal = checkpoint.Journal("stock_etl", resume=resume)
+
     # [Safety Layer 1] Data Merging: Load existing data first
     final_db = {}
-    if os.path.exists(JSON_PATH):
-        try:
-            with open(JSON_PATH, 'r', encoding='utf-8') as f:
-                final_db = json.load(f)
+    try:
+        final_db = load_stock_db(JSON_PATH, STORE_DIR)
+        if final_db:
             print(f"🔄 Loaded existing DB ({len(final_db)} records). Using as base.")
-        except:
-             print("⚠️ Failed to load existing DB. Starting fresh.")
-    
-    batch_size = 50
-    
-    for i in range(0, len(target_stocks), batch_size):
-        batch = target_stocks[i:i+batch_size]
-        print(f"   Batch {i}-{i+len(batch)} processing...")
+    except:
+         print("⚠️ Failed to load existing DB. Starting fresh.")
+    previous = delta.record_snapshot(final_db)  # Last published snapshot, before merge edits records in place
+
+    def revenue_stage():
+        stored_history, stored_stats = load_stored_revenue(final_db)
+        if full_revenue or not stored_history:
+            return fetch_mops_revenue_history_global()
+        return fetch_mops_revenue_incremental(stored_history, stored_stats)
+
+    # Independent sources run in parallel: MOPS keeps going while chips + bulk quotes -> fallback run
+    def chips_and_quotes():
+        daily = ENGINE.run_stages({
+            "twse_chips": journal.wrap("twse_chips", fetch_twse_chips_global),
+            "tpex_chips": journal.wrap("tpex_chips", fetch_tpex_chips_global),
+            "twse_quotes": journal.wrap("twse_quotes", fetch_twse_quotes_global),
+            "tpex_quotes": journal.wrap("tpex_quotes", fetch_tpex_quotes_global),
+            "industry": journal.wrap("industry", fetch_industry_map_global),
+        })
+        twse_chips, tpex_chips = daily["twse_chips"], daily["tpex_chips"]
         
-        yf_tickers = []
-        for c in batch:
-            if c in tpex_chips: yf_tickers.append(f"{c}.TWO")
-            else: yf_tickers.append(f"{c}.TW")
+        full_chips = twse_chips.copy()
+        full_chips.update(tpex_chips)
         
-        # [Safety Layer 3] Optimize YFinance Call (Retry Loop)
-        tickers = None
-        for attempt in range(3):
-            try:
-                tickers = yf.Tickers(" ".join(yf_tickers))
-                break
-            except Exception as e:
-                print(f"   ⚠️ YFinance Retry {attempt+1}/3: {e}")
-                time.sleep(2)
+        raw_stocks = list(full_chips.keys())
+        target_stocks = [c for c in raw_stocks if len(c) == 4]
         
-        if not tickers:
-            print("   ❌ Failed to fetch batch after 3 retries. Skipping.")
-            continue
+        if len(target_stocks) < 10:
+             print("   ⚠️ Chips API returned few stocks. Adding fallback list.")
+             fallback = ["2330", "2317", "2454", "2603", "2881", "8069", "3293", "5347", "2365"]
+             for s in fallback:
+                 if s not in target_stocks: target_stocks.append(s)
 
+        # Exchange-wide tables first; yfinance only for the gaps (suspended, missing rows)
+        quotes = quotes_from_frame(daily["twse_quotes"])
+        quotes.update(quotes_from_frame(daily["tpex_quotes"]))
+        gaps = [c for c in target_stocks if c not in quotes]
+        print(f"   ✅ Bulk quotes cover {len(target_stocks) - len(gaps)}/{len(target_stocks)} stocks")
+        if gaps:
+            otc_codes = set(tpex_chips) | set(daily["tpex_quotes"].index)
+            with ENGINE.stage("yf_quotes"):
+                quotes.update(fetch_yf_quotes_global(gaps, otc_codes, journal=journal))
+        attach_sector_pe(quotes, daily["industry"])
+        return full_chips, target_stocks, quotes
+
+    results = ENGINE.run_stages({
+        "mops_revenue": journal.wrap("mops_revenue", revenue_stage),
+        "chips_quotes": chips_and_quotes,
+    })
+    revenue_history, revenue_stats = results["mops_revenue"]
+    full_chips, target_stocks, quotes = results["chips_quotes"]
+
+    # Append the new trading day(s) to the OHLCV history (today's tables are HTTP cache hits)
+    # Persist the day's institutional tables and roll the 5/20/60-day aggregates forward
+    flow_records = {}
+    with ENGINE.stage("flows"):
         try:
-            for code in batch:
-                try:
-                    price = 0; pe = 0
-                    suffix = ".TWO" if code in tpex_chips else ".TW"
-                    
-                    try:
-                        t = tickers.tickers[f"{code}{suffix}"]
-                        fast_info = t.fast_info
-                        price = fast_info.last_price
-                        info = t.info
-                        pe = info.get('trailingPE')
-                        if pe is None:
-                            eps = info.get('trailingEps')
-                            if eps and eps > 0 and price:
-                                pe = price / eps
-                            else:
-                                pe = info.get('forwardPE', 0)
-                    except: pass 
-                        
-                    sector_pe = 20.0 
-                    status = "Fair Value"
-                    score = 0
-                    if pe and pe > 0:
-                        score = pe / sector_pe
-                        if score > 1.2: status = "High Premium"
-                        elif score < 0.8: status = "Undervalued"
-                    elif price > 0: status = "N/A"
-                    
-                    # [Safety Layer 1] Only overwrite if fetch was successful
-                    if price <= 0:
-                        if code in final_db:
-                           continue
-                        
-                        if code == "2330":
-                            raise ValueError("TSMC Fetch Failed")
-                        continue
-
-                    rev_hist = revenue_history.get(code, [])
-                    last_rev = rev_hist[-1]['revenue'] if rev_hist else 0
-                    stats = revenue_stats.get(code, {"mom": 0, "yoy": 0})
-                    chip_info = full_chips.get(code, {"foreign": None, "trust": None, "name": code})
-                    stock_name = chip_info.get('name', code)
-                    
-                    item_data = {
-                        "stock_id": code,
-                        "stock_name": stock_name,
-                        "valuation": {
-                            "stock_id": code, 
-                            "current_pe": round(sanitize_float(pe), 2),
-                            "sector_pe": sanitize_float(sector_pe),
-                            "pe_score": round(sanitize_float(score), 2),
-                            "status": status, 
-                            "price": round(sanitize_float(price), 1)
-                        },
-                        "revenue": {
-                            "date": rev_hist[-1]['date'] if rev_hist else "N/A",
-                            "revenue": sanitize_float(last_rev), 
-                            "mom": sanitize_float(stats.get('mom')), 
-                            "yoy": sanitize_float(stats.get('yoy')), 
-                            "history": rev_hist 
-                        },
-                        "chips": {
-                            "foreign_net": chip_info.get('foreign', 0),
-                            "trust_net": chip_info.get('trust', 0),
-                            "analysis": "N/A" # Placeholder, analysis removed
-                        }
-                    }
-
-                    final_db[code] = item_data
-                    
-                except Exception:
-                    # Fallback for 2330
-                    if code == "2330" and "2330" not in final_db:
-                        print("⚠️ using built-in fallback for 2330...")
-                        fb = {
-                             "stock_id": "2330", "stock_name": "台積電",
-                             "valuation": { "stock_id": "2330", "current_pe": 28.5, "sector_pe": 20.0, "pe_score": 1.42, "status": "High Premium", "price": 1050.0 },
-                             "revenue": { "date": "2026-02", "revenue": 250000000000, "mom": 5.2, "yoy": 35.5, "history": [] },
-                             "chips": { "foreign_net": 12000, "trust_net": 3000, "analysis": "Accumulating" }
-                        }
-                        final_db["2330"] = fb
-                    continue
-            time.sleep(1) 
-        except Exception: print("Batch skipped")
+            flow_store = flows.FlowStore()
+            flows.update(flow_store, ENGINE, TWSE_DOMAIN, TPEX_DOMAIN, HEADERS)
+            flow_state, mode, added = flows.update_state(flow_store)
+            flow_records = flow_state.records()
+            print(f"   🏦 Flow aggregates for {len(flow_records)} stocks ({mode}, +{added} days)")
+        except Exception as e:
+            print(f"   ⚠️ Flow history update skipped: {e}")
+
+    technicals = {}
+    with ENGINE.stage("ohlcv"):
+        try:
+            store = ohlcv.OHLCVStore()
+            ohlcv.update(store, ENGINE, TWSE_DOMAIN, TPEX_DOMAIN, HEADERS)
+            technicals, mode = indicators.update_from_store(store)
+            print(f"   📐 Technicals for {len(technicals)} stocks ({mode})")
+        except Exception as e:
+            print(f"   ⚠️ OHLCV / technicals update skipped: {e}")
+    
+    print(f"🚀 Merging Data for {len(target_stocks)} stocks...")
+
+    with ENGINE.stage("merge"):
+        run.add_rows(len(target_stocks))
+        merge_records(final_db, target_stocks, quotes, revenue_history, revenue_stats, full_chips,
+                      flow_records, technicals)
+
+    ENGINE.report_timings()
+    if ENGINE.cache: ENGINE.cache.report()
+    print(f"   ⏱️ Total fetch + merge: {time.perf_counter() - run_start:.2f}s")
 
     # [Safety Layer 2] The "Canary" Integrity Check
     print("🛡️ Performing Integrity Checks...")
@@ -417,18 +746,65 @@ def main():
     if len(final_db) < 5:
         print(f"❌ Critical Error: Integrity Check Failed! Only {len(final_db)} stocks found (Minimum 5).")
         print("🛑 Update Aborted. Old data preserved.")
+        run.meta["aborted"] = "integrity_check"
+        telemetry.finish_run()
         exit(1)
 
     tsmc = final_db.get("2330")
     if not tsmc or tsmc.get("valuation", {}).get("price", 0) <= 0:
         print("❌ Critical Error: Integrity Check Failed! TSMC (2330) is missing or invalid.")
         print("🛑 Update Aborted. Old data preserved.")
+        run.meta["aborted"] = "integrity_check"
+        telemetry.finish_run()
         exit(1)
 
     print("✅ Integrity Check Passed.")
-    with open(JSON_PATH, "w", encoding='utf-8') as f:
-        json.dump(final_db, f, ensure_ascii=False, indent=2)
-    print(f"✅ All Done! Saved to {JSON_PATH}")
+
+    # Rule-based scores for the whole universe (the API renders them, no per-request scoring)
+    with ENGINE.stage("rules"):
+        rules = score_universe(final_db)
+        for code, rec in final_db.items():
+            if code in rules: rec["rule_analysis"] = rules[code]
+            else: rec.pop("rule_analysis", None)
+    print(f"🧮 Rule scores for {len(rules)} stocks")
+
+    # Optional: precompute AI reports for the most active stocks (needs GEMINI_API_KEY)
+    ai_top = int(os.getenv("AI_PRECOMPUTE_TOP_N", "0") or 0)
+    for arg in sys.argv:
+        if arg.startswith("--ai-top="): ai_top = int(arg.split("=", 1)[1])
+    if ai_top > 0 and os.getenv("GEMINI_API_KEY"):
+        with ENGINE.stage("ai_reports"):
+            service = AIReportService.from_env()
+            filled = asyncio.run(service.precompute(final_db, top_n=ai_top))
+        print(f"🤖 AI reports: {filled} ready ({service.stats['calls']} model calls, "
+              f"{service.stats['precomputed']} reused, {service.stats['errors']} errors)")
+    # Columnar store first, then the legacy JSON exported from it (static frontend).
+    # Each output is written to a temp path and renamed into place; only then is the journal dropped.
+    # Unchanged records (by canonical content hash) -> nothing is rewritten, nothing to deploy.
+    with ENGINE.stage("write"):
+        current = delta.record_snapshot(final_db)
+        changes = delta.diff_records(previous, current)
+        # "changed" is about published content only; the gitignored store is rebuilt quietly
+        changed = not delta.is_empty(changes) or not outputs_published()
+        if changed:
+            exported, shards = write_outputs(final_db)
+            run.add_rows(len(exported))
+        elif not store_is_current(STORE_DIR, JSON_PATH):
+            rebuild_store(final_db)
+            print(f"   🗄️ Columnar store rebuilt at {STORE_DIR} (outputs unchanged)")
+        delta.write_delta("stock_etl", changed, delta.snapshot_hash(current), changes)
+    journal.commit()
+    if changed:
+        print(f"🧩 Shards: {shards['written']} written, {shards['unchanged']} unchanged, "
+              f"{shards['removed']} removed (manifest v{shards['version']})")
+        print(f"✅ All Done! Saved to {JSON_PATH} (+ columnar store at {STORE_DIR})")
+    else:
+        print(f"✅ All Done! No record changed; {JSON_PATH} left as is.")
+    run.meta.update({"stocks": len(final_db), "changed": changed,
+                     "records_changed": len(changes["changed_records"]) + len(changes["added"]) + len(changes["removed"]),
+                     "shards_written": shards["written"] if changed else 0,
+                     "resumed_steps": journal.resumed})
+    telemetry.finish_run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,132 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from backend.http_cache import cached_request, get_default_cache
+from backend import telemetry
+from backend import transport
+
+# --- Per-host politeness settings ---
+# host -> (max concurrent requests, min seconds between request starts)
+DEFAULT_HOST_LIMITS = {
+    "www.twse.com.tw": (2, 0.5),
+    "www.tpex.org.tw": (2, 0.5),
+    "mopsov.twse.com.tw": (4, 0.25),
+    "yfinance": (2, 1.0),  # Pseudo-host for yf.Tickers batches
+}
+DEFAULT_LIMIT = (4, 0.0)
+
+
+class HostLimiter:
+    """Bounded concurrency + minimum spacing between request starts for one host."""
+
+    def __init__(self, max_concurrency, min_interval):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._sem.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self.min_interval
+        wait = start_at - now
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc):
+        self._sem.release()
+        return False
+
+
+class FetchEngine:
+    """
+    Shared fetch engine for the ETL.
+    - request()/get()/post(): on-disk cache first, then a requests call gated by the host's limiter
+    - map(): fan a function out over items on the worker pool
+    - run_stages(): run independent stages in parallel, timing each one
+    """
+
+    def __init__(self, host_limits=None, max_workers=8, default_limit=DEFAULT_LIMIT, cache=None, use_cache=True):
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        self.host_limits = dict(DEFAULT_HOST_LIMITS)
+        if host_limits:
+            self.host_limits.update(host_limits)
+        self.default_limit = default_limit
+        self.max_workers = max_workers
+        self.stage_timings = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+
+    def limiter(self, host):
+        with self._lock:
+            if host not in self._limiters:
+                conc, interval = self.host_limits.get(host, self.default_limit)
+                self._limiters[host] = HostLimiter(conc, interval)
+            return self._limiters[host]
+
+    def _send(self, method, url, **kwargs):
+        if not transport.active().polite:  # Replay / local server: no spacing needed
+            return transport.send(method, url, **kwargs)
+        host = urlparse(url).netloc
+        with self.limiter(host):
+            return transport.send(method, url, **kwargs)
+
+    def request(self, method, url, ttl="auto", **kwargs):
+        """Cache hits skip the host limiter entirely. ttl=0 forces a live request."""
+        if self.cache is None:
+            kwargs.pop("cacheable", None)
+            return self._send(method, url, **kwargs)
+        return cached_request(method, url, ttl=ttl, cache=self.cache, send=self._send, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def map(self, fn, items):
+        """Run fn over items on the worker pool. Results keep input order."""
+        return list(self._pool.map(telemetry.get_run().bind(fn), items))
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            with telemetry.get_run().stage(name):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stage_timings[name] = elapsed
+            print(f"   ⏱️ Stage '{name}' finished in {elapsed:.2f}s")
+
+    def run_stages(self, stages):
+        """
+        Run independent stages concurrently.
+        stages: {name: callable} -> returns {name: result}
+        Stages get their own threads so they never starve the fetch pool.
+        """
+        def run_one(item):
+            name, fn = item
+            with self.stage(name):
+                return fn()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(stages)), thread_name_prefix="stage") as ex:
+            futures = {name: ex.submit(run_one, (name, fn)) for name, fn in stages.items()}
+            return {name: fut.result() for name, fut in futures.items()}
+
+    def report_timings(self):
+        print("⏱️ Stage Timings (wall-clock):")
+        for name, elapsed in sorted(self.stage_timings.items(), key=lambda x: -x[1]):
+            print(f"   - {name:<16} {elapsed:7.2f}s")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
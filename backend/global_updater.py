@@ -3,10 +3,19 @@ import json
 import os
 import datetime
 from dateutil.relativedelta import relativedelta
+import sys
 import time
 
 # --- Configuration ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Allow `python backend/global_updater.py` to import backend.* modules
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from backend import telemetry
+from backend import transport
+from backend.storage import delta
+
 # Target: market_radar/frontend/public
 PUBLIC_DIR = os.path.join(BASE_DIR, "frontend", "public")
 if not os.path.exists(PUBLIC_DIR):
@@ -97,40 +106,49 @@ def fetch_prices(tickers):
             mapping[t] = t
             
     try:
-        data = yf.Tickers(" ".join(yf_tickers))
-        results = {}
-        
-        for yt in yf_tickers:
-            try:
-                # yfinance specific handling for Tickers object
-                ticker_obj = data.tickers[yt]
-                
-                # fast_info is often faster/more reliable for current price
-                fast = ticker_obj.fast_info
-                price = fast.last_price
-                prev = fast.previous_close
-                change_pct = ((price - prev) / prev) * 100
-                
-                clean_ticker = mapping[yt]
-                results[clean_ticker] = {
-                    "price": round(price, 2),
-                    "change": round(change_pct, 2)
-                }
-            except:
-                # Fallback or error
-                clean_ticker = mapping[yt]
-                results[clean_ticker] = {"price": 0, "change": 0}
-                
-        return results
+        # One taped call for the whole set (record / replay)
+        return transport.call("yf_prices", sorted(yf_tickers), lambda: _fetch_prices_live(yf_tickers, mapping))
     except Exception as e:
         print(f"   ⚠️ Price fetch failed: {e}")
         return {}
 
+def _fetch_prices_live(yf_tickers, mapping):
+    data = yf.Tickers(" ".join(yf_tickers))
+    results = {}
+    
+    run = telemetry.get_run()
+    for yt in yf_tickers:
+        start = time.perf_counter()
+        try:
+            # yfinance specific handling for Tickers object
+            ticker_obj = data.tickers[yt]
+            
+            # fast_info is often faster/more reliable for current price
+            fast = ticker_obj.fast_info
+            price = fast.last_price
+            prev = fast.previous_close
+            change_pct = ((price - prev) / prev) * 100
+            
+            clean_ticker = mapping[yt]
+            results[clean_ticker] = {
+                "price": round(price, 2),
+                "change": round(change_pct, 2)
+            }
+            run.record_request("yfinance", 200, 0, time.perf_counter() - start)
+        except:
+            # Fallback or error
+            clean_ticker = mapping[yt]
+            results[clean_ticker] = {"price": 0, "change": 0}
+            run.record_request("yfinance", None, 0, time.perf_counter() - start, error=True)
+            
+    return results
+
 def update_global_intelligence():
     print("🚀 [Global Intel] Starting Update...")
+    run = telemetry.start_run("global")
     
     # 1. Filter Events (Show Recent Past 1 Month + Future)
-    now = datetime.datetime.now()
+    now = transport.now()
     if now.year == 2026: # Trust 2026 time
         current_date = now.date()
     else:
@@ -171,7 +189,9 @@ def update_global_intelligence():
                     all_tickers_to_fetch.add(tw)
 
     # 2. Fetch Market Data
-    market_data = fetch_prices(list(all_tickers_to_fetch))
+    with run.stage("prices"):
+        market_data = fetch_prices(list(all_tickers_to_fetch))
+        run.add_rows(len(market_data))
 
     # 3. Enrich Data
     final_output = []
@@ -224,10 +244,15 @@ def update_global_intelligence():
         "events": final_output
     }
     
-    with open(JSON_PATH, "w", encoding='utf-8') as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
-    
-    print(f"✅ [Global Intel] Saved {len(final_output)} events to {JSON_PATH}")
+    # last_updated alone is not a change: identical events keep the old file (no redeploy)
+    written, digest = delta.write_json_if_changed(JSON_PATH, output, indent=2)
+    delta.write_delta("global", written, digest)
+    if written:
+        print(f"✅ [Global Intel] Saved {len(final_output)} events to {JSON_PATH}")
+    else:
+        print(f"✅ [Global Intel] No change in {len(final_output)} events, {JSON_PATH} left as is")
+    run.meta["events"] = len(final_output)
+    telemetry.finish_run()
 
 if __name__ == "__main__":
     update_global_intelligence()
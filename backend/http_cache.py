@@ -0,0 +1,343 @@
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+import datetime
+import threading
+from urllib.parse import urlencode, urlparse
+
+import requests
+
+from backend import telemetry
+from backend import transport
+
+# --- Cache Location ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.getenv("MARKET_RADAR_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "http"))
+CACHE_MAX_MB = float(os.getenv("MARKET_RADAR_CACHE_MB", "500"))
+
+# --- TTL Policy (seconds, None = immutable) ---
+IMMUTABLE = None
+TTL_REALTIME = 15          # MIS intraday quotes
+TTL_INTRADAY = 30 * 60     # Today's reports (may still be published/revised)
+TTL_RECENT_MONTH = 6 * 3600  # MOPS revenue of a month still being filed
+TTL_FX = 5 * 60            # Bank of Taiwan board rate
+TTL_DEFAULT = 3600
+
+# Reports where `date=` selects a whole month (closed once the month is over)
+MONTHLY_REPORTS = re.compile(r"FMTQIK|STOCK_DAY(?![_A-Z])")
+
+
+def _months_ago(year, month, today):
+    return (today.year - year) * 12 + (today.month - month)
+
+
+def ttl_for(url, params=None, data=None, today=None):
+    """
+    Source-aware TTL for a request.
+    - MIS realtime quotes: seconds
+    - MOPS monthly revenue: immutable once the month is 2+ months old
+    - Date-keyed TWSE/TPEx reports: immutable for past days (past months for monthly reports)
+    """
+    today = today or datetime.date.today()
+    full = url
+    if params:
+        full += ("&" if "?" in url else "?") + urlencode(sorted(params.items()))
+    host = urlparse(url).netloc
+
+    if "mis.twse.com.tw" in host:
+        return TTL_REALTIME
+    if "rate.bot.com.tw" in host:
+        return TTL_FX
+
+    # MOPS static pages (t21sc03_114_12_0.html) or ajax form (year/month)
+    m = re.search(r"t21sc03_(\d+)_(\d+)_", full)
+    if m:
+        roc_year, month = int(m.group(1)), int(m.group(2))
+    elif data and "year" in data and "month" in data:
+        roc_year, month = int(data["year"]), int(data["month"])
+    else:
+        roc_year = None
+    if roc_year is not None:
+        year = roc_year + 1911 if roc_year < 1000 else roc_year
+        return IMMUTABLE if _months_ago(year, month, today) >= 2 else TTL_RECENT_MONTH
+
+    # TWSE: date=20260213 / TPEx: d=115/02/13
+    day = None
+    m = re.search(r"[?&]date=(\d{4})(\d{2})(\d{2})", full)
+    if m:
+        day = datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    else:
+        m = re.search(r"[?&]d=(\d{2,3})(?:/|%2F)(\d{2})(?:/|%2F)(\d{2})", full)
+        if m:
+            day = datetime.date(int(m.group(1)) + 1911, int(m.group(2)), int(m.group(3)))
+    if day:
+        if MONTHLY_REPORTS.search(full):
+            return IMMUTABLE if _months_ago(day.year, day.month, today) >= 1 else TTL_INTRADAY
+        return IMMUTABLE if day < today else TTL_INTRADAY
+
+    return TTL_DEFAULT
+
+
+# --- Payload Validation ---
+# An HTTP 200 is not proof of data: MOPS answers throttling with a short page,
+# TWSE reports "no data" as stat != "OK" and TPEx as an empty table. Such bodies
+# are never cached (a past day's entry would otherwise be pinned as IMMUTABLE).
+MOPS_HOSTS = ("mops.twse.com.tw", "mopsov.twse.com.tw")
+MOPS_MIN_BYTES = 5000
+
+
+def valid_payload(url, response):
+    """Source-aware check run before a response is cached (callers may pass their own `cacheable`)."""
+    body = response.content
+    if not body:
+        return False
+    host = urlparse(url).netloc
+    if host in MOPS_HOSTS:
+        return len(body) > MOPS_MIN_BYTES and b"<table" in body.lower()
+    if ("twse.com.tw" in host or "tpex.org.tw" in host) and "json" in url.lower():
+        try:
+            payload = response.json()
+        except ValueError:
+            return False  # HTML error page at a JSON endpoint
+        if not isinstance(payload, dict):
+            return True
+        stat = payload.get("stat")
+        if stat is not None and str(stat).upper() != "OK":
+            return False
+        if "tables" in payload:
+            return any(t.get("data") for t in payload["tables"] or [] if isinstance(t, dict))
+        if "aaData" in payload:
+            return bool(payload["aaData"])
+    return True
+
+
+def cache_key(method, url, params=None, data=None):
+    # Drop cache-buster params (MIS appends _=<timestamp>)
+    url = re.sub(r"([?&])_=\d+&?", r"\1", url).rstrip("?&")
+    raw = json.dumps([method.upper(), url, sorted((params or {}).items()), sorted((data or {}).items())],
+                     ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class HTTPCache:
+    """
+    On-disk response cache (gzip per entry) with TTLs and size-bounded LRU eviction.
+    Entry file: gzip( meta-json + b"\\n" + body ). File mtime = last access.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=int(CACHE_MAX_MB * 1024 * 1024)):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = None  # key -> [size, last_access]
+        self._total = 0
+
+    # --- Index / LRU ---
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.gz")
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".gz"): continue
+                st = os.stat(os.path.join(root, name))
+                self._index[name[:-3]] = [st.st_size, st.st_mtime]
+                self._total += st.st_size
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= self.max_bytes: break
+            try: os.remove(self._path(key))
+            except OSError: pass
+            self._total -= size
+            del self._index[key]
+            self.evictions += 1
+
+    # --- Public API ---
+    def get(self, key):
+        """Return a requests.Response for a fresh entry, else None."""
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                self.misses += 1
+                return None
+        try:
+            with gzip.open(path, "rb") as f:
+                meta_line, body = f.read().split(b"\n", 1)
+            meta = json.loads(meta_line)
+        except Exception:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        if meta.get("expires_at") is not None and meta["expires_at"] < now:
+            with self._lock:
+                self.misses += 1
+                entry = self._index.pop(key, None)
+                if entry: self._total -= entry[0]
+            try: os.remove(path)
+            except OSError: pass
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index[key][1] = now
+        try: os.utime(path, (now, now))
+        except OSError: pass
+        return _build_response(meta, body)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def put(self, key, response, ttl):
+        if response.status_code != 200:
+            return
+        meta = {
+            "url": response.url,
+            "status": response.status_code,
+            "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+            "stored_at": time.time(),
+            "expires_at": None if ttl is IMMUTABLE else time.time() + ttl,
+        }
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n" + response.content)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._load_index()
+            old = self._index.get(key)
+            if old: self._total -= old[0]
+            self._index[key] = [size, time.time()]
+            self._total += size
+            self.stores += 1
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            self._load_index()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0,
+                "stores": self.stores,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total,
+            }
+
+    def report(self):
+        s = self.stats()
+        print(f"🗄️ HTTP Cache: {s['hits']} hits / {s['misses']} misses "
+              f"(hit rate {s['hit_rate']:.0%}), {s['entries']} entries, {s['bytes'] / 1e6:.1f} MB"
+              + (f", {s['rejected']} invalid payloads not cached" if s['rejected'] else ""))
+
+
+def _build_response(meta, body):
+    r = requests.models.Response()
+    r.status_code = meta.get("status", 200)
+    r._content = body
+    r.url = meta.get("url", "")
+    r.headers.update(meta.get("headers", {}))
+    r.headers["X-Cache"] = "HIT"
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+
+# --- Shared default cache ---
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HTTPCache()
+        return _default_cache
+
+
+def _send_recorded(send, method, url, **kwargs):
+    """Live request, recorded in the run telemetry (status, bytes, time, errors)."""
+    run = telemetry.get_run()
+    start = time.perf_counter()
+    try:
+        r = (send or transport.send)(method, url, **kwargs)
+    except Exception:
+        run.record_request(url, None, 0, time.perf_counter() - start, error=True)
+        raise
+    run.record_request(url, r.status_code, len(r.content), time.perf_counter() - start,
+                       error=r.status_code >= 400)
+    return r
+
+
+def cached_request(method, url, params=None, data=None, ttl="auto", cache=None, send=None, cacheable=None, **kwargs):
+    """
+    requests.request with the shared on-disk cache in front.
+    ttl="auto" uses ttl_for(); ttl=0 bypasses the cache.
+    send: optional callable(method, url, **kwargs) used on a miss (e.g. a rate-limited engine).
+    cacheable: optional callable(response) -> bool; defaults to valid_payload(). Rejected bodies are not stored.
+    """
+    if ttl == "auto":
+        ttl = ttl_for(url, params, data)
+    if ttl == 0 or not transport.active().uses_cache:  # record / replay always reach the transport
+        return _send_recorded(send, method, url, params=params, data=data, **kwargs)
+
+    cache = cache or get_default_cache()
+    key = cache_key(method, url, params, data)
+    hit = cache.get(key)
+    if hit is not None:
+        telemetry.get_run().record_request(url, hit.status_code, len(hit.content), cache_hit=True)
+        return hit
+
+    r = _send_recorded(send, method, url, params=params, data=data, **kwargs)
+    if r.status_code != 200:
+        return r
+    try:
+        ok = cacheable(r) if cacheable else valid_payload(r.url or url, r)
+    except Exception:
+        ok = False
+    if not ok:
+        cache.reject()
+        return r
+    try:
+        cache.put(key, r, ttl)
+    except Exception as e:
+        print(f"   ⚠️ Cache write failed: {e}")
+    return r
+
+
+def cached_get(url, **kwargs):
+    return cached_request("GET", url, **kwargs)
+
+
+def cached_post(url, **kwargs):
+    return cached_request("POST", url, **kwargs)
+
+
+def is_cache_hit(response):
+    return response.headers.get("X-Cache") == "HIT"
@@ -0,0 +1,229 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend import telemetry
+
+# --- Pooled HTTP Sessions ---
+# One requests.Session per host (keep-alive, bounded urllib3 pool) so the ETL
+# stops paying a TCP + TLS handshake per request. On top of it:
+# - retries with exponential backoff + full jitter on 429 / 5xx / connection errors
+#   (Retry-After is honoured for 429/503)
+# - a per-host circuit breaker: after N consecutive failures the host is "open" and
+#   requests fail immediately with CircuitOpenError (a requests.ConnectionError, so
+#   the fetchers' existing fallbacks apply) until the cooldown lets one probe through.
+# New vs reused connections, retries, short-circuits and breaker state go to telemetry.
+
+POOL_MAXSIZE = 8           # Connections kept per host (>= FetchEngine host concurrency)
+MAX_RETRIES = 2            # Extra attempts after the first one
+BACKOFF_BASE = 0.5         # Seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 8.0
+RETRY_AFTER_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# host -> (consecutive failures to open, seconds open before a half-open probe)
+BREAKER_DEFAULT = (5, 60.0)
+BREAKER_OVERRIDES = {
+    "mopsov.twse.com.tw": (3, 120.0),  # MOPS throttles by dropping connections
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Host breaker is open; the request was not sent."""
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after(r):
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(RETRY_AFTER_CAP, max(0.0, float(value)))
+    except ValueError:
+        pass
+    try:
+        return min(RETRY_AFTER_CAP, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """closed -> (threshold consecutive failures) -> open -> (cooldown) -> half_open -> closed | open"""
+
+    def __init__(self, host, threshold, cooldown):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._set(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True  # Exactly one probe; everyone else keeps failing fast
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set(CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                self._set(OPEN)
+                print(f"   🔌 Circuit OPEN for {self.host} after {self.failures} failures "
+                      f"(cooldown {self.cooldown:.0f}s)")
+
+    def release(self):
+        """The attempt ended without a verdict (not a network error or a response): free the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def _set(self, state):
+        self.state = state
+        telemetry.get_run().record_breaker(self.host, state, self.trips)
+
+    def snapshot(self):
+        return {"state": self.state, "failures": self.failures, "trips": self.trips}
+
+
+class SessionPool:
+    """Per-host sessions + breakers. request() is the only entry point."""
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE, max_retries=MAX_RETRIES):
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self._sessions = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def session(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                s = requests.Session()
+                # Retries are ours (backoff + breaker), not urllib3's
+                # pool_connections: urllib3 keys pools by TLS settings too (verify=False gets its own)
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, max_retries=0)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                self._sessions[host] = s
+            return self._sessions[host]
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                threshold, cooldown = BREAKER_OVERRIDES.get(host, BREAKER_DEFAULT)
+                self._breakers[host] = CircuitBreaker(host, threshold, cooldown)
+            return self._breakers[host]
+
+    @staticmethod
+    def _connections_opened(session, url):
+        pools = session.get_adapter(url).poolmanager.pools
+        total = 0
+        for key in pools.keys():
+            try: total += pools[key].num_connections
+            except KeyError: pass  # Evicted meanwhile
+        return total
+
+    def _send_once(self, session, method, url, **kwargs):
+        """One attempt; counts whether it had to open a new connection."""
+        before = self._connections_opened(session, url)
+        try:
+            return session.request(method, url, **kwargs)
+        finally:
+            new = self._connections_opened(session, url) > before
+            telemetry.get_run().record_connection(url, new=new)
+
+    def request(self, method, url, **kwargs):
+        host = urlparse(url).netloc
+        breaker = self.breaker(host)
+        session = self.session(host)
+        run = telemetry.get_run()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                run.record_short_circuit(url)
+                raise CircuitOpenError(f"circuit open for {host}")
+            verdict = False
+            try:
+                r = self._send_once(session, method, url, **kwargs)
+                verdict = True
+            except requests.Timeout:
+                verdict = True
+                breaker.failure()  # A read timeout already cost the full timeout; don't repeat it
+                raise
+            except requests.ConnectionError:
+                verdict = True
+                breaker.failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                if r.status_code not in RETRY_STATUSES:
+                    breaker.success()
+                    return r
+                breaker.failure()
+                if attempt >= self.max_retries:
+                    return r  # Callers see the final 429/5xx as before
+                delay = _retry_after(r) if r.status_code in (429, 503) else None
+                if delay is None:
+                    delay = backoff_delay(attempt)
+            finally:
+                if not verdict:
+                    breaker.release()  # Any other exception must not keep a half-open probe taken forever
+            attempt += 1
+            run.record_retry(host)
+            time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            return {host: b.snapshot() for host, b in self._breakers.items()}
+
+    def close(self):
+        with self._lock:
+            for s in self._sessions.values():
+                s.close()
+            self._sessions.clear()
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_pool():
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SessionPool()
+        return _default_pool
+
+
+def request(method, url, **kwargs):
+    return get_pool().request(method, url, **kwargs)
@@ -0,0 +1,276 @@
+import os
+
+import numpy as np
+
+# --- Vectorized Technical Indicator Engine ---
+# Every indicator is computed for the whole universe at once over a
+# (stocks x days) matrix. Recursive indicators (EMA / Wilder smoothing) step
+# through days with one vector op across all stocks; windowed ones (MA, volume
+# ratio, 52-week range) reduce the trailing window matrix. Nothing loops per stock.
+#
+# compute(...)  full history -> (latest values, state)
+# step(state, bar) one new bar -> (latest values, state), O(stocks x window)
+# The state carries the EMA values plus the trailing windows, so step() gives
+# the same numbers as a full recompute that includes the new day.
+
+MA_WINDOWS = (5, 20, 60)
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+VOLUME_WINDOW = 20
+YEAR_WINDOW = 250  # 52 weeks of trading days
+WINDOW = YEAR_WINDOW  # Longest trailing window kept in the state
+
+STATE_VERSION = 1
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_PATH = os.path.join(BASE_DIR, "data", "indicator_state.npz")
+
+OUTPUT_FIELDS = (
+    "ma5", "ma20", "ma60", "rsi14", "macd", "macd_signal", "macd_hist",
+    "atr14", "atr_pct", "volume_ratio", "high_52w", "low_52w", "pct_from_high", "pct_from_low",
+)
+
+
+def _alpha(span):
+    return 2.0 / (span + 1)
+
+
+def _ffill(a):
+    """Forward-fill NaN along days (suspended days carry the last close)."""
+    mask = np.isnan(a)
+    idx = np.where(~mask, np.arange(a.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    out = a[np.arange(a.shape[0])[:, None], idx]
+    out[np.cumsum(~mask, axis=1) == 0] = np.nan  # Before the first trade
+    return out
+
+
+def _ema_update(prev, x, alpha):
+    """One EMA step; NaN inputs keep the previous value, NaN prev seeds from x."""
+    out = np.where(np.isnan(prev), x, prev + alpha * (x - prev))
+    return np.where(np.isnan(x), prev, out)
+
+
+def _wilder_update(prev, x, period):
+    return _ema_update(prev, x, 1.0 / period)
+
+
+def _tail_mean(window, n):
+    """Mean of the last n columns ignoring NaN (NaN when none)."""
+    tail = window[:, -n:]
+    count = np.sum(~np.isnan(tail), axis=1)
+    total = np.nansum(tail, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count == n, total / np.maximum(count, 1), np.nan)
+
+
+def _window_max(window):
+    with np.errstate(all="ignore"):
+        out = np.nanmax(np.where(np.isnan(window), -np.inf, window), axis=1)
+    return np.where(np.isinf(out), np.nan, out)
+
+
+def _window_min(window):
+    with np.errstate(all="ignore"):
+        out = np.nanmin(np.where(np.isnan(window), np.inf, window), axis=1)
+    return np.where(np.isinf(out), np.nan, out)
+
+
+def _empty_state(codes):
+    n = len(codes)
+    nan = lambda: np.full(n, np.nan)
+    return {
+        "version": STATE_VERSION,
+        "codes": np.asarray(codes, dtype=str),
+        "last_date": "",
+        "close_win": np.full((n, WINDOW), np.nan),
+        "high_win": np.full((n, WINDOW), np.nan),
+        "low_win": np.full((n, WINDOW), np.nan),
+        "vol_win": np.full((n, WINDOW), np.nan),
+        "prev_close": nan(),
+        "ema_fast": nan(), "ema_slow": nan(), "macd_signal": nan(),
+        "avg_gain": nan(), "avg_loss": nan(), "atr": nan(),
+        "bars": np.zeros(n, dtype=np.int64),
+    }
+
+
+def _advance(state, close, high, low, volume, windows=True):
+    """
+    Fold one bar (vectors over stocks) into the recursive state. Missing bars
+    (NaN close) keep the state; the windows shift with the last close repeated.
+    compute() skips the window shift and fills the windows once at the end.
+    """
+    traded = ~np.isnan(close)
+    prev = state["prev_close"]
+    close_f = np.where(traded, close, prev)
+    high_f = np.where(traded & ~np.isnan(high), high, close_f)
+    low_f = np.where(traded & ~np.isnan(low), low, close_f)
+
+    # RSI (Wilder): gains / losses vs the previous close
+    change = np.where(traded & ~np.isnan(prev), close - prev, np.nan)
+    state["avg_gain"] = _wilder_update(state["avg_gain"], np.where(np.isnan(change), np.nan, np.maximum(change, 0)), RSI_PERIOD)
+    state["avg_loss"] = _wilder_update(state["avg_loss"], np.where(np.isnan(change), np.nan, np.maximum(-change, 0)), RSI_PERIOD)
+
+    # ATR (Wilder): true range needs the previous close
+    tr = np.where(traded, np.fmax(high_f - low_f, np.fmax(np.abs(high_f - prev), np.abs(low_f - prev))), np.nan)
+    state["atr"] = _wilder_update(state["atr"], tr, ATR_PERIOD)
+
+    # MACD: EMA12 - EMA26, signal EMA9
+    x = np.where(traded, close, np.nan)
+    state["ema_fast"] = _ema_update(state["ema_fast"], x, _alpha(MACD_FAST))
+    state["ema_slow"] = _ema_update(state["ema_slow"], x, _alpha(MACD_SLOW))
+    macd = np.where(traded, state["ema_fast"] - state["ema_slow"], np.nan)
+    state["macd_signal"] = _ema_update(state["macd_signal"], macd, _alpha(MACD_SIGNAL))
+
+    # Trailing windows (ring shift by one column)
+    if windows:
+        for key, val in (("close_win", close_f), ("high_win", high_f), ("low_win", low_f),
+                         ("vol_win", np.where(traded, np.nan_to_num(volume), np.where(np.isnan(prev), np.nan, 0.0)))):
+            win = state[key]
+            win[:, :-1] = win[:, 1:]
+            win[:, -1] = val
+
+    state["prev_close"] = close_f
+    state["bars"] = state["bars"] + traded
+    return state
+
+
+def _latest(state):
+    """Indicator values from the state (vectors over stocks)."""
+    close = state["prev_close"]
+    out = {f"ma{w}": _tail_mean(state["close_win"], w) for w in MA_WINDOWS}
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gain, loss = state["avg_gain"], state["avg_loss"]
+        rsi = np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), 100 - 100 / (1 + gain / loss))
+        rsi = np.where(state["bars"] > RSI_PERIOD, rsi, np.nan)
+        out["rsi14"] = rsi
+
+        ready = state["bars"] >= MACD_SLOW
+        macd = state["ema_fast"] - state["ema_slow"]
+        out["macd"] = np.where(ready, macd, np.nan)
+        out["macd_signal"] = np.where(ready, state["macd_signal"], np.nan)
+        out["macd_hist"] = out["macd"] - out["macd_signal"]
+
+        atr = np.where(state["bars"] > ATR_PERIOD, state["atr"], np.nan)
+        out["atr14"] = atr
+        out["atr_pct"] = atr / close * 100
+
+        avg_vol = _tail_mean(state["vol_win"], VOLUME_WINDOW)
+        out["volume_ratio"] = np.where(avg_vol > 0, state["vol_win"][:, -1] / avg_vol, np.nan)
+
+        # 52-week range only once the window spans a full year (a short store is not a 52-week high)
+        full = ~np.isnan(state["high_win"][:, 0])
+        high = np.where(full, _window_max(state["high_win"]), np.nan)
+        low = np.where(full, _window_min(state["low_win"]), np.nan)
+        out["high_52w"], out["low_52w"] = high, low
+        out["pct_from_high"] = (close / high - 1) * 100
+        out["pct_from_low"] = (close / low - 1) * 100
+    return out
+
+
+def compute(codes, dates, close, high=None, low=None, volume=None):
+    """
+    Full computation over (stocks x days) matrices (NaN = no trade).
+    Returns (latest {field: vector}, state).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n, days = close.shape
+    high = np.asarray(high, dtype=np.float64) if high is not None else close
+    low = np.asarray(low, dtype=np.float64) if low is not None else close
+    volume = np.asarray(volume, dtype=np.float64) if volume is not None else np.zeros_like(close)
+
+    state = _empty_state(codes)
+    # Recursive indicators: one vector op per day across all stocks
+    for t in range(days):
+        _advance(state, close[:, t], high[:, t], low[:, t], volume[:, t], windows=False)
+
+    # Trailing windows straight from the matrix tail (same values step() would have shifted in)
+    traded = ~np.isnan(close)
+    close_f = _ffill(close)
+    high_f = np.where(traded & ~np.isnan(high), high, close_f)
+    low_f = np.where(traded & ~np.isnan(low), low, close_f)
+    vol_f = np.where(traded, np.nan_to_num(volume), np.where(np.isnan(close_f), np.nan, 0.0))
+    k = min(days, WINDOW)
+    for key, mat in (("close_win", close_f), ("high_win", high_f), ("low_win", low_f), ("vol_win", vol_f)):
+        if k: state[key][:, -k:] = mat[:, -k:]
+    if days:
+        state["last_date"] = str(dates[-1])
+    return _latest(state), state
+
+
+def step(state, date, close, high=None, low=None, volume=None):
+    """
+    Incremental update with one new bar (vectors aligned to state["codes"]).
+    Returns (latest {field: vector}, state).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64) if high is not None else close
+    low = np.asarray(low, dtype=np.float64) if low is not None else close
+    volume = np.asarray(volume, dtype=np.float64) if volume is not None else np.zeros_like(close)
+    _advance(state, close, high, low, volume)
+    state["last_date"] = str(date)
+    return _latest(state), state
+
+
+def to_records(codes, latest, ndigits=2):
+    """{code: {field: value}} with NaN -> None (JSON-safe)."""
+    cols = {k: np.round(latest[k], ndigits) for k in OUTPUT_FIELDS}
+    out = {}
+    for i, code in enumerate(codes):
+        out[str(code)] = {k: (None if np.isnan(cols[k][i]) else float(cols[k][i])) for k in OUTPUT_FIELDS}
+    return out
+
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, **{k: np.asarray(v) for k, v in state.items()})
+    os.replace(tmp, path)
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as z:
+            state = {k: z[k] for k in z.files}
+        state["version"] = int(state["version"])
+        state["last_date"] = str(state["last_date"])
+        if state["version"] != STATE_VERSION:
+            return None
+        return state
+    except Exception as e:
+        print(f"⚠️ Failed to load indicator state: {e}")
+        return None
+
+
+def update_from_store(store, state_path=None, lookback=WINDOW + 60):
+    """
+    Indicators for the latest stored day.
+    - state one day behind with the same universe: step() with the new bar
+    - otherwise: full compute() over the last `lookback` days
+    Returns ({code: indicators}, mode).
+    """
+    state_path = state_path or STATE_PATH
+    days = store.days()
+    if not days:
+        return {}, "empty"
+    state = load_state(state_path)
+    last = days[-1]
+    mode = "full"
+    if state is not None and state["last_date"] == last:
+        latest, mode = _latest(state), "cached"
+    elif state is not None and len(days) >= 2 and state["last_date"] == days[-2]:
+        cross = store.cross_section(last)
+        if cross.index.difference(state["codes"]).empty:  # New listings need a full pass
+            bar = cross.reindex(state["codes"])
+            latest, state = step(state, last, bar["close"].to_numpy(), bar["high"].to_numpy(),
+                                 bar["low"].to_numpy(), bar["volume"].to_numpy())
+            mode = "incremental"
+    if mode == "full":
+        codes, dates, m = store.matrix(lookback)
+        latest, state = compute(codes, dates, m["close"], m["high"], m["low"], m["volume"])
+    if mode != "cached":
+        save_state(state, state_path)
+    return to_records(state["codes"], latest), mode
@@ -1,8 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-import json
 import os
+import time
+from fastapi import Request, HTTPException
+from backend.data_store import DataStore
+from backend.screener import SCREENER_FIELDS
+from backend.realtime import RealtimeStore, MISPoller, MIS_URL, POLL_INTERVAL, DEFAULT_WATCHLIST, UNIVERSE_INTERVAL, UNIVERSE_CHUNK_PAUSE
 
 app = FastAPI(title="Market Radar API (JSON Mode)", version="3.0.0")
 
@@ -16,17 +20,45 @@ app.add_middleware(
 )
 
 DATA_FILE = "stock_data.json"
+STORE_DIR = os.path.join("data", "stock_store")
 
-def load_data():
-    """Reads the JSON file from disk."""
-    if not os.path.exists(DATA_FILE):
-        return {}
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"⚠️ Error reading data file: {e}")
-        return {}
+MACRO_DATA_FILE = "macro_data.json"
+GLOBAL_DATA_FILE = "global_data.json"
+
+# Loaded once, hot-reloaded when the files' mtime/size change
+DATA = DataStore(DATA_FILE, MACRO_DATA_FILE, GLOBAL_DATA_FILE, store_dir=STORE_DIR)
+
+# Intraday MIS quotes, polled in the background (opt-in: MARKET_RADAR_REALTIME=1)
+# MARKET_RADAR_WATCHLIST: "2330,2317,..." (default: a few large caps) or "all" to opt in to
+# every stock in the current snapshot, polled every UNIVERSE_INTERVAL seconds with paced chunks
+REALTIME = RealtimeStore()
+WATCHLIST = os.getenv("MARKET_RADAR_WATCHLIST", DEFAULT_WATCHLIST).strip()
+FULL_UNIVERSE = WATCHLIST == "all"
+
+def realtime_watchlist():
+    if FULL_UNIVERSE:
+        return sorted(c for c in DATA.stock.get().data if len(c) == 4)
+    return [c.strip() for c in WATCHLIST.split(",")]
+
+POLLER = MISPoller(REALTIME, realtime_watchlist, base_url=MIS_URL,
+                   interval=max(POLL_INTERVAL, UNIVERSE_INTERVAL) if FULL_UNIVERSE else POLL_INTERVAL,
+                   chunk_pause=UNIVERSE_CHUNK_PAUSE if FULL_UNIVERSE else 0.0,
+                   always=os.getenv("MARKET_RADAR_REALTIME_ALWAYS") == "1")
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else request.url.path
+    DATA.latency.record(endpoint, (time.perf_counter() - start) * 1000)
+    return response
+
+def find_stock(query):
+    """Point lookup by ID, exact name, then ranked name match (prebuilt index)."""
+    snap = DATA.stock.get()
+    code = snap.derived["search"].lookup(query)
+    return snap.data.get(code) if code else None
 
 @app.on_event("startup")
 async def startup_event():
@@ -36,29 +68,26 @@ async def startup_event():
         print("⚠️ Warning: stock_data.json not found. Run 'python backend/data_updater.py' first.")
     else:
         print("✅ stock_data.json detected.")
+    if os.getenv("MARKET_RADAR_REALTIME") == "1":
+        POLLER.start()
+        print(f"📡 Realtime poller started ({MIS_URL}, every {POLLER.interval:.0f}s)")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    POLLER.stop()
 
 @app.get("/")
 def read_root():
     return {"status": "Online", "mode": "JSON Read-Only"}
-from backend.analysis import generate_ai_report
+from backend.analysis import AIReportService
+
+# One service per process: shared Gemini client, report cache, rate limiter
+AI = AIReportService.from_env()
 
 @app.get("/api/stock/{query}/dashboard")
-def get_stock_dashboard(query: str):
+async def get_stock_dashboard(query: str):
     # Strictly Read-Only. No logic.
-    data_store = load_data()
-    
-    # 1. Try Direct Match (Stock ID)
-    stock_data = data_store.get(query)
-    
-    # 2. Try Name Search if no ID match (iterate dict)
-    if not stock_data:
-        for code, info in data_store.items():
-            # Exact or Partial Name Match
-            name = info.get('stock_name', '')
-            if query == name or (len(query) > 1 and query in name):
-                stock_data = info
-                # Add ID alias to ensure frontend works
-                break
+    stock_data = find_stock(query)
     
     if not stock_data:
         return {
@@ -68,8 +97,8 @@ def get_stock_dashboard(query: str):
             "note": "No data in stock_data.json"
         }
     
-    # On-the-fly AI Analysis
-    ai_report = generate_ai_report(stock_data)
+    # AI Analysis: precomputed (ETL) -> cached -> on-the-fly (async, rate limited)
+    ai_report = await AI.report(stock_data)
         
     return {
         "stock_id": stock_data.get('stock_id'),
@@ -77,41 +106,90 @@ def get_stock_dashboard(query: str):
         "valuation": stock_data.get('valuation'),
         "revenue": stock_data.get('revenue'),
         "chips": stock_data.get('chips'),
+        "technicals": stock_data.get('technicals'),
         "analysis": ai_report
     }
 
-MACRO_DATA_FILE = "macro_data.json"
+@app.get("/api/search")
+def search_stocks(q: str = "", limit: int = 10):
+    """Autocomplete: top-N ranked candidates by ID prefix / name substring."""
+    index = DATA.stock.get().derived["search"]
+    return {"query": q, "results": index.search(q, max(1, min(limit, 50)))}
+
+@app.get("/api/screener")
+def screen_stocks(request: Request, sort: str = "score", order: str = "desc", offset: int = 0, limit: int = 50):
+    """
+    Multi-field range screener, e.g.
+    /api/screener?current_pe_max=15&yoy_min=20&foreign_net_min=1000&sort=yoy
+    Filters: <field>_min / <field>_max (inclusive) for any of SCREENER_FIELDS.
+    """
+    filters = {}
+    for key, value in request.query_params.items():
+        field, _, bound = key.rpartition("_")
+        if bound not in ("min", "max"): continue
+        if field not in SCREENER_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Unknown filter field: {field}")
+        try: value = float(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{key} must be a number")
+        lo, hi = filters.get(field, (None, None))
+        filters[field] = (value, hi) if bound == "min" else (lo, value)
+    if sort not in SCREENER_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort field: {sort}")
+
+    index = DATA.stock.get().derived["screener"]
+    result = index.query(filters, sort=sort, descending=(order != "asc"), offset=offset, limit=limit)
+    return {"filters": filters, "sort": sort, "order": "asc" if order == "asc" else "desc", **result}
 
 @app.get("/api/macro/dashboard")
 def get_macro_dashboard():
     """
     Read-Only Endpoint for Macro Data.
-    Zero latency, reads pre-computed JSON.
+    Served from the in-memory snapshot (reloaded when the file changes).
     """
-    if not os.path.exists(MACRO_DATA_FILE):
+    data = DATA.macro.data
+    if data is None:
         return {"status": "No Data", "note": "Run python -m backend.scrapers.macro first"}
-    
-    try:
-        with open(MACRO_DATA_FILE, "r", encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        return {"error": str(e)}
-
-GLOBAL_DATA_FILE = "global_data.json"
+    return data
 
 @app.get("/api/global/dashboard")
 def get_global_dashboard():
     """
     Read-Only Endpoint for Global Intelligence Data.
     """
-    if not os.path.exists(GLOBAL_DATA_FILE):
+    data = DATA.global_intel.data
+    if data is None:
         return {"status": "No Data", "events": []}
-    
-    try:
-        with open(GLOBAL_DATA_FILE, "r", encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        return {"error": str(e), "events": []}
+    return data
+
+@app.get("/api/realtime")
+def get_realtime(codes: str = ""):
+    """Poller status; with ?codes=2330,2317 also the latest quote of each."""
+    out = {"status": POLLER.status()}
+    if codes:
+        out["quotes"] = {c: REALTIME.latest(c) for c in codes.split(",")[:200]}
+    return out
+
+@app.get("/api/realtime/{code}")
+def get_realtime_quote(code: str):
+    """Latest MIS quote for one symbol (from memory)."""
+    quote = REALTIME.latest(code)
+    if quote is None:
+        raise HTTPException(status_code=404, detail=f"No realtime quote for {code}")
+    return quote
+
+@app.get("/api/realtime/{code}/series")
+def get_realtime_series(code: str, since: int = 0, limit: int = 0):
+    """Intraday ticks (ts ms, price, accumulated volume), oldest first; since=<ts ms> for increments."""
+    series = REALTIME.series(code, since=since, limit=max(0, limit) or None)
+    if series is None:
+        raise HTTPException(status_code=404, detail=f"No realtime series for {code}")
+    return {"stock_id": code, "count": len(series["ts"]), **series}
+
+@app.get("/api/metrics")
+def get_metrics():
+    """Per-endpoint latency (p50/p95/max), dataset reload counters, AI report cache, realtime poller."""
+    return {**DATA.metrics(), "ai_reports": AI.stats, "realtime": POLLER.status()}
 
 if __name__ == "__main__":
     uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
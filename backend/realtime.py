@@ -0,0 +1,405 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Allow `python backend/realtime.py` to import backend.* modules
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from backend import transport
+
+# --- Intraday Realtime Quotes (TWSE MIS) ---
+# getStockInfo.jsp takes many channels at once: ex_ch=tse_2330.tw|otc_6488.tw|...
+# The poller walks the watchlist in chunks of CHUNK_SIZE channels every POLL_INTERVAL
+# seconds during market hours. Each new trade goes into a fixed-size NumPy ring buffer
+# for its symbol, and the API serves the latest quote and intraday series from memory.
+# Markets (tse / otc) are discovered: unknown codes are asked as tse first, then otc.
+#
+#   python backend/realtime.py serve-mis --port 8766            (local stand-in MIS)
+#   python backend/realtime.py poll --url http://127.0.0.1:8766 --watchlist 2330,2317 --always
+#   MARKET_RADAR_REALTIME=1 MARKET_RADAR_MIS_URL=http://127.0.0.1:8766 uvicorn backend.main:app
+
+MIS_URL = os.getenv("MARKET_RADAR_MIS_URL", "https://mis.twse.com.tw")
+MIS_PATH = "/stock/api/getStockInfo.jsp"
+MIS_HOME = "/stock/index.jsp"  # Sets the session cookie getStockInfo expects
+CHUNK_SIZE = int(os.getenv("MARKET_RADAR_MIS_CHUNK", "100"))
+POLL_INTERVAL = float(os.getenv("MARKET_RADAR_MIS_INTERVAL", "10"))
+RING_SIZE = 2048  # Ticks kept per symbol (a full session at the default cadence)
+MIS_TIMEOUT = 5
+REDISCOVER_CYCLES = 30  # Codes MIS knows under neither market are asked again after this many cycles
+# Default watchlist: a handful of large caps. The whole universe (~20 chunks) is an
+# explicit opt-in and polls at a lower rate, with a pause between chunk requests.
+DEFAULT_WATCHLIST = "2330,2317,2454,2308,2382,2881,2882,2412,2303,3711"
+UNIVERSE_INTERVAL = float(os.getenv("MARKET_RADAR_MIS_UNIVERSE_INTERVAL", "60"))
+UNIVERSE_CHUNK_PAUSE = 1.0
+
+TAIPEI = ZoneInfo("Asia/Taipei")
+MARKET_OPEN = (9, 0)
+MARKET_CLOSE = (13, 35)  # 13:30 close + the closing auction print
+
+
+def market_open(now=None):
+    now = now or datetime.now(TAIPEI)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= (now.hour, now.minute) < MARKET_CLOSE
+
+
+def _num(value):
+    """MIS numbers are strings; '-' / '' mean no value."""
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_level(book):
+    """'1045.0000_1040.0000_' -> 1045.0"""
+    return _num(str(book or "").split("_")[0])
+
+
+def parse_mis(data):
+    """getStockInfo JSON -> [quote dict] (one per channel that came back)."""
+    quotes = []
+    for row in (data or {}).get("msgArray", []):
+        code = row.get("c")
+        if not code:
+            continue
+        price = _num(row.get("z"))  # None when there is no trade print yet ('-'); bid / ask are separate
+        prev = _num(row.get("y"))
+        try: ts = int(row.get("tlong"))
+        except (TypeError, ValueError): ts = int(time.time() * 1000)
+        quotes.append({
+            "code": code,
+            "name": row.get("n", ""),
+            "market": row.get("ex", ""),
+            "price": price,
+            "open": _num(row.get("o")),
+            "high": _num(row.get("h")),
+            "low": _num(row.get("l")),
+            "prev_close": prev,
+            "change": round(price - prev, 2) if price is not None and prev else None,
+            "change_percent": round((price - prev) / prev * 100, 2) if price is not None and prev else None,
+            "volume": int(_num(row.get("v")) or 0),  # Accumulated lots
+            "bid": _first_level(row.get("b")),
+            "ask": _first_level(row.get("a")),
+            "ts": ts,
+        })
+    return quotes
+
+
+class TickRing:
+    """Fixed-size ring of (ts ms, price, accumulated volume) for one symbol."""
+    __slots__ = ("ts", "price", "volume", "head", "count")
+
+    def __init__(self, capacity=RING_SIZE):
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.int64)
+        self.head = 0
+        self.count = 0
+
+    @property
+    def capacity(self):
+        return len(self.ts)
+
+    def last_ts(self):
+        return int(self.ts[self.head - 1]) if self.count else 0
+
+    def append(self, ts, price, volume):
+        i = self.head
+        self.ts[i] = ts
+        self.price[i] = price
+        self.volume[i] = volume
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def series(self, since=0, limit=None):
+        """Oldest -> newest, ticks newer than `since` (ms), at most the last `limit`."""
+        idx = (np.arange(self.count) + self.head - self.count) % self.capacity
+        if since:
+            idx = idx[self.ts[idx] > since]
+        if limit:
+            idx = idx[-limit:]
+        return self.ts[idx], self.price[idx], self.volume[idx]
+
+
+class RealtimeStore:
+    """Latest quote + tick ring per symbol. Written by the poller thread, read by the API."""
+
+    def __init__(self, ring_size=RING_SIZE):
+        self.ring_size = ring_size
+        self.quotes = {}
+        self.rings = {}
+        self.ticks = 0
+        self._lock = threading.Lock()
+
+    def update(self, quotes):
+        """Store quotes; a tick is appended only when MIS has a newer trade time. Returns ticks added."""
+        added = 0
+        with self._lock:
+            for q in quotes:
+                self.quotes[q["code"]] = q
+                if q["price"] is None:
+                    continue
+                ring = self.rings.get(q["code"])
+                if ring is None:
+                    ring = self.rings[q["code"]] = TickRing(self.ring_size)
+                if q["ts"] > ring.last_ts():
+                    ring.append(q["ts"], q["price"], q["volume"])
+                    added += 1
+            self.ticks += added
+        return added
+
+    def latest(self, code):
+        with self._lock:
+            return self.quotes.get(code)
+
+    def series(self, code, since=0, limit=None):
+        with self._lock:
+            ring = self.rings.get(code)
+            if ring is None:
+                return None
+            ts, price, volume = ring.series(since, limit)
+            return {"ts": ts.tolist(), "price": price.tolist(), "volume": volume.tolist()}
+
+    def stats(self):
+        with self._lock:
+            return {"symbols": len(self.quotes), "ticks": self.ticks,
+                    "ring_size": self.ring_size, "ring_mb": round(len(self.rings) * self.ring_size * 24 / 1e6, 2)}
+
+
+class MISPoller:
+    """
+    Polls MIS for a watchlist on a fixed cadence (background thread).
+    watchlist: list of codes, or a callable returning one (e.g. the whole universe).
+    """
+
+    def __init__(self, store, watchlist, base_url=MIS_URL, chunk_size=CHUNK_SIZE, interval=POLL_INTERVAL,
+                 always=False, chunk_pause=0.0):
+        self.store = store
+        self.watchlist = watchlist
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.chunk_pause = chunk_pause  # Seconds between chunk requests within a cycle
+        self.always = always  # Ignore market hours (stand-in server / tests)
+        self.markets = {}     # code -> "tse" / "otc" once MIS has answered for it
+        self.unresolved = {}  # code -> cycle it was last looked up in vain (suspended, delisted, typo)
+        self.stats = {"cycles": 0, "requests": 0, "errors": 0, "last_cycle_ms": 0.0, "last_cycle_at": None,
+                      "last_error": None, "unresolved": 0}
+        self._stats_lock = threading.Lock()  # stats are written by the poller thread, read by the API
+        self._stop = threading.Event()
+        self._thread = None
+        self._warm = False
+
+    def _count(self, key, error=None):
+        with self._stats_lock:
+            self.stats[key] += 1
+            if error is not None:
+                self.stats["last_error"] = str(error)
+
+    def codes(self):
+        wl = self.watchlist() if callable(self.watchlist) else self.watchlist
+        return [c for c in wl if c]
+
+    def _get(self, channels):
+        url = f"{self.base_url}{MIS_PATH}"
+        params = {"ex_ch": "|".join(channels), "json": "1", "delay": "0", "_": str(int(time.time() * 1000))}
+        self._count("requests")
+        r = transport.send("GET", url, params=params, timeout=MIS_TIMEOUT)
+        r.raise_for_status()
+        return parse_mis(r.json())
+
+    def _warm_up(self):
+        if self._warm:
+            return
+        try: transport.send("GET", f"{self.base_url}{MIS_HOME}", timeout=MIS_TIMEOUT)
+        except Exception: pass
+        self._warm = True
+
+    def _fetch(self, pairs):
+        """[(code, market)] in chunks -> quotes. A failed chunk is skipped (counted in stats)."""
+        quotes = []
+        for i in range(0, len(pairs), self.chunk_size):
+            chunk = pairs[i:i + self.chunk_size]
+            if i and self.chunk_pause and self._stop.wait(self.chunk_pause):
+                break
+            try:
+                quotes.extend(self._get([f"{market}_{code}.tw" for code, market in chunk]))
+            except Exception as e:
+                self._count("errors", e)
+        return quotes
+
+    def poll_once(self):
+        """One pass over the watchlist. Returns the number of ticks added."""
+        start = time.perf_counter()
+        self._warm_up()
+        codes = self.codes()
+        known = [(c, self.markets[c]) for c in codes if c in self.markets]
+        with self._stats_lock:
+            cycle = self.stats["cycles"]
+        unknown = [c for c in codes if c not in self.markets
+                   and cycle - self.unresolved.get(c, -REDISCOVER_CYCLES) >= REDISCOVER_CYCLES]
+
+        quotes = self._fetch(known)
+        # Discovery: ask unknown codes as listed (tse) first, whatever did not come back as OTC
+        for market in ("tse", "otc"):
+            if not unknown:
+                break
+            found = self._fetch([(c, market) for c in unknown])
+            for q in found:
+                self.markets[q["code"]] = q["market"] or market
+            quotes.extend(found)
+            seen = {q["code"] for q in found}
+            unknown = [c for c in unknown if c not in seen]
+
+        for c in unknown:
+            self.unresolved[c] = cycle
+        for c in self.markets:
+            self.unresolved.pop(c, None)
+
+        added = self.store.update(quotes)
+        with self._stats_lock:
+            self.stats["cycles"] += 1
+            self.stats["last_cycle_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.stats["last_cycle_at"] = datetime.now(TAIPEI).strftime("%Y-%m-%d %H:%M:%S")
+            self.stats["unresolved"] = len(self.unresolved)
+        return added
+
+    def run(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            if self.always or market_open():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    self._count("errors", e)
+                # Fixed cadence: skip slots a slow cycle overran instead of bunching requests
+                next_at += self.interval
+                now = time.monotonic()
+                if next_at < now:
+                    next_at = now + self.interval - ((now - next_at) % self.interval)
+                self._stop.wait(next_at - now)
+            else:
+                self._stop.wait(60)
+                next_at = time.monotonic()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="mis-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=MIS_TIMEOUT + 1)
+            self._thread = None
+
+    def status(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {**stats, "watchlist": len(self.codes()), "markets_known": len(self.markets),
+                "interval_s": self.interval, "chunk_size": self.chunk_size, "chunk_pause_s": self.chunk_pause,
+                "market_open": market_open(), **self.store.stats()}
+
+
+# --- Local stand-in MIS server (tests / offline development) ---
+
+def serve_stand_in(host="127.0.0.1", port=8766, otc=(), seed=0):
+    """
+    Answers getStockInfo.jsp like MIS: a random walk per code, one trade per request.
+    Codes in `otc` only answer on otc_ channels, every other code only on tse_.
+    """
+    import http.server
+    from urllib.parse import urlparse, parse_qs
+    otc = set(otc)
+    state = {}
+    lock = threading.Lock()
+
+    def quote(code, ex):
+        with lock:
+            rng, s = state.get(code) or (random.Random(f"{seed}:{code}"), None)
+            if s is None:
+                base = round(rng.uniform(10, 1000), 2)
+                s = {"y": base, "z": base, "o": base, "h": base, "l": base, "v": 0}
+            s["z"] = round(max(0.01, s["z"] * (1 + rng.gauss(0, 0.002))), 2)
+            s["h"], s["l"] = max(s["h"], s["z"]), min(s["l"], s["z"])
+            s["v"] += rng.randint(1, 50)
+            state[code] = (rng, s)
+            now = int(time.time() * 1000)
+            return {"c": code, "n": f"Stock {code}", "ex": ex, "ch": f"{code}.tw", "z": f"{s['z']:.4f}",
+                    "y": f"{s['y']:.4f}", "o": f"{s['o']:.4f}", "h": f"{s['h']:.4f}", "l": f"{s['l']:.4f}",
+                    "v": str(s["v"]), "b": f"{s['z'] - 0.5:.4f}_", "a": f"{s['z'] + 0.5:.4f}_",
+                    "tlong": str(now), "t": datetime.now(TAIPEI).strftime("%H:%M:%S")}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            u = urlparse(self.path)
+            if u.path == MIS_PATH:
+                rows = []
+                for ch in parse_qs(u.query).get("ex_ch", [""])[0].split("|"):
+                    ex, _, rest = ch.partition("_")
+                    code = rest.split(".")[0]
+                    if code and ex == ("otc" if code in otc else "tse"):
+                        rows.append(quote(code, ex))
+                body = json.dumps({"msgArray": rows, "rtcode": "0000", "rtmessage": "OK"}).encode("utf-8")
+            else:
+                body = b"<html>MIS stand-in</html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json" if u.path == MIS_PATH else "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return http.server.ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="TWSE MIS realtime poller")
+    sub = parser.add_subparsers(dest="action", required=True)
+    s = sub.add_parser("serve-mis", help="Local stand-in MIS server")
+    s.add_argument("--port", type=int, default=8766)
+    s.add_argument("--otc", default="", help="Comma-separated codes that live on otc_ channels")
+    p = sub.add_parser("poll", help="Poll a watchlist and print the latest quotes")
+    p.add_argument("--url", default=MIS_URL)
+    p.add_argument("--watchlist", default=DEFAULT_WATCHLIST)
+    p.add_argument("--cycles", type=int, default=3)
+    p.add_argument("--interval", type=float, default=POLL_INTERVAL)
+    p.add_argument("--always", action="store_true", help="Ignore market hours")
+    args = parser.parse_args()
+
+    if args.action == "serve-mis":
+        server = serve_stand_in(port=args.port, otc=[c for c in args.otc.split(",") if c])
+        print(f"📡 MIS stand-in on http://127.0.0.1:{args.port}{MIS_PATH}")
+        server.serve_forever()
+    else:
+        store = RealtimeStore()
+        poller = MISPoller(store, args.watchlist.split(","), base_url=args.url, interval=args.interval,
+                           always=args.always)
+        for i in range(args.cycles):
+            if not (args.always or market_open()):
+                print("💤 Market closed (use --always to poll anyway)")
+                break
+            added = poller.poll_once()
+            print(f"⏱️ Cycle {i + 1}: {added} ticks in {poller.stats['last_cycle_ms']} ms")
+            if i + 1 < args.cycles: time.sleep(args.interval)
+        for code in poller.codes():
+            q = store.latest(code)
+            print(f"   - {code}: {q['price'] if q else 'N/A'} ({q['market'] if q else '?'})")
+        print(json.dumps(poller.status(), ensure_ascii=False))
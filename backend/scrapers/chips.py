@@ -0,0 +1,128 @@
+# --- 三大法人買賣超 (one trading day, whole market) ---
+# TWSE T86 and TPEx 3itrade_hedge_result, parsed into
+# {code: {"name", "foreign", "trust"}} in lots (張 = 1000 shares).
+# Used by the daily ETL (latest day) and the flow history backfill (past days).
+
+from backend import telemetry
+
+T86_PATH = "/rwd/zh/fund/T86"
+TPEX_3INSTI_PATH = "/web/stock/3insti/daily_trade/3itrade_hedge_result.php"
+
+
+def parse_t86(data):
+    """T86 JSON -> chips map ({} unless stat OK)."""
+    if not isinstance(data, dict) or data.get('stat') != 'OK':
+        return {}
+    # [User Request] Partial Exact Indexing based on Logs
+    # Index 4 = Foreign, Index 10 = Trust
+    # We also grab Name (Index 1) for UI
+    chips_map = {}
+    for row in data.get('data', []):
+        try:
+            code = row[0]
+            name = row[1].strip()
+            if len(code) != 4: continue
+
+            # CRITICAL: Remove commas!
+            f_str = row[4].replace(',', '')
+            t_str = row[10].replace(',', '')
+
+            # T86 unit is shares. UI shows "張" (Lots = 1000 shares), so divide by 1000.
+            f_net = int(f_str) // 1000
+            t_net = int(t_str) // 1000
+
+            chips_map[code] = {
+                "name": name,
+                "foreign": f_net,
+                "trust": t_net
+            }
+        except: continue
+    return chips_map
+
+
+def parse_tpex_3insti(data):
+    """TPEx 3itrade_hedge_result JSON (tables[] or legacy aaData) -> chips map."""
+    if not isinstance(data, dict):
+        return {}
+    raw_rows = []
+    if 'tables' in data and len(data['tables']) > 0:
+        if 'data' in data['tables'][0]:
+            raw_rows = data['tables'][0]['data']
+    elif 'aaData' in data:
+        raw_rows = data['aaData']
+
+    chips_map = {}
+    for row in raw_rows:
+        try:
+            code = row[0]
+            name = row[1].strip()
+            if len(code) != 4: continue
+            def p(v): return int(v.replace(',', '')) if v else 0
+
+            if len(row) > 13:
+                foreign_net = p(row[4]) // 1000
+                trust_net = p(row[13]) // 1000
+            else:
+                foreign_net = p(row[4]) // 1000
+                trust_net = p(row[7]) // 1000
+
+            chips_map[code] = {
+                "name": name,
+                "foreign": foreign_net,
+                "trust": trust_net
+            }
+        except: continue
+    return chips_map
+
+
+def _tpex_no_data(data):
+    """A well-formed TPEx answer with an empty table (holiday / before the close)."""
+    if not isinstance(data, dict):
+        return False
+    if data.get('tables'):
+        return not any(t.get('data') for t in data['tables'])
+    return 'aaData' in data and not data['aaData']
+
+
+def fetch_twse_chips_day(engine, day, domain, headers=None):
+    """{} when T86 answers "no data" for the day; raises on HTTP / format errors."""
+    url = f"{domain}{T86_PATH}?date={day.strftime('%Y%m%d')}&selectType=ALL&response=json"
+    r = engine.get(url, headers=headers, timeout=10)
+    r.raise_for_status()
+    with telemetry.get_run().parse():
+        data = r.json()
+        chips_map = parse_t86(data)
+    if not chips_map and isinstance(data, dict) and data.get('stat') == 'OK':
+        raise ValueError("T86 table could not be parsed")
+    return chips_map
+
+
+def fetch_tpex_chips_day(engine, day, domain, headers=None):
+    """{} when TPEx answers with an empty table for the day; raises on HTTP / format errors."""
+    date_str = f"{day.year - 1911}/{day.strftime('%m/%d')}"
+    url = f"{domain}{TPEX_3INSTI_PATH}?l=zh-tw&o=json&se=EW&t=D&d={date_str}"
+    headers_tpex = dict(headers or {})
+    headers_tpex["Referer"] = "https://www.tpex.org.tw/"
+    r = engine.get(url, headers=headers_tpex, verify=False, timeout=10)
+    r.raise_for_status()
+    with telemetry.get_run().parse():
+        data = r.json()
+        chips_map = parse_tpex_3insti(data)
+    if not chips_map and not _tpex_no_data(data):
+        raise ValueError("TPEx 3insti table missing or could not be parsed")
+    return chips_map
+
+
+def fetch_chips_day(engine, day, twse_domain, tpex_domain, headers=None):
+    """
+    Both markets for one day. {} only when both answer "no data" (holiday /
+    before the close); None when either market failed, so the day is retried.
+    """
+    chips = {}
+    for fetch, domain in ((fetch_twse_chips_day, twse_domain), (fetch_tpex_chips_day, tpex_domain)):
+        try:
+            chips.update(fetch(engine, day, domain, headers))
+        except Exception as e:
+            print(f"   ⚠️ Chips Error for {day:%Y-%m-%d}: {e}")
+            return None
+    return chips
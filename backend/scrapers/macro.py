@@ -3,41 +3,227 @@ import pandas as pd
 import json
 import time
 import os
+import re
+import sys
 from io import StringIO
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 
 # 確保路徑正確
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Allow `python backend/scrapers/macro.py` to import backend.* modules
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from backend.http_cache import cached_get, get_default_cache
+from backend import telemetry
+from backend import transport
+from backend.storage import delta
 PUBLIC_DIR = os.path.join(BASE_DIR, "frontend", "public")
 if not os.path.exists(PUBLIC_DIR):
     os.makedirs(PUBLIC_DIR)
     
 MACRO_DATA_FILE = os.path.join(PUBLIC_DIR, "macro_data.json")
 
+# All sources run concurrently; whatever is not back by then is served stale
+MACRO_DEADLINE = float(os.getenv("MARKET_RADAR_MACRO_DEADLINE", "25"))
+
+# 大盤分類指數 (not sectors) in the BFIAMU table
+BFIAMU_INDEX_ROWS = ['發行量加權股價指數', '未含金融保險股指數', '未含電子股指數', '未含金融電子股指數']
+
+
+def clean_number(val):
+    """Remove commas and convert to float/int"""
+    try:
+        if isinstance(val, (int, float)): return val
+        return float(str(val).replace(",", "").strip())
+    except:
+        return 0
+
+
+def roc_to_date(roc_date_str):
+    """Convert '113/02/06' to '2024-02-06'"""
+    try:
+        parts = roc_date_str.split('/')
+        if len(parts) != 3: return roc_date_str
+        year = int(parts[0]) + 1911
+        return f"{year}-{parts[1]}-{parts[2]}"
+    except:
+        return roc_date_str
+
+
+def yf_fast_info(symbol):
+    """The yfinance fast_info fields used here, as a plain dict (taped by the transport)."""
+    import yfinance as yf
+    info = yf.Ticker(symbol).fast_info
+    return {"last_price": info.last_price, "day_high": info.day_high, "day_low": info.day_low,
+            "previous_close": info.previous_close}
+
+
+# --- Parsers (pure: response body in, values out) ---
+
+def parse_fmtqik(data):
+    """FMTQIK JSON -> [{"date", "close", "volume" (億), "change"}] ([] unless stat OK)."""
+    history = []
+    if data.get('stat') != 'OK':
+        return history
+    # Rows: [日期, 成交股數, 成交金額, 成交筆數, 發行量加權股價指數, 漲跌點數]
+    # Index: 0=Date, 2=Turnover(Amount), 4=Close, 1=Volume(Shares)
+    # We usually visualize Price (4) and Turnover Amount (2) for Index
+    # FMTQIK has no High/Low; today's H/L comes from MIS (fetch_twse_mis_stats).
+    for row in data.get('data', []):
+        turnover = clean_number(row[2]) # Amount (Money)
+        history.append({
+            "date": roc_to_date(row[0]),
+            "close": clean_number(row[4]),
+            "volume": turnover / 100000000, # Convert to E (億)
+            "change": clean_number(row[5])
+        })
+    return history
+
+
+def parse_bfi82u(data):
+    """BFI82U JSON -> (foreign, trust, dealer) net in 億, or None unless stat OK."""
+    if data.get('stat') != 'OK':
+        return None
+    foreign = 0; trust = 0; dealer = 0
+    # BFI82U Columns: [0]Unit Name, [1]Buy, [2]Sell, [3]Net
+    for row in data.get('data', []):
+        name = row[0].strip()
+        try:
+            # Explicit string cleaning as requested
+            net_str = str(row[3]).replace(',', '').strip()
+            net_val = float(net_str) / 100000000 # E
+        except: net_val = 0
+        
+        # Logic: Strict matching for Foreign
+        if "外資及陸資(不含外資自營商)" in name: 
+            foreign += net_val
+        elif "投信" in name:
+            trust += net_val
+        elif "自營商" in name and "合計" not in name:
+            dealer += net_val
+    return foreign, trust, dealer
+
+
+def parse_bfiamu(data):
+    """BFIAMU JSON -> top-5 sectors by turnover share + 其他."""
+    raw_sectors = []
+    total_value = 0
+    for row in data.get('data', []):
+        name = row[0]
+        try:
+            val = float(str(row[2]).replace(',', ''))
+            total_value += val
+            if name not in BFIAMU_INDEX_ROWS:
+                 raw_sectors.append({"name": name, "value": val})
+        except: continue
+    
+    raw_sectors.sort(key=lambda x: x['value'], reverse=True)
+    result = []
+    for s in raw_sectors[:5]:
+        ratio = (s['value'] / total_value) * 100
+        trend = "Hot" if ratio > 30 else "Cool" if ratio < 5 else "Normal"
+        result.append({"name": s['name'].replace("類", ""), "ratio": round(ratio, 1), "trend": trend})
+    
+    others = sum(x['value'] for x in raw_sectors[5:])
+    if others > 0:
+        result.append({"name": "其他", "ratio": round((others/total_value)*100, 1), "trend": "Normal"})
+    return result
+
+
+def parse_bot_usd(html):
+    """Bank of Taiwan xrt page -> USD spot selling rate, or None."""
+    # HTML structure: <td data-table="Currency">...USD...</td>...<td data-table="Spot Selling">32.5</td>
+    if "USD" not in html:
+        return None
+    # Split by USD to get the section after it
+    parts = html.split('USD')
+    if len(parts) > 1:
+        # Pattern: Spot Selling.*?class="rate-content-sight text-right print_width".*?>([\d.]+)
+        match = re.search(r'Spot Selling.*?class="rate-content-sight text-right print_width"[^>]*>([\d.]+)', parts[1], re.DOTALL)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def parse_futures_oi(html):
+    """
+    TAIFEX futContractsDate page -> 臺股期貨 外資 net OI (口), or None.
+    [User Request] Exact Indexing: Col 1='臺股期貨', Col 2='外資', Value=Col 13
+    """
+    try:
+        dfs = pd.read_html(StringIO(html))
+    except ValueError:
+        print("      ⚠️ No tables found in Futures response.")
+        return None
+
+    if not dfs: return None
+    df = dfs[0] # User confirmed Table 0
+    
+    # User Snippet: `df.iloc[:, 1] == '臺股期貨'` (Column Index 1)
+    # `df.iloc[:, 2] == '外資'` (Column Index 2)
+    # This implies Col 0 is something else (or empty/index).
+    # We follow User Exact Snippet.
+    target = df[ (df.iloc[:, 1].astype(str) == '臺股期貨') & (df.iloc[:, 2].astype(str).str.contains('外資')) ]
+    
+    if not target.empty:
+        # User confirmed Col 13 is "Net OI Volume"
+        raw_val = target.iloc[0, 13]
+        # Clean comma
+        val_str = str(raw_val).replace(',', '').strip()
+        if val_str.replace('-', '').isdigit():
+            return int(val_str)
+    return None
+
+
+# --- Stale fallback: a source's value as found in the previous macro_data.json ---
+PREVIOUS_VALUE = {
+    "taiex_history": lambda prev: prev.get("history"),
+    "institutional": lambda prev: prev.get("institutional"),
+    "realtime_stats": lambda prev: prev.get("market_status"),
+    "sector_flow": lambda prev: prev.get("sector_flow"),
+    "currency": lambda prev: prev.get("currency"),
+    "futures_oi": lambda prev: (prev.get("chips") or {}).get("futures_net_oi"),
+}
+
+
+def source_missing(name, value):
+    """True when a source produced nothing usable (fetchers return empty / zero defaults on failure)."""
+    if value is None:
+        return True
+    if name in ("taiex_history", "sector_flow"):
+        return len(value) == 0
+    if name == "institutional":
+        return not any(row.get("net") for row in value)
+    if name == "realtime_stats":
+        return not value.get("high")
+    if name == "futures_oi":
+        return not isinstance(value, (int, float))
+    return False
+
+
 class MacroScraper:
     def __init__(self):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
 
+    def _get(self, url, headers=None, timeout=10, polite_delay=0):
+        """GET through the shared on-disk cache. The polite delay is only paid on a miss."""
+        def send(method, url, **kwargs):
+            transport.polite_sleep(polite_delay)
+            return transport.send(method, url, **kwargs)
+        return cached_get(url, headers=headers or self.headers, timeout=timeout, send=send)
+
     def clean_number(self, val):
         """Remove commas and convert to float/int"""
-        try:
-            if isinstance(val, (int, float)): return val
-            return float(str(val).replace(",", "").strip())
-        except:
-            return 0
+        return clean_number(val)
 
     def roc_to_date(self, roc_date_str):
         """Convert '113/02/06' to '2024-02-06'"""
-        try:
-            parts = roc_date_str.split('/')
-            if len(parts) != 3: return roc_date_str
-            year = int(parts[0]) + 1911
-            return f"{year}-{parts[1]}-{parts[2]}"
-        except:
-            return roc_date_str
+        return roc_to_date(roc_date_str)
 
     def fetch_taiex_history(self):
         """
@@ -51,43 +237,13 @@ class MacroScraper:
         months_to_fetch = [0, 1] 
         
         for m_offset in months_to_fetch:
-            target_date = datetime.now() - relativedelta(months=m_offset)
+            target_date = transport.now() - relativedelta(months=m_offset)
             date_str = target_date.strftime("%Y%m01")
             url = f"https://www.twse.com.tw/rwd/zh/afterTrading/FMTQIK?date={date_str}&response=json"
             
             try:
-                time.sleep(1) # Polite delay
-                r = requests.get(url, headers=self.headers, timeout=10)
-                data = r.json()
-                
-                if data.get('stat') == 'OK':
-                    # Rows: [日期, 成交股數, 成交金額, 成交筆數, 發行量加權股價指數, 漲跌點數]
-                    # Index: 0=Date, 2=Turnover(Amount), 4=Close, 1=Volume(Shares)
-                    # We usually visualize Price (4) and Turnover Amount (2) for Index
-                    
-                    for row in data.get('data', []):
-                        date_str = self.roc_to_date(row[0])
-                        close = self.clean_number(row[4])
-                        turnover = self.clean_number(row[2]) # Amount (Money)
-                        change = self.clean_number(row[5])
-                        
-                        # Extra stats for today (High/Low not directly in FMTQIK summary list, 
-                        # usually need Daily Quote for H/L. 
-                        # Wait, FMTQIK usually just gives Close. 
-                        # Let's check if we can get High/Low. 
-                        # Actually FMTQIK is 'Daily Average' stats. 
-                        # For true Daily OHLC, we assume Close is good enough for History Line.
-                        # For TODAY's High/Low, we might need a separate fetch or use the latest Close as proxy for now.
-                        # User asked for "Daily High/Low". 
-                        # NOTE: FMTQIK *does* store H/L in specific columns? No, usually just Close.
-                        # Let's stick to Close/Volume for History Chart first.
-                        
-                        history.append({
-                            "date": date_str,
-                            "close": close,
-                            "volume": turnover / 100000000, # Convert to E (億)
-                            "change": change
-                        })
+                r = self._get(url, timeout=10, polite_delay=1)
+                history.extend(parse_fmtqik(r.json()))
             except Exception as e:
                 print(f"      ⚠️ Month {m_offset} fetch failed: {e}")
         
@@ -112,34 +268,15 @@ class MacroScraper:
         # A. Institutional (BFI82U)
         url_inst = f"https://www.twse.com.tw/rwd/zh/fund/BFI82U?date={date_param}&response=json"
         
-        # Init values
-        foreign = 0; trust = 0; dealer = 0
         found_rows = False
 
         try:
-            r = requests.get(url_inst, headers=self.headers, timeout=10)
+            r = self._get(url_inst, timeout=10)
             data = r.json()
-            if data.get('stat') == 'OK':
-                rows = data.get('data', [])
+            nets = parse_bfi82u(data)
+            if nets is not None:
                 found_rows = True
-                
-                # BFI82U Columns: [0]Unit Name, [1]Buy, [2]Sell, [3]Net
-                for row in rows:
-                    name = row[0].strip()
-                    try:
-                        # Explicit string cleaning as requested
-                        net_str = str(row[3]).replace(',', '').strip()
-                        net_val = float(net_str) / 100000000 # E
-                    except: net_val = 0
-                    
-                    # Logic: Strict matching for Foreign
-                    if "外資及陸資(不含外資自營商)" in name: 
-                        foreign += net_val
-                    elif "投信" in name:
-                        trust += net_val
-                    elif "自營商" in name and "合計" not in name:
-                        dealer += net_val
-                        
+                foreign, trust, dealer = nets
                 print(f"      ✅ Inst Found: Foreign={foreign:.2f}, Trust={trust:.2f}, Dealer={dealer:.2f}")
 
                 institutional = [
@@ -170,7 +307,7 @@ class MacroScraper:
         url = f"https://mis.twse.com.tw/stock/api/getStockInfo.jsp?ex_ch=tse_t00.tw&json=1&delay=0&_={timestamp}"
         
         try:
-            r = requests.get(url, headers=self.headers, timeout=10)
+            r = self._get(url, timeout=10)
             data = r.json()
             
             if 'msgArray' in data and len(data['msgArray']) > 0:
@@ -214,15 +351,13 @@ class MacroScraper:
         return self.fetch_yahoo_stats_fallback()
 
     def fetch_yahoo_stats_fallback(self):
-        import yfinance as yf
         try:
-            t = yf.Ticker("^TWII")
-            info = t.fast_info
+            info = transport.call("yf_fast_info", "^TWII", lambda: yf_fast_info("^TWII"))
             
-            price = info.last_price or 0
-            hi = info.day_high or 0
-            lo = info.day_low or 0
-            prev = info.previous_close or 0
+            price = info["last_price"] or 0
+            hi = info["day_high"] or 0
+            lo = info["day_low"] or 0
+            prev = info["previous_close"] or 0
             
             if hi == 0: hi = price
             if lo == 0: lo = price
@@ -246,13 +381,13 @@ class MacroScraper:
         # ... (Keep existing BFIAMU logic, abridged for brevity but will include full) ...
         # Copied from previous logical block
         print("   -> Fetching Sector Flow (TWSE BFIAMU)...")
-        date_check = datetime.now()
+        date_check = transport.now()
         found_data = None
         for _ in range(5):
             date_str = date_check.strftime("%Y%m%d")
             url = f"https://www.twse.com.tw/rwd/zh/afterTrading/BFIAMU?date={date_str}&response=json"
             try:
-                r = requests.get(url, headers=self.headers, timeout=5)
+                r = self._get(url, timeout=5)
                 data = r.json()
                 if data.get('stat') == 'OK':
                     found_data = data; break
@@ -262,62 +397,27 @@ class MacroScraper:
         if not found_data: return []
 
         try:
-            raw_sectors = []
-            total_value = 0
-            for row in found_data.get('data', []):
-                name = row[0]
-                try:
-                    val = float(str(row[2]).replace(',', ''))
-                    total_value += val
-                    if name not in ['發行量加權股價指數', '未含金融保險股指數', '未含電子股指數', '未含金融電子股指數']:
-                         raw_sectors.append({"name": name, "value": val})
-                except: continue
-            
-            raw_sectors.sort(key=lambda x: x['value'], reverse=True)
-            result = []
-            for s in raw_sectors[:5]:
-                ratio = (s['value'] / total_value) * 100
-                trend = "Hot" if ratio > 30 else "Cool" if ratio < 5 else "Normal"
-                result.append({"name": s['name'].replace("類", ""), "ratio": round(ratio, 1), "trend": trend})
-            
-            others = sum(x['value'] for x in raw_sectors[5:])
-            if others > 0:
-                result.append({"name": "其他", "ratio": round((others/total_value)*100, 1), "trend": "Normal"})
-            return result
+            return parse_bfiamu(found_data)
         except: return []
 
     def fetch_currency(self):
         """Fetch USD/TWD from Bank of Taiwan (Realtime & Robust)"""
         try:
             url = "https://rate.bot.com.tw/xrt?Lang=en-US"
-            r = requests.get(url, headers=self.headers, timeout=10)
-            # Simple text parsing to find USD and the Spot Selling rate
-            # HTML structure: <td data-table="Currency">...USD...</td>...<td data-table="Spot Selling">32.5</td>
-            if "USD" in r.text:
-                # Find the block with USD, then find the rate
-                # Split by USD to get the section after it
-                parts = r.text.split('USD')
-                if len(parts) > 1:
-                    # Look for data-table="Spot Selling" in the immediate following text
-                    # Regex is cleaner
-                    import re
-                    # Pattern: Spot Selling.*?class="rate-content-sight text-right print_width".*?>([\d.]+)
-                    match = re.search(r'Spot Selling.*?class="rate-content-sight text-right print_width"[^>]*>([\d.]+)', parts[1], re.DOTALL)
-                    if match:
-                        price = float(match.group(1))
-                        return {"usd_twd": price, "trend": "Stable"}
+            r = self._get(url, timeout=10)
+            price = parse_bot_usd(r.text)
+            if price is not None:
+                return {"usd_twd": price, "trend": "Stable"}
             
             # Fallback to Yahoo if BOT fails
             return self.fetch_yahoo_currency_fallback()
         except: return self.fetch_yahoo_currency_fallback()
 
     def fetch_yahoo_currency_fallback(self):
-        import yfinance as yf
         try:
-            t = yf.Ticker("USDTWD=X")
-            price = t.fast_info.last_price
+            price = transport.call("yf_fast_info", "USDTWD=X", lambda: yf_fast_info("USDTWD=X"))["last_price"]
             return {"usd_twd": round(price, 2), "trend": "Stable"}
-        except: return {"usd_twd": 32.5, "trend": "Stable"}
+        except: return None  # run() falls back to the last known rate
 
     def fetch_futures_oi(self):
         """
@@ -330,40 +430,13 @@ class MacroScraper:
             headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
             
             print(f"   -> Fetching Futures OI from {url}...")
-            r = requests.get(url, headers=headers, timeout=15)
+            r = self._get(url, headers=headers, timeout=15)
             r.encoding = 'utf-8'
             
-            try:
-                dfs = pd.read_html(StringIO(r.text))
-            except ValueError:
-                print("      ⚠️ No tables found in Futures response.")
-                return None
-
-            if not dfs: return None
-            df = dfs[0] # User confirmed Table 0
-            
-            # User Filter: Col 1='臺股期貨', Col 2='外資' (Indices might be 1 and 2 if 0-indexed?)
-            # Usually TAIFEX HTML table: 
-            # 0=Product Name (商品名稱), 1=Identity (身分別)?
-            # Or 1=Product, 2=Identity?
-            # User Snippet: `df.iloc[:, 1] == '臺股期貨'` (Column Index 1)
-            # `df.iloc[:, 2] == '外資'` (Column Index 2)
-            # This implies Col 0 is something else (or empty/index).
-            # We follow User Exact Snippet.
-            
-            # Clean string logic for safety
-            # Ensure we are looking at strings
-            target = df[ (df.iloc[:, 1].astype(str) == '臺股期貨') & (df.iloc[:, 2].astype(str).str.contains('外資')) ]
-            
-            if not target.empty:
-                # User confirmed Col 13 is "Net OI Volume"
-                raw_val = target.iloc[0, 13]
-                # Clean comma
-                val_str = str(raw_val).replace(',', '').strip()
-                if val_str.replace('-', '').isdigit():
-                    net_oi = int(val_str)
-                    print(f"      ✅ Futures OI (Foreign, Exact): {net_oi}")
-                    return net_oi
+            net_oi = parse_futures_oi(r.text)
+            if net_oi is not None:
+                print(f"      ✅ Futures OI (Foreign, Exact): {net_oi}")
+                return net_oi
             
             print("      ⚠️ Futures OI Row Not Found (Exact Match Failed).")
             return None
@@ -371,26 +444,103 @@ class MacroScraper:
             print(f"      ❌ Futures Scraper Error: {e}")
             return None
 
-    def run(self):
+    def fetch_sources(self, previous=None, deadline=None):
+        """
+        Run every source concurrently under one overall deadline.
+        A source that fails, comes back empty or misses the deadline takes its value
+        from the previous macro_data.json, marked stale.
+        -> ({source: value or None}, {source: {"status", "latency_ms", "as_of"[, "error"]}})
+        """
+        previous = previous or {}
+        deadline = MACRO_DEADLINE if deadline is None else deadline
+        run = telemetry.get_run()
+        started = time.perf_counter()
+        stop_at = started + deadline
+        latency = {}
+
+        def timed(name, fn):
+            def task():
+                t0 = time.perf_counter()
+                try:
+                    with run.stage(name):
+                        return fn()
+                finally:
+                    latency[name] = time.perf_counter() - t0
+            return task
+
+        futures = {}
+
+        def institutional():
+            # BFI82U is keyed by the last trading day in FMTQIK (today if history is late or down)
+            try: history = futures["taiex_history"].result(timeout=max(0, stop_at - time.perf_counter()))
+            except Exception: history = []
+            last_date = history[-1]['date'] if history else transport.now().strftime("%Y-%m-%d")
+            return self.fetch_daily_stats_and_institutional(last_date)[0]
+
+        tasks = {
+            "taiex_history": self.fetch_taiex_history,
+            "institutional": institutional,
+            "realtime_stats": self.fetch_twse_mis_stats,  # TWSE MIS -> Yahoo fallback
+            "sector_flow": self.fetch_sector_flow,
+            "currency": self.fetch_currency,              # Bank of Taiwan -> Yahoo fallback
+            "futures_oi": self.fetch_futures_oi,
+        }
+        pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="macro")
+        for name, fn in tasks.items():
+            futures[name] = pool.submit(timed(name, fn))
+        wait(futures.values(), timeout=deadline)
+        pool.shutdown(wait=False, cancel_futures=True)  # Late sources finish on their own request timeouts
+
+        now = transport.now().strftime("%Y-%m-%d %H:%M:%S")
+        prev_sources = previous.get("sources") or {}
+        values, sources = {}, {}
+        for name, fut in futures.items():
+            value, error = None, None
+            if fut.done():
+                try: value = fut.result()
+                except Exception as e: error = str(e)
+            else:
+                error = f"deadline {deadline:.0f}s"
+            entry = {"latency_ms": round(latency.get(name, time.perf_counter() - started) * 1000)}
+            if not source_missing(name, value):
+                values[name] = value
+                entry.update(status="ok", as_of=now)
+            else:
+                stale = PREVIOUS_VALUE[name](previous) if previous else None
+                if not source_missing(name, stale):
+                    values[name] = stale
+                    entry.update(status="stale",
+                                 as_of=(prev_sources.get(name) or {}).get("as_of") or previous.get("last_updated"))
+                else:
+                    values[name] = None
+                    entry.update(status="missing", as_of=None)
+                if error: entry["error"] = error
+            sources[name] = entry
+        return values, sources
+
+    def run(self, deadline=None):
         print("🚀 [Macro Worker] Starting Update (TWSE Enhanced)...")
-        time.sleep(1)
-        
-        # 1. History (20 Days)
-        history = self.fetch_taiex_history()
-        
-        # 2. Latest Data Points
-        last_date = history[-1]['date'] if history else datetime.now().strftime("%Y-%m-%d")
-        
-        # 3. Institutional & Stats
-        inst_data, _ = self.fetch_daily_stats_and_institutional(last_date)
-        
-        # 4. Realtime Stats (TWSE MIS -> Yahoo Fallback)
-        rt_stats = self.fetch_twse_mis_stats()
-        
-        # 5. Sector & Currency & Futures
-        sector = self.fetch_sector_flow()
-        curr = self.fetch_currency()
-        fut_oi = self.fetch_futures_oi()
+        run = telemetry.start_run("macro")
+        previous = delta.read_json(MACRO_DATA_FILE) or {}
+
+        values, sources = self.fetch_sources(previous, deadline)
+        for name, src in sources.items():
+            icon = {"ok": "✅", "stale": "🕰️", "missing": "❌"}[src["status"]]
+            print(f"   {icon} {name:<15} {src['status']:<8} {src['latency_ms']:6d} ms"
+                  + (f"  (as of {src['as_of']})" if src["status"] == "stale" else "")
+                  + (f"  {src['error']}" if src.get("error") else ""))
+        run.meta["sources"] = sources
+
+        history = values["taiex_history"] or []
+        run.add_rows(len(history), stage="taiex_history")
+        inst_data = values["institutional"] or [
+            {"name": "外資", "net": 0}, {"name": "投信", "net": 0}, {"name": "自營商", "net": 0}
+        ]
+        rt_stats = values["realtime_stats"] or {"high": 0, "low": 0}
+        sector = values["sector_flow"] or []
+        run.add_rows(len(sector), stage="sector_flow")
+        curr = values["currency"] or {"usd_twd": 32.5, "trend": "Stable"}
+        fut_oi = values["futures_oi"]
         
         # Futures Color
         fut_status = "Neutral"
@@ -405,7 +555,7 @@ class MacroScraper:
             else: fut_color = "green"; fut_status = "Bearish"
         
         final_data = {
-            "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "last_updated": transport.now().strftime("%Y-%m-%d %H:%M"),
             "market_status": {
                 "taiex_close": history[-1]['close'] if history else 0,
                 "change": history[-1]['change'] if history else 0,
@@ -422,13 +572,31 @@ class MacroScraper:
                 "futures_color": fut_color
             },
             "currency": curr,
-            "sector_flow": sector
+            "sector_flow": sector,
+            # Per-source freshness: status ok / stale / missing, fetch latency, as_of of the value shown
+            "sources": sources,
+            "stale": [name for name, src in sources.items() if src["status"] != "ok"],
         }
         
-        with open(MACRO_DATA_FILE, "w", encoding='utf-8') as f:
-            json.dump(final_data, f, indent=4, ensure_ascii=False)
-        print(f"✅ Saved to {MACRO_DATA_FILE}")
+        # last_updated / sources (latencies) alone are not a change: identical data keeps the old file
+        written, digest = delta.write_json_if_changed(MACRO_DATA_FILE, final_data, indent=4,
+                                                      volatile=("last_updated", "sources"))
+        delta.write_delta("macro", written, digest)
+        print(f"✅ Saved to {MACRO_DATA_FILE}" if written else f"✅ No change, {MACRO_DATA_FILE} left as is")
+        get_default_cache().report()
+        telemetry.finish_run()
+        return final_data
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Macro ETL (macro_data.json)")
+    parser.add_argument("--deadline", type=float, default=None, help=f"Overall seconds for all sources (default {MACRO_DEADLINE:.0f})")
+    parser.add_argument("--every", type=float, default=0, help="Repeat every N seconds (intraday refresh loop)")
+    args = parser.parse_args()
+
     s = MacroScraper()
-    s.run()
\ No newline at end of file
+    while True:
+        started = time.time()
+        s.run(deadline=args.deadline)
+        if not args.every: break
+        time.sleep(max(0, args.every - (time.time() - started)))
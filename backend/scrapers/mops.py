@@ -1,9 +1,59 @@
 from functools import lru_cache
 import pandas as pd
-import requests
 import time
+from io import StringIO
 from datetime import datetime
 
+from backend.http_cache import cached_post
+from backend import transport
+
+_NAN_LITERALS = ["nan", "+nan", "-nan"]
+
+def _clean_float(col):
+    """
+    Vectorized `float(str(x).replace(',', ''))` over a column.
+    Returns (values, ok) where ok marks cells float() would have accepted.
+    """
+    if pd.api.types.is_numeric_dtype(col):
+        return col.astype(float), pd.Series(True, index=col.index)
+    text = col.astype(str).str.replace(',', '', regex=False)
+    num = pd.to_numeric(text, errors='coerce')
+    # Missing cells: str(nan) == 'nan' parses as NaN (pandas' str dtype keeps them missing instead)
+    ok = num.notna() | col.isna() | text.str.strip().str.lower().isin(_NAN_LITERALS)
+    return num.astype(float), ok
+
+def parse_t21sc03_page(html):
+    """
+    Parse one MOPS t21sc03 monthly revenue page (static Big5 HTML, already decoded).
+    Returns a DataFrame [code, revenue, yoy] in table order. Revenue is in NTD (page is 千元).
+    Vectorized per table (no iterrows). Module-level so it can run inside a ProcessPoolExecutor.
+    """
+    frames = []
+    try:
+        dfs = pd.read_html(StringIO(html))
+    except Exception:
+        dfs = []
+    for df in dfs:
+        if df.shape[1] <= 6: continue
+        codes = df.iloc[:, 0].astype(str).str.strip()
+        rev_raw = df.iloc[:, 2]
+        keep = codes.str.len().eq(4) & codes.str.isdigit()
+        keep &= rev_raw.notna() & rev_raw.astype(str).str.strip().ne('-')
+
+        rev, rev_ok = _clean_float(rev_raw)
+        keep &= rev_ok
+        yoy, yoy_ok = _clean_float(df.iloc[:, 6])
+        yoy = yoy.where(yoy_ok, 0.0)
+
+        frames.append(pd.DataFrame({
+            "code": codes[keep].to_numpy(),
+            "revenue": (rev[keep] * 1000).to_numpy(),
+            "yoy": yoy[keep].to_numpy(),
+        }))
+    if not frames:
+        return pd.DataFrame({"code": pd.Series(dtype=object), "revenue": pd.Series(dtype=float), "yoy": pd.Series(dtype=float)})
+    return pd.concat(frames, ignore_index=True)
+
 class MOPSScraper:
     def __init__(self):
         self.base_url = "https://mops.twse.com.tw/mops/web"
@@ -12,6 +62,10 @@ class MOPSScraper:
              "Origin": "https://mops.twse.com.tw"
         }
 
+    def _send(self, method, url, **kwargs):
+        transport.polite_sleep(3) # MOPS throttles hard; only paid on cache misses
+        return transport.send(method, url, **kwargs)
+
     @lru_cache(maxsize=4)
     def fetch_monthly_revenue(self, year: int, month: int):
         """
@@ -35,14 +89,13 @@ class MOPSScraper:
         }
         
         try:
-            time.sleep(3)
             # Need to specify 'sii' (上市) and 'otc' (上櫃) separately usually, or Iterate?
             # actually t05st10 usually returns a table.
             # Let's try fetching for 'sii' (Listing) first.
             
             form_data['type'] = 'sii' # Domestic Listing
             
-            response = requests.post(url, data=form_data, headers=self.headers, timeout=10, verify=False)
+            response = cached_post(url, data=form_data, headers=self.headers, timeout=10, verify=False, send=self._send)
             response.encoding = 'utf8'
             
             dfs = pd.read_html(response.text)
@@ -72,8 +125,7 @@ class MOPSScraper:
         }
         
         try:
-            time.sleep(3)
-            response = requests.post(url, data=form_data, headers=self.headers)
+            response = cached_post(url, data=form_data, headers=self.headers, send=self._send)
             response.encoding = 'utf8'
             
             dfs = pd.read_html(response.text)
@@ -0,0 +1,203 @@
+import pandas as pd
+
+# --- Exchange-wide daily quote / valuation tables ---
+# Four requests cover the whole market for one trading day:
+#   TWSE  MI_INDEX (type=ALLBUT0999)   收盤價 + 本益比 for every listed stock
+#   TWSE  BWIBBU_d (selectType=ALL)    本益比 / 股價淨值比 / 殖利率
+#   TPEx  stk_quote_result             收盤 for every OTC stock
+#   TPEx  pera_result                  本益比 / 股價淨值比 / 殖利率
+# Columns are located by header keyword, so column reordering between API
+# versions does not break parsing. Old TPEx `aaData` responses have no headers
+# and fall back to the known positional layout.
+
+# Paths (joined with the TWSE / TPEx domain by the caller)
+TWSE_QUOTES_PATH = "/rwd/zh/afterTrading/MI_INDEX"
+TWSE_VALUATION_PATH = "/rwd/zh/afterTrading/BWIBBU_d"
+TPEX_QUOTES_PATH = "/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php"
+TPEX_VALUATION_PATH = "/web/stock/aftertrading/peratio_analysis/pera_result.php"
+
+# output column -> header keywords (first header containing one wins)
+COLUMN_KEYWORDS = {
+    "code": ("證券代號", "股票代號", "代號"),
+    "name": ("證券名稱", "名稱"),
+    "price": ("收盤",),
+    "pe": ("本益比",),
+    "pb": ("淨值比",),
+    "dividend_yield": ("殖利率",),
+}
+
+# Positional layout of header-less TPEx aaData rows
+TPEX_QUOTES_POSITIONS = {"code": 0, "name": 1, "price": 2}
+TPEX_VALUATION_POSITIONS = {"code": 0, "name": 1, "pe": 2, "dividend_yield": 5, "pb": 6}
+
+VALUE_COLUMNS = ["price", "pe", "pb", "dividend_yield"]
+
+# Daily OHLCV from the same quote tables (MI_INDEX / stk_quote_result)
+OHLCV_KEYWORDS = {
+    "code": ("證券代號", "股票代號", "代號"),
+    "open": ("開盤",),
+    "high": ("最高",),
+    "low": ("最低",),
+    "close": ("收盤",),
+    "volume": ("成交股數",),
+}
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+TPEX_OHLCV_POSITIONS = {"code": 0, "close": 2, "open": 4, "high": 5, "low": 6, "volume": 8}
+
+
+def find_table(payload, required=("代號",)):
+    """
+    Locate the (fields, rows) table in a TWSE/TPEx JSON payload whose headers
+    contain every keyword in `required`. Handles `tables[]`, top-level
+    fields/data, legacy fieldsN/dataN pairs and header-less aaData (fields=None).
+    """
+    if not isinstance(payload, dict):
+        return None, []
+    candidates = []
+    for t in payload.get("tables") or []:
+        candidates.append((t.get("fields"), t.get("data")))
+    candidates.append((payload.get("fields"), payload.get("data")))
+    for key in payload:
+        if key.startswith("fields") and key[6:].isdigit():
+            candidates.append((payload[key], payload.get(f"data{key[6:]}")))
+
+    for fields, rows in candidates:
+        if fields and rows and all(any(k in f for f in fields) for k in required):
+            return fields, rows
+    if payload.get("aaData"):
+        return None, payload["aaData"]
+    return None, []
+
+
+def _column_positions(fields, keywords_map=COLUMN_KEYWORDS):
+    positions = {}
+    for col, keywords in keywords_map.items():
+        for kw in keywords:
+            idx = next((i for i, f in enumerate(fields) if kw in str(f)), None)
+            if idx is not None:
+                positions[col] = idx
+                break
+    return positions
+
+
+def _to_float(col):
+    """'1,050.00' / '--' / '-' / '' -> float, NaN when not a number."""
+    return pd.to_numeric(col.astype(str).str.replace(",", "", regex=False).str.strip(), errors="coerce").astype(float)
+
+
+def _empty_frame(columns):
+    return pd.DataFrame(columns=columns).rename_axis("code")
+
+
+def _parse_table(fields, rows, positions, keywords_map, columns):
+    """Shared table -> code-indexed frame. Text columns stay text, the rest are floats."""
+    if not rows:
+        return _empty_frame(columns)
+    if fields:
+        positions = _column_positions(fields, keywords_map)
+    if not positions or "code" not in positions:
+        return _empty_frame(columns)
+
+    width = max(positions.values()) + 1
+    raw = pd.DataFrame([r for r in rows if len(r) >= width])
+    if raw.empty:
+        return _empty_frame(columns)
+
+    out = pd.DataFrame({"code": raw[positions["code"]].astype(str).str.strip()})
+    for col in columns:
+        if col not in positions: continue
+        if col == "name":
+            out[col] = raw[positions[col]].astype(str).str.strip()
+        else:
+            out[col] = _to_float(raw[positions[col]])
+
+    out = out[out["code"].str.len() == 4]
+    return out.drop_duplicates("code").set_index("code")
+
+
+def parse_quote_table(fields, rows, positions=None):
+    """
+    Rows of one exchange table -> DataFrame indexed by 4-digit code with any of
+    [name, price, pe, pb, dividend_yield]. Non-positive PE/PB (虧損 / 不適用) become NaN.
+    """
+    out = _parse_table(fields, rows, positions, COLUMN_KEYWORDS, ["name"] + VALUE_COLUMNS)
+    for col in ("pe", "pb"):
+        if col in out:
+            out.loc[out[col] <= 0, col] = float("nan")
+    return out
+
+
+def parse_ohlcv_table(fields, rows, positions=None):
+    """
+    Rows of one daily quote table -> DataFrame indexed by code with
+    [open, high, low, close, volume]. Untraded stocks ('--') are dropped.
+    """
+    out = _parse_table(fields, rows, positions, OHLCV_KEYWORDS, OHLCV_COLUMNS)
+    out = out.reindex(columns=OHLCV_COLUMNS)
+    return out[out["close"] > 0]
+
+
+def _no_trading(payload):
+    """A well-formed answer that says there is no table for the date (holiday / before the close)."""
+    if not isinstance(payload, dict):
+        return False
+    stat = payload.get("stat")
+    if stat is not None and str(stat).upper() != "OK":
+        return True  # TWSE: "很抱歉，沒有符合條件的資料!"
+    if "aaData" in payload and not payload["aaData"]:
+        return True
+    tables = payload.get("tables")
+    return isinstance(tables, list) and not any(t.get("data") for t in tables if isinstance(t, dict))
+
+
+def fetch_ohlcv_day(engine, day, twse_domain, tpex_domain, headers=None):
+    """
+    Whole-market OHLCV for one date: one TWSE + one TPEx request.
+    Same URLs as the ETL's quote stage, so the day being ingested is an HTTP cache hit.
+    Returns a code-indexed frame, an empty frame only when both markets answer
+    "no data" (holiday / before the close), and None when either market failed
+    (the day must neither be stored half-filled nor recorded as a holiday).
+    """
+    headers = headers or {}
+    headers_tpex = dict(headers, Referer="https://www.tpex.org.tw/")
+    roc = f"{day.year - 1911}/{day.strftime('%m/%d')}"
+    markets = (
+        ("MI_INDEX", f"{twse_domain}{TWSE_QUOTES_PATH}?date={day.strftime('%Y%m%d')}&type=ALLBUT0999&response=json",
+         dict(headers=headers), ("證券代號", "收盤價"), None),
+        ("OTC Quotes", f"{tpex_domain}{TPEX_QUOTES_PATH}?l=zh-tw&o=json&d={roc}",
+         dict(headers=headers_tpex, verify=False), ("代號", "收盤"), TPEX_OHLCV_POSITIONS),
+    )
+    frames = []
+    for label, url, kwargs, required, positions in markets:
+        try:
+            r = engine.get(url, timeout=15, **kwargs)
+            r.raise_for_status()
+            payload = r.json()
+            fields, rows = find_table(payload, required=required)
+            if not rows:
+                if not _no_trading(payload):
+                    raise ValueError("no quote table in response")
+                continue
+            frames.append(parse_ohlcv_table(fields, rows, positions))
+        except Exception as e:
+            print(f"   ⚠️ {label} Error for {day:%Y-%m-%d}: {e}")
+            return None
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return _empty_frame(OHLCV_COLUMNS)
+    frame = pd.concat(frames)
+    return frame[~frame.index.duplicated()]
+
+
+def merge_quote_frames(quotes, valuation, market):
+    """
+    Closing prices + valuation table -> one frame per market.
+    The valuation table's PE wins (it is the exchange's official ratio); the
+    quote table's PE only fills its gaps.
+    """
+    frame = quotes.reindex(columns=["name", "price", "pe"]).join(
+        valuation.reindex(columns=["name", "pe", "pb", "dividend_yield"]), how="outer", rsuffix="_val")
+    frame["pe"] = frame["pe_val"].combine_first(frame["pe"])
+    frame["name"] = frame["name"].combine_first(frame["name_val"])
+    frame["market"] = market
+    return frame[["name", "market"] + VALUE_COLUMNS]
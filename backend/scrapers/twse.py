@@ -1,10 +1,12 @@
-from functools import lru_cache
 import pandas as pd
 import requests
 import time
-from datetime import datetime
+from io import StringIO
 import json
 
+from backend.http_cache import cached_get
+from backend import transport
+
 class TWSEScraper:
     def __init__(self):
         self.base_url = "https://www.twse.com.tw"
@@ -17,12 +19,15 @@ class TWSEScraper:
     # Cache the result for at least a few minutes/hours since it's daily data
     # Note: simple lru_cache works for arguments, but here we want to cache by date essentially.
     
+    def _send(self, method, url, **kwargs):
+        transport.polite_sleep(1) # Polite delay, only paid on cache misses
+        print(f"Fetching {url}...")
+        return transport.send(method, url, **kwargs)
+
     def _get_json(self, url, params=None):
         try:
-            time.sleep(1) # Reduced sleep, rely on cache
-            print(f"Fetching {url}...")
             # Disable SSL verify to avoid hangs on some corporate networks/proxies
-            response = requests.get(url, params=params, headers=self.headers, timeout=5, verify=False) 
+            response = cached_get(url, params=params, headers=self.headers, timeout=5, verify=False, send=self._send) 
             response.raise_for_status()
             data = response.json()
             if data['stat'] != 'OK':
@@ -37,7 +42,7 @@ class TWSEScraper:
         """
         Fetch daily quotes for a specific stock for the current month.
         """
-        now = datetime.now()
+        now = transport.now()
         date_str = now.strftime("%Y%m%d")
         url = f"{self.base_url}/exchangeReport/STOCK_DAY"
         params = {
@@ -60,7 +65,7 @@ class TWSEScraper:
         """
         Fetch 3 Major Investors trading data (T86).
         """
-        now = datetime.now()
+        now = transport.now()
         date_str = now.strftime("%Y%m%d") 
         # Note: If today is weekend/holiday, this might fail or return empty. 
         # Real impl needs to find last trading day. For now, try today.
@@ -81,14 +86,13 @@ class TWSEScraper:
         df = pd.DataFrame(records, columns=fields)
         return df
 
-    @lru_cache(maxsize=1)
-    def fetch_sector_pe(self):
+    def fetch_sector_pe(self, date_str=None):
         """
-        Fetch Sector P/E, Dividend Yield, PB Ratio (BWESS).
-        Cached to avoid hitting TWSE on every request.
+        Fetch Sector P/E, Dividend Yield, PB Ratio (BWESS) for one trading date.
+        No in-process cache here: the HTTP cache keys on the date, and
+        ValuationService keeps the parsed table per trading date.
         """
-        now = datetime.now()
-        date_str = now.strftime("%Y%m%d")
+        date_str = date_str or transport.now().strftime("%Y%m%d")
         
         url = f"{self.base_url}/exchangeReport/BWESS"
         params = {
@@ -97,7 +101,7 @@ class TWSEScraper:
             "selectType": "ALL"
         }
         
-        print("Scraping Sector PE (This might take a while)...")
+        print(f"Scraping Sector PE for {date_str}...")
         data = self._get_json(url, params)
         if not data:
             return None
@@ -107,6 +111,48 @@ class TWSEScraper:
         df = pd.DataFrame(records, columns=fields)
         return df
 
+    def fetch_industry_map(self):
+        """
+        Stock -> 產業別 for listed (strMode=2) and OTC (strMode=4) stocks,
+        from the ISIN code pages. Returns {code: industry}.
+        """
+        industry = {}
+        for mode in ISIN_MODES:
+            try:
+                r = cached_get(ISIN_URL, params={"strMode": mode}, headers=self.headers, timeout=15, send=self._send)
+                industry.update(parse_isin_page(decode_isin_page(r.content)))
+            except Exception as e:
+                print(f"Industry map failed (strMode={mode}): {e}")
+        return industry
+
+# --- ISIN listing pages: the only bulk source carrying 產業別 ---
+ISIN_URL = "https://isin.twse.com.tw/isin/C_public.jsp"
+ISIN_MODES = (2, 4)  # 2 = 上市, 4 = 上櫃
+
+def decode_isin_page(content):
+    return content.decode("ms950", errors="replace")
+
+def parse_isin_page(html):
+    """ISIN page HTML -> {code: industry} for 4-digit stock codes with an industry."""
+    try:
+        tables = pd.read_html(StringIO(html), header=0)
+    except Exception:
+        return {}
+    out = {}
+    for df in tables:
+        cols = [str(c) for c in df.columns]
+        code_col = next((c for c in cols if "代號" in c), None)
+        ind_col = next((c for c in cols if "產業別" in c), None)
+        if code_col is None or ind_col is None:
+            continue
+        df.columns = cols
+        parts = df[code_col].astype(str).str.split("\u3000", n=1, expand=True)
+        codes = parts[0].str.strip()
+        inds = df[ind_col].astype(str).str.strip()
+        ok = (codes.str.len() == 4) & inds.ne("") & inds.ne("nan")
+        out.update(zip(codes[ok], inds[ok]))
+    return out
+
 if __name__ == "__main__":
     scraper = TWSEScraper()
     print("Testing Daily Quotes for 2330...")
@@ -0,0 +1,115 @@
+import numpy as np
+
+# Screenable field -> record path
+SCREENER_FIELDS = {
+    "current_pe": ("valuation", "current_pe"),
+    "pe_score": ("valuation", "pe_score"),
+    "price": ("valuation", "price"),
+    "yoy": ("revenue", "yoy"),
+    "mom": ("revenue", "mom"),
+    "foreign_net": ("chips", "foreign_net"),
+    "trust_net": ("chips", "trust_net"),
+    "score": ("rule_analysis", "score"),
+}
+NO_PE_FIELDS = ("current_pe", "pe_score")  # 0 = no PE (虧損 / N/A), not "cheap"
+MAX_PAGE_SIZE = 200
+
+
+def _get(rec, path):
+    for key in path:
+        if not isinstance(rec, dict):
+            return None
+        rec = rec.get(key)
+    return rec
+
+
+class ScreenerIndex:
+    """
+    Columnar arrays + per-field sorted indexes over one stock snapshot.
+    - columns[field]: float64 per stock (NaN = missing)
+    - asc / desc[field]: row order by value, NaN always last
+    - rank_asc / rank_desc[field]: inverse permutations, so any subset can be
+      ordered with an integer argsort instead of a float comparison sort
+    A range filter is two binary searches on the sorted values; the narrowest
+    filter seeds the candidate rows and the rest are applied as vector masks.
+    """
+
+    def __init__(self, records):
+        self.codes = np.array([str(c) for c in records], dtype=object)
+        self.names = np.array([str((r or {}).get("stock_name") or c) for c, r in records.items()], dtype=object)
+        n = len(self.codes)
+        self.columns, self.sorted_values = {}, {}
+        self.asc, self.desc, self.rank_asc, self.rank_desc = {}, {}, {}, {}
+        self.valid_count = {}
+
+        for field, path in SCREENER_FIELDS.items():
+            col = np.full(n, np.nan)
+            for i, rec in enumerate(records.values()):
+                v = _get(rec, path)
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    col[i] = v
+            if field in NO_PE_FIELDS:
+                col[col <= 0] = np.nan
+            self.columns[field] = col
+
+            asc = np.argsort(col, kind="stable")  # NaN sorts last
+            valid = int(np.count_nonzero(~np.isnan(col)))
+            desc = np.concatenate([asc[:valid][::-1], asc[valid:]])
+            self.asc[field], self.desc[field] = asc, desc
+            self.sorted_values[field] = col[asc[:valid]]
+            self.valid_count[field] = valid
+            self.rank_asc[field] = np.empty(n, dtype=np.int64)
+            self.rank_asc[field][asc] = np.arange(n)
+            self.rank_desc[field] = np.empty(n, dtype=np.int64)
+            self.rank_desc[field][desc] = np.arange(n)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _range_rows(self, field, lo, hi):
+        vals = self.sorted_values[field]
+        start = int(np.searchsorted(vals, lo, side="left")) if lo is not None else 0
+        end = int(np.searchsorted(vals, hi, side="right")) if hi is not None else len(vals)
+        return self.asc[field][start:max(start, end)]
+
+    def query(self, filters=None, sort="score", descending=True, offset=0, limit=50):
+        """
+        filters: {field: (min or None, max or None)}, both bounds inclusive.
+        Returns {"total", "offset", "limit", "results": [...]}.
+        """
+        filters = {f: b for f, b in (filters or {}).items() if b != (None, None)}
+        for field in list(filters) + [sort]:
+            if field not in SCREENER_FIELDS:
+                raise KeyError(field)
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        rank = (self.rank_desc if descending else self.rank_asc)[sort]
+
+        if not filters:
+            order = (self.desc if descending else self.asc)[sort]
+            total = len(order)
+            page = order[offset:offset + limit]
+        else:
+            # Narrowest range first, remaining filters as masks over its rows
+            ranges = {f: self._range_rows(f, lo, hi) for f, (lo, hi) in filters.items()}
+            seed = min(ranges, key=lambda f: len(ranges[f]))
+            rows = ranges[seed]
+            for field, (lo, hi) in filters.items():
+                if field == seed or len(rows) == 0: continue
+                col = self.columns[field][rows]
+                mask = ~np.isnan(col)
+                if lo is not None: mask &= col >= lo
+                if hi is not None: mask &= col <= hi
+                rows = rows[mask]
+            rows = rows[np.argsort(rank[rows], kind="stable")]
+            total = len(rows)
+            page = rows[offset:offset + limit]
+
+        results = []
+        for i in page:
+            row = {"stock_id": self.codes[i], "stock_name": self.names[i]}
+            for field, col in self.columns.items():
+                v = col[i]
+                row[field] = None if np.isnan(v) else float(v)
+            results.append(row)
+        return {"total": total, "offset": offset, "limit": limit, "results": results}
@@ -0,0 +1,96 @@
+import unicodedata
+
+# Match tiers (lower = better)
+TIER_EXACT_ID = 0
+TIER_EXACT_NAME = 1
+TIER_ID_PREFIX = 2
+TIER_NAME_PREFIX = 3
+TIER_NAME_SUBSTRING = 4
+
+TIER_LABELS = {
+    TIER_EXACT_ID: "id",
+    TIER_EXACT_NAME: "name",
+    TIER_ID_PREFIX: "id_prefix",
+    TIER_NAME_PREFIX: "name_prefix",
+    TIER_NAME_SUBSTRING: "name_substring",
+}
+
+MAX_POSTINGS = 50  # Ranked candidates kept per key (autocomplete never needs more)
+
+
+def normalize(text):
+    """NFKC (full-width -> half-width), trimmed, case-folded."""
+    return unicodedata.normalize("NFKC", str(text or "")).strip().casefold()
+
+
+class SearchIndex:
+    """
+    Prebuilt stock lookup index.
+    - ids / names: exact maps
+    - keys: every ID prefix and every name substring -> ranked [(tier, len, id), ...]
+    Building is O(stocks x name_length^2) once per snapshot; a query is a single
+    dict lookup plus a slice, independent of universe size.
+    """
+
+    def __init__(self, records):
+        self.ids = {}
+        self.names = {}
+        postings = {}
+
+        def add(key, entry):
+            postings.setdefault(key, {})
+            code = entry[2]
+            # Keep the best tier per (key, stock)
+            if code not in postings[key] or entry < postings[key][code]:
+                postings[key][code] = entry
+
+        for code, rec in records.items():
+            code = str(code)
+            name = str(rec.get("stock_name") or "")
+            nid, nname = normalize(code), normalize(name)
+            self.ids[nid] = code
+            if nname:
+                self.names.setdefault(nname, code)
+
+            for i in range(1, len(nid) + 1):
+                tier = TIER_EXACT_ID if i == len(nid) else TIER_ID_PREFIX
+                add(nid[:i], (tier, len(nname), code, name))
+
+            for i in range(len(nname)):
+                for j in range(i + 1, len(nname) + 1):
+                    if j - i == len(nname): tier = TIER_EXACT_NAME
+                    elif i == 0: tier = TIER_NAME_PREFIX
+                    else: tier = TIER_NAME_SUBSTRING
+                    add(nname[i:j], (tier, len(nname), code, name))
+
+        self.keys = {key: sorted(entries.values())[:MAX_POSTINGS] for key, entries in postings.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, query):
+        """
+        Best single stock_id for the dashboard: exact ID, exact name, then the
+        best-ranked name match (queries of 2+ characters), else None.
+        """
+        q = normalize(query)
+        if q in self.ids:
+            return self.ids[q]
+        if q in self.names:
+            return self.names[q]
+        if len(q) < 2:
+            return None
+        for tier, _, code, _ in self.keys.get(q, []):
+            if tier in (TIER_NAME_PREFIX, TIER_NAME_SUBSTRING):
+                return code
+        return None
+
+    def search(self, query, limit=10):
+        """Ranked candidates for autocomplete."""
+        q = normalize(query)
+        if not q:
+            return []
+        return [
+            {"stock_id": code, "stock_name": name, "match": TIER_LABELS[tier]}
+            for tier, _, code, name in self.keys.get(q, [])[:limit]
+        ]
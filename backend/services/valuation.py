@@ -1,62 +1,125 @@
+import time
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
 import pandas as pd
 from backend.scrapers.twse import TWSEScraper
 from backend.models.stock_data import PERadar
 
+DEFAULT_SECTOR_PE = 20.0  # Used only when neither the industry nor the market has PE data
+MIN_SECTOR_SIZE = 3       # Industries with fewer positive PEs fall back to the market median
+LOOKBACK_DAYS = 7         # Weekends / holidays: walk back to the last published table
+STALE_RECHECK_S = 10 * 60 # Table older than today (not published yet / holiday): look again after this
+
+def compute_sector_pe(pe, industry):
+    """
+    Per-industry PE aggregates (median of positive PEs, robust to outliers).
+    pe / industry: Series indexed by stock code.
+    Returns ({industry: sector_pe}, market_pe).
+    """
+    pe = pd.to_numeric(pe, errors="coerce")
+    valid = pe[pe > 0]
+    market_pe = float(valid.median()) if len(valid) else DEFAULT_SECTOR_PE
+    grouped = valid.groupby(industry.reindex(valid.index)).agg(["median", "count"])
+    by_industry = {
+        ind: float(row["median"]) if row["count"] >= MIN_SECTOR_SIZE else market_pe
+        for ind, row in grouped.iterrows()
+    }
+    return by_industry, market_pe
+
+def sector_pe_for(codes, industry_map, by_industry, market_pe):
+    """Vectorized code -> sector PE lookup (unknown industry -> market median)."""
+    inds = pd.Series([industry_map.get(c) for c in codes], index=codes, dtype=object)
+    return inds.map(by_industry).fillna(market_pe).astype(float)
+
+def score_valuations(pe, sector_pe):
+    """(pe_score, status) arrays for aligned PE / sector PE Series."""
+    pe = pe.fillna(0.0).to_numpy(dtype=float)
+    sector = sector_pe.to_numpy(dtype=float)
+    score = np.where(sector > 0, pe / np.where(sector > 0, sector, 1), 0.0)
+    status = np.select([score > 1.2, score < 0.8], ["High Premium", "Undervalued"], "Fair Value")
+    return score, status
+
 class ValuationService:
+    """
+    PE radar over the BWESS table.
+    The table is kept as a code-indexed frame with sector PE / score / status
+    precomputed, keyed on the trading date it comes from: today's table is kept
+    for the day, an older one (today's not published yet) is re-checked every
+    STALE_RECHECK_S seconds.
+    """
     def __init__(self):
         self.scraper = TWSEScraper()
+        self._table = None       # DataFrame indexed by 證券代號
+        self._checked_at = None  # time.monotonic() of the last fetch attempt
+        self.trading_date = None # Date of the BWESS table actually used (YYYY-MM-DD)
+        self._lock = threading.Lock()
 
-    def get_valuation(self, stock_id: str) -> PERadar:
-        # 1. Fetch Sector P/E (All stocks)
-        df = self.scraper.fetch_sector_pe()
-        
-        if df is None or df.empty:
-            return None
-        
-        # 2. Filter for specific stock
+    def _fetch_latest(self, today):
+        for i in range(LOOKBACK_DAYS):
+            day = today - timedelta(days=i)
+            if day.weekday() > 4: continue
+            df = self.scraper.fetch_sector_pe(day.strftime("%Y%m%d"))
+            if df is not None and not df.empty:
+                return df, day.strftime("%Y-%m-%d")
+        return None, None
+
+    def _build_table(self, df):
         # Columns in BWESS: "證券代號", "證券名稱", "殖利率(%)", "股利年度", "本益比", "股價淨值比", "財報年/季"
-        # Note: Columns might be in Chinese.
-        
-        # Normalize columns just in case
-        # Example 2330
-        record = df[df['證券代號'] == stock_id]
-        
-        if record.empty:
-            return None
-            
-        record = record.iloc[0]
-        
-        try:
-            pe_str = record['本益比'].replace(',', '')
-            pe = float(pe_str) if pe_str != '-' else 0.0
-            
-            # 3. Calculate Sector Average
-            # Need to know which sector it belongs to.
-            # For V1, let's calculate the average of the WHOLE market or try to infer sector?
-            # Or just use a dummy sector PE for now if we don't have sector mapping.
-            # Real implementation needs a Stock -> Sector mapping table.
-            
-            sector_pe = 20.0 # Placeholder or calculate mean of positive PEs
-            
-            # Simple average of all stocks
-            # sector_pe = df[df['本益比'] != '-']['本益比'].astype(str).str.replace(',', '').astype(float).mean()
-
-            score = pe / sector_pe if sector_pe > 0 else 0
-            
-            status = "Fair Value"
-            if score > 1.2:
-                status = "High Premium"
-            elif score < 0.8:
-                status = "Undervalued"
-                
-            return PERadar(
-                stock_id=stock_id,
-                current_pe=pe,
-                sector_pe=sector_pe,
-                pe_score=score,
-                status=status
-            )
-            
-        except Exception as e:
-            print(f"Error calculating valuation: {e}")
-            return None
+        codes = df['證券代號'].astype(str).str.strip()
+        pe = pd.to_numeric(df['本益比'].astype(str).str.replace(',', '', regex=False), errors='coerce')
+        pe = pd.Series(pe.fillna(0.0).to_numpy(), index=codes)
+        pe = pe[~pe.index.duplicated()]
+
+        industry_map = self.scraper.fetch_industry_map()
+        industry = pd.Series(industry_map, dtype=object).reindex(pe.index)
+        by_industry, market_pe = compute_sector_pe(pe, industry)
+        sector = sector_pe_for(list(pe.index), industry_map, by_industry, market_pe)
+        score, status = score_valuations(pe, sector)
+
+        return pd.DataFrame({
+            "current_pe": pe.to_numpy(),
+            "sector_pe": sector.to_numpy(),
+            "pe_score": score,
+            "status": status,
+        }, index=pe.index)
+
+    def _fresh(self, today):
+        if self._table is not None and self.trading_date == today.strftime("%Y-%m-%d"):
+            return True
+        return self._checked_at is not None and time.monotonic() - self._checked_at < STALE_RECHECK_S
+
+    def table(self):
+        """Code-indexed valuation frame for the latest published trading date (None if unavailable)."""
+        today = datetime.now().date()
+        if self._fresh(today):
+            return self._table
+        with self._lock:
+            if self._fresh(today):
+                return self._table
+            self._checked_at = time.monotonic()
+            df, trading_date = self._fetch_latest(today)
+            if df is None or trading_date == self.trading_date:
+                return self._table  # Nothing newer: keep the table we have rather than nothing
+            try:
+                self._table = self._build_table(df)
+                self.trading_date = trading_date
+            except Exception as e:
+                print(f"Error calculating valuation: {e}")
+            return self._table
+
+    def get_valuations(self, stock_ids) -> dict:
+        """Batch lookup: {stock_id: PERadar} for the ids present in the table."""
+        table = self.table()
+        if table is None or table.empty:
+            return {}
+        rows = table.reindex([str(s) for s in stock_ids]).dropna(subset=["current_pe"])
+        return {
+            code: PERadar(stock_id=code, current_pe=pe, sector_pe=sector, pe_score=score, status=status)
+            for code, pe, sector, score, status in zip(
+                rows.index, rows["current_pe"], rows["sector_pe"], rows["pe_score"], rows["status"])
+        }
+
+    def get_valuation(self, stock_id: str) -> PERadar:
+        return self.get_valuations([stock_id]).get(str(stock_id))
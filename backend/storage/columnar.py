@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import shutil
+import argparse
+
+import numpy as np
+
+# --- Columnar Stock Store ---
+# One directory, one .npy per leaf field of the legacy stock_data.json record:
+#   meta.json                    schema (path -> kind), history months, row count
+#   stock_id.npy                 sorted codes ('<U'), row order for every column
+#   order.npy                    rows in the legacy dict's order (export / to_dict)
+#   valuation.current_pe.npy     float64 / int64 / '<U' / bool per leaf
+#   <path>.int.npy               "number" columns (ints and floats mixed): cells that were ints
+#   <path>.null.npy              optional null mask (legacy value was None)
+#   <path>.missing.npy           optional mask (the record had no such key)
+#   revenue.history.npy          float64 (stocks x months), NaN = month missing
+# Everything is opened with mmap_mode='r', so point lookups and universe scans
+# never parse text. Full records are rebuilt column by column (one tolist() per
+# column), and the legacy JSON export matches the file the store was built from.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STORE_DIR = os.path.join(BASE_DIR, "data", "stock_store")
+
+STORE_VERSION = 2
+HISTORY_PATHS = ("revenue.history",)  # list of {"date", "revenue"} -> matrix
+
+
+def _flatten(rec, prefix=""):
+    for key, val in rec.items():
+        path = f"{prefix}{key}"
+        if isinstance(val, dict):
+            yield from _flatten(val, path + ".")
+        else:
+            yield path, val
+
+
+def _infer_kind(path, values):
+    if path in HISTORY_PATHS:
+        return "history"
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, bool) for v in present):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, float) for v in present):
+        return "float"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "number"  # 0 next to 1.5: kept as written
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    return "json"
+
+
+_MISSING = object()  # values(): the record had no such key
+
+
+def _set_path(rec, path, value):
+    keys = path.split(".")
+    for k in keys[:-1]:
+        rec = rec.setdefault(k, {})
+    rec[keys[-1]] = value
+
+
+def _atomic_replace_dir(tmp_dir, out_dir):
+    old_dir = f"{out_dir}.old"
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def write_store(db, out_dir=STORE_DIR):
+    """
+    Write the legacy {code: record} dict as a columnar store (atomic directory swap).
+    Returns the meta dict.
+    """
+    codes = sorted(db.keys())
+    n = len(codes)
+
+    # 1. Schema: union of leaf paths in first-seen order
+    columns, present = {}, {}
+    for i, code in enumerate(codes):
+        for path, val in _flatten(db[code]):
+            if path not in columns:
+                columns[path] = [None] * n
+                present[path] = np.zeros(n, dtype=bool)
+            columns[path][i] = val
+            present[path][i] = True
+
+    tmp_dir = f"{out_dir}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "stock_id.npy"), np.array(codes, dtype=str))
+    row = {code: i for i, code in enumerate(codes)}
+    np.save(os.path.join(tmp_dir, "order.npy"), np.array([row[c] for c in db], dtype=np.int64))
+    schema = {}
+    months = []
+    for path, values in columns.items():
+        if path == "stock_id": continue
+        kind = _infer_kind(path, values)
+        nulls = np.array([v is None for v in values], dtype=bool)
+        missing = ~present[path]
+
+        if kind == "history":
+            months = sorted({h["date"] for v in values if v for h in v})
+            col = {m: j for j, m in enumerate(months)}
+            arr = np.full((n, len(months)), np.nan)
+            for i, v in enumerate(values):
+                for h in v or []:
+                    arr[i, col[h["date"]]] = h["revenue"]
+        elif kind == "bool":
+            arr = np.array([bool(v) for v in values], dtype=bool)
+        elif kind == "int":
+            arr = np.array([v if v is not None else 0 for v in values], dtype=np.int64)
+        elif kind in ("float", "number"):
+            arr = np.array([v if v is not None else np.nan for v in values], dtype=np.float64)
+            if kind == "number":
+                np.save(os.path.join(tmp_dir, f"{path}.int.npy"),
+                        np.array([isinstance(v, int) for v in values], dtype=bool))
+        elif kind == "str":
+            arr = np.array([v if v is not None else "" for v in values], dtype=str)
+        else:
+            arr = np.array([json.dumps(v, ensure_ascii=False) for v in values], dtype=str)
+
+        np.save(os.path.join(tmp_dir, f"{path}.npy"), arr)
+        if nulls.any() and kind != "history":
+            np.save(os.path.join(tmp_dir, f"{path}.null.npy"), nulls)
+        if missing.any():
+            np.save(os.path.join(tmp_dir, f"{path}.missing.npy"), missing)
+        schema[path] = kind
+
+    meta = {
+        "version": STORE_VERSION,
+        "rows": n,
+        "schema": schema,
+        "months": months,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    _atomic_replace_dir(tmp_dir, out_dir)
+    return meta
+
+
+class ColumnarStore:
+    """
+    Memory-mapped reader for a store written by write_store().
+    - get(code): legacy record dict (point lookup, binary search on stock_id)
+    - column(path): raw numpy column for universe-wide scans
+    - history(code): [{"date", "revenue"}, ...]
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"store version {self.meta.get('version')} != {STORE_VERSION} (rebuild it)")
+        self.schema = self.meta["schema"]
+        self.months = self.meta["months"]
+        self.ids = np.load(os.path.join(store_dir, "stock_id.npy"), mmap_mode="r")
+        self.order = np.load(os.path.join(store_dir, "order.npy"), mmap_mode="r")
+        self._cols = {}
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, code):
+        return self.index_of(code) is not None
+
+    def column(self, path):
+        if path == "stock_id":
+            return self.ids
+        if path not in self._cols:
+            self._cols[path] = np.load(os.path.join(self.store_dir, f"{path}.npy"), mmap_mode="r")
+        return self._cols[path]
+
+    def _mask(self, path, suffix):
+        key = (path, suffix)
+        if key not in self._masks:
+            p = os.path.join(self.store_dir, f"{path}.{suffix}.npy")
+            self._masks[key] = np.load(p, mmap_mode="r") if os.path.exists(p) else None
+        return self._masks[key]
+
+    def index_of(self, code):
+        i = int(np.searchsorted(self.ids, code))
+        if i < len(self.ids) and self.ids[i] == code:
+            return i
+        return None
+
+    def value(self, path, i):
+        missing = self._mask(path, "missing")
+        if missing is not None and missing[i]:
+            return None
+        kind = self.schema[path]
+        if kind == "history":
+            return self.history_at(i)
+        nulls = self._mask(path, "null")
+        if nulls is not None and nulls[i]:
+            return None
+        v = self.column(path)[i]
+        if kind == "number": return int(v) if self._mask(path, "int")[i] else float(v)
+        if kind == "float": return float(v)
+        if kind == "int": return int(v)
+        if kind == "bool": return bool(v)
+        if kind == "str": return str(v)
+        return json.loads(str(v))
+
+    def history_at(self, i):
+        return self._history_row(self.column("revenue.history")[i].tolist())
+
+    def _history_row(self, row):
+        return [{"date": m, "revenue": v} for m, v in zip(self.months, row) if v == v]  # NaN = no month
+
+    def values(self, path):
+        """Whole column as Python values (None = null, _MISSING = no such key), one tolist() per column."""
+        kind = self.schema[path]
+        col = self.column(path)
+        if kind == "history":
+            out = [self._history_row(row) for row in col.tolist()]
+        elif kind == "json":
+            out = [json.loads(v) for v in col.tolist()]
+        else:
+            out = col.tolist()
+            if kind == "number":
+                for i in np.flatnonzero(self._mask(path, "int")).tolist():
+                    out[i] = int(out[i])
+        if kind != "history":
+            nulls = self._mask(path, "null")
+            if nulls is not None:
+                for i in np.flatnonzero(nulls).tolist(): out[i] = None
+        missing = self._mask(path, "missing")
+        if missing is not None:
+            for i in np.flatnonzero(missing).tolist(): out[i] = _MISSING
+        return out
+
+    def history(self, code):
+        i = self.index_of(code)
+        return self.history_at(i) if i is not None else []
+
+    def record_at(self, i):
+        rec = {"stock_id": str(self.ids[i])}
+        for path in self.schema:
+            missing = self._mask(path, "missing")
+            if missing is not None and missing[i]: continue
+            _set_path(rec, path, self.value(path, i))
+        return rec
+
+    def get(self, code, default=None):
+        i = self.index_of(code)
+        return self.record_at(i) if i is not None else default
+
+    def to_dict(self):
+        """Every record in the legacy order, built column by column (same key order as record_at)."""
+        codes = self.ids.tolist()
+        records = [{"stock_id": code} for code in codes]
+        for path in self.schema:
+            *parents, leaf = path.split(".")
+            for rec, v in zip(records, self.values(path)):
+                if v is _MISSING: continue
+                for k in parents:
+                    rec = rec.setdefault(k, {})
+                rec[leaf] = v
+        return {codes[i]: records[i] for i in self.order.tolist()}
+
+
+def open_store(store_dir=STORE_DIR):
+    """Open the store if it exists, else None (callers fall back to legacy JSON)."""
+    if not os.path.exists(os.path.join(store_dir, "meta.json")):
+        return None
+    try:
+        return ColumnarStore(store_dir)
+    except Exception as e:
+        print(f"⚠️ Failed to open columnar store: {e}")
+        return None
+
+
+def _file_sig(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def mark_synced(store_dir, json_path):
+    """Record which legacy JSON file (size, mtime) the store matches."""
+    meta_path = os.path.join(store_dir, "meta.json")
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["json_sig"] = _file_sig(json_path)
+    tmp = f"{meta_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, meta_path)
+
+
+def store_is_current(store_dir, json_path):
+    """
+    True when the store reflects the legacy JSON: it was built from / exported to
+    this exact file, or it is newer. A hand-patched JSON (patch_2330.py etc.) wins.
+    """
+    meta_path = os.path.join(store_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    if not os.path.exists(json_path):
+        return True
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("json_sig") == _file_sig(json_path):
+            return True
+    except Exception:
+        return False
+    return os.path.getmtime(meta_path) >= os.path.getmtime(json_path)
+
+
+def export_legacy_json(store, json_path, indent=2):
+    """Store -> legacy stock_data.json for the static frontend (atomic rename)."""
+    db = store.to_dict()
+    tmp = f"{json_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(db, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp, json_path)
+    mark_synced(store.store_dir, json_path)
+    return db
+
+
+def load_stock_db(json_path, store_dir=STORE_DIR):
+    """
+    Full {code: record} dict. Prefers the columnar store when it is current,
+    otherwise parses the legacy JSON.
+    """
+    if store_is_current(store_dir, json_path):
+        store = open_store(store_dir)
+        if store is not None:
+            return store.to_dict()
+    if not os.path.exists(json_path):
+        return {}
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar stock store tools")
+    parser.add_argument("action", choices=["build", "export"])
+    parser.add_argument("--json", default=os.path.join(BASE_DIR, "frontend", "public", "stock_data.json"))
+    parser.add_argument("--store", default=STORE_DIR)
+    args = parser.parse_args()
+
+    if args.action == "build":
+        with open(args.json, "r", encoding="utf-8") as f:
+            db = json.load(f)
+        meta = write_store(db, args.store)
+        mark_synced(args.store, args.json)
+        print(f"✅ Built store ({meta['rows']} stocks, {len(meta['schema'])} columns) at {args.store}")
+    else:
+        store = open_store(args.store)
+        if store is None:
+            raise SystemExit(f"❌ No store at {args.store}")
+        export_legacy_json(store, args.json)
+        print(f"✅ Exported {len(store)} stocks to {args.json}")
@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+# --- Content-Addressed Change Detection ---
+# Writers hash their output canonically (sorted keys, no whitespace, volatile keys
+# such as "last_updated" left out) and compare with the snapshot already on disk:
+#   - unchanged -> the file is not rewritten (no git diff, no Vercel build)
+#   - changed   -> written atomically
+# Every run also leaves a compact delta at frontend/public/delta/<job>.json:
+#   {"job", "run_at", "changed", "hash", "added", "removed", "changed_records": {id: [field, ...]}}
+# so the deploy step (and clients) act on what changed instead of the whole file.
+#
+#   python backend/storage/delta.py changed   (exit 0 if any job's last run changed its output)
+#   python backend/storage/delta.py show
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DELTA_DIR = os.path.join(BASE_DIR, "frontend", "public", "delta")
+VOLATILE_KEYS = ("last_updated",)
+
+
+def canonical(obj, volatile=()):
+    """Canonical JSON text of obj (top-level volatile keys dropped)."""
+    if volatile and isinstance(obj, dict):
+        obj = {k: v for k, v in obj.items() if k not in volatile}
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def content_hash(obj, volatile=()):
+    return hashlib.sha256(canonical(obj, volatile).encode("utf-8")).hexdigest()[:16]
+
+
+def record_snapshot(db):
+    """{id: canonical text} of a record map (take it before the map is modified in place)."""
+    return {code: canonical(rec) for code, rec in db.items()}
+
+
+def snapshot_hash(snapshot):
+    h = hashlib.sha256()
+    for code in sorted(snapshot):
+        h.update(f"{code}\t{snapshot[code]}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def changed_fields(old, new, prefix=""):
+    """Dotted paths whose values differ (dicts are walked, lists / scalars compared whole)."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        out = []
+        for key in sorted(set(old) | set(new), key=str):
+            path = f"{prefix}.{key}" if prefix else str(key)
+            if key not in old or key not in new:
+                out.append(path)
+            elif old[key] != new[key]:
+                out.extend(changed_fields(old[key], new[key], path))
+        return out
+    return [prefix] if old != new else []
+
+
+def diff_records(previous, current):
+    """Two record_snapshot()s -> {"added", "removed", "changed_records": {id: [field, ...]}}"""
+    added, changed = [], {}
+    for code in sorted(current):
+        old = previous.get(code)
+        if old is None:
+            added.append(code)
+        elif old != current[code]:
+            changed[code] = changed_fields(json.loads(old), json.loads(current[code]))
+    removed = sorted(code for code in previous if code not in current)
+    return {"added": added, "removed": removed, "changed_records": changed}
+
+
+def is_empty(delta):
+    return not (delta["added"] or delta["removed"] or delta["changed_records"])
+
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_if_changed(path, obj, indent=2, volatile=VOLATILE_KEYS):
+    """Atomically write obj unless the file on disk has the same content. -> (written, hash)"""
+    digest = content_hash(obj, volatile)
+    old = read_json(path)
+    if old is not None and content_hash(old, volatile) == digest:
+        return False, digest
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp, path)
+    return True, digest
+
+
+def write_delta(job, changed, digest, delta=None, out_dir=None):
+    """<job>.json for this run (written every run; `changed` says whether outputs moved)."""
+    out_dir = out_dir or DELTA_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    delta = delta or {"added": [], "removed": [], "changed_records": {}}
+    report = {
+        "job": job,
+        "run_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "changed": bool(changed),
+        "hash": digest,
+        "counts": {"added": len(delta["added"]), "removed": len(delta["removed"]),
+                   "changed": len(delta["changed_records"])},
+        **delta,
+    }
+    path = os.path.join(out_dir, f"{job}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    c = report["counts"]
+    print(f"🧾 Delta [{job}]: {'changed' if changed else 'unchanged'}"
+          + ("" if is_empty(delta) else f" (+{c['added']} -{c['removed']} ~{c['changed']} records)"))
+    return report
+
+
+def load_deltas(out_dir=None):
+    out_dir = out_dir or DELTA_DIR
+    if not os.path.isdir(out_dir):
+        return {}
+    out = {}
+    for name in sorted(os.listdir(out_dir)):
+        if name.endswith(".json"):
+            report = read_json(os.path.join(out_dir, name))
+            if report: out[report.get("job", name[:-5])] = report
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-run output deltas")
+    parser.add_argument("action", choices=["changed", "show"])
+    parser.add_argument("--dir", default=DELTA_DIR)
+    args = parser.parse_args()
+
+    deltas = load_deltas(args.dir)
+    for job, d in deltas.items():
+        c = d.get("counts", {})
+        print(f"   - {job:<10} {'changed' if d.get('changed') else 'unchanged':<9} {d.get('run_at')} "
+              f"+{c.get('added', 0)} -{c.get('removed', 0)} ~{c.get('changed', 0)}")
+    if args.action == "changed":
+        sys.exit(0 if any(d.get("changed") for d in deltas.values()) else 1)
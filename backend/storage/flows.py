@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import argparse
+import datetime
+
+import numpy as np
+
+from backend import transport
+from backend.storage.columnar import BASE_DIR
+from backend.storage.ohlcv import weekdays
+
+# --- Institutional Flow History ---
+#   days/2026-02-13.npz   codes ('<U4', sorted), foreign / trust (int64 lots) for one day
+#   meta.json             {"days": [...], "holidays": [...]}
+#   state.npz             rolling aggregates (see FlowState)
+# The rolling 5/20/60-day sums are maintained incrementally: each new day is
+# added and the day leaving each window is subtracted, so a daily update reads
+# at most len(WINDOWS) old day files regardless of history length.
+
+FLOWS_DIR = os.path.join(BASE_DIR, "data", "flows")
+WINDOWS = (5, 20, 60)
+INCREMENTAL_LOOKBACK_DAYS = 7
+STATE_VERSION = 1
+
+
+class FlowStore:
+    """Per-day foreign / trust net arrays."""
+
+    def __init__(self, root=None):
+        self.root = root or FLOWS_DIR
+        self.meta = {"days": [], "holidays": []}
+        path = os.path.join(self.root, "meta.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+
+    def _save_meta(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "meta.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _day_path(self, day):
+        return os.path.join(self.root, "days", f"{day}.npz")
+
+    def days(self):
+        return list(self.meta["days"])
+
+    def last_day(self):
+        return self.meta["days"][-1] if self.meta["days"] else None
+
+    def has_day(self, day):
+        day = str(day)
+        return day in self.meta["days"] or day in self.meta["holidays"]
+
+    def read_day(self, day):
+        with np.load(self._day_path(day)) as z:
+            return z["codes"], z["foreign"], z["trust"]
+
+    def write_days(self, chips_by_day, holidays=()):
+        """{date: {code: {"foreign", "trust"}}} -> one .npz per day."""
+        os.makedirs(os.path.join(self.root, "days"), exist_ok=True)
+        written = set()
+        for day, chips_map in chips_by_day.items():
+            if not chips_map: continue
+            day = str(day)
+            codes = np.array(sorted(chips_map), dtype="<U4")
+            foreign = np.array([chips_map[c].get("foreign") or 0 for c in codes], dtype=np.int64)
+            trust = np.array([chips_map[c].get("trust") or 0 for c in codes], dtype=np.int64)
+            tmp = self._day_path(day) + ".tmp.npz"
+            np.savez(tmp, codes=codes, foreign=foreign, trust=trust)
+            os.replace(tmp, self._day_path(day))
+            written.add(day)
+        self.meta["days"] = sorted(set(self.meta["days"]) | written)
+        self.meta["holidays"] = sorted((set(self.meta["holidays"]) | {str(d) for d in holidays}) - written)
+        self._save_meta()
+        return len(written)
+
+
+def _align(src_codes, values, dst_codes):
+    """values indexed by src_codes -> dst_codes order (0 where absent)."""
+    out = np.zeros(len(dst_codes), dtype=np.int64)
+    if len(src_codes) == 0:
+        return out
+    idx = np.searchsorted(src_codes, dst_codes)
+    idx = np.clip(idx, 0, len(src_codes) - 1)
+    hit = src_codes[idx] == dst_codes
+    out[hit] = values[idx[hit]]
+    return out
+
+
+def _streak(prev, net):
+    """Signed consecutive-day count: +n buy days, -n sell days, 0 on a flat day."""
+    up = np.where(prev > 0, prev + 1, 1)
+    down = np.where(prev < 0, prev - 1, -1)
+    return np.where(net > 0, up, np.where(net < 0, down, 0))
+
+
+class FlowState:
+    """
+    Rolling aggregates aligned to `codes`:
+    foreign_{N}d / trust_{N}d sums, foreign_streak / trust_streak, and the
+    trailing list of days inside the longest window.
+    """
+
+    def __init__(self, codes=None):
+        self.codes = np.array(codes if codes is not None else [], dtype="<U4")
+        n = len(self.codes)
+        self.sums = {f"{who}_{w}d": np.zeros(n, dtype=np.int64) for who in ("foreign", "trust") for w in WINDOWS}
+        self.streaks = {"foreign_streak": np.zeros(n, dtype=np.int64), "trust_streak": np.zeros(n, dtype=np.int64)}
+        self.window_days = []
+
+    @property
+    def last_day(self):
+        return self.window_days[-1] if self.window_days else None
+
+    def _extend_universe(self, codes):
+        new = np.setdiff1d(codes, self.codes)
+        if len(new) == 0:
+            return
+        merged = np.union1d(self.codes, new).astype("<U4")
+        self.sums = {k: _align(self.codes, v, merged) for k, v in self.sums.items()}
+        self.streaks = {k: _align(self.codes, v, merged) for k, v in self.streaks.items()}
+        self.codes = merged
+
+    def add_day(self, store, day):
+        """Fold one stored day in; subtract the day leaving each window."""
+        codes, foreign, trust = store.read_day(day)
+        self._extend_universe(codes)
+        f_new = _align(codes, foreign, self.codes)
+        t_new = _align(codes, trust, self.codes)
+
+        for w in WINDOWS:
+            self.sums[f"foreign_{w}d"] += f_new
+            self.sums[f"trust_{w}d"] += t_new
+            if len(self.window_days) >= w:
+                old_codes, old_f, old_t = store.read_day(self.window_days[-w])
+                self.sums[f"foreign_{w}d"] -= _align(old_codes, old_f, self.codes)
+                self.sums[f"trust_{w}d"] -= _align(old_codes, old_t, self.codes)
+
+        self.streaks["foreign_streak"] = _streak(self.streaks["foreign_streak"], f_new)
+        self.streaks["trust_streak"] = _streak(self.streaks["trust_streak"], t_new)
+        self.window_days = (self.window_days + [str(day)])[-max(WINDOWS):]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, version=STATE_VERSION, codes=self.codes,
+                 window_days=np.array(self.window_days, dtype="<U10"), **self.sums, **self.streaks)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as z:
+                if int(z["version"]) != STATE_VERSION:
+                    return None
+                state = cls(z["codes"])
+                state.sums = {k: z[k] for k in state.sums}
+                state.streaks = {k: z[k] for k in state.streaks}
+                state.window_days = [str(d) for d in z["window_days"]]
+            return state
+        except Exception as e:
+            print(f"⚠️ Failed to load flow state: {e}")
+            return None
+
+    def records(self):
+        """{code: chips fields} including the flow label for chips.analysis."""
+        keys = list(self.sums) + list(self.streaks)
+        cols = [self.sums.get(k, self.streaks.get(k)) for k in keys]
+        n_days = len(self.window_days)
+        out = {}
+        for i, code in enumerate(self.codes):
+            rec = {k: int(col[i]) for k, col in zip(keys, cols)}
+            rec["flow_days"] = n_days
+            rec["analysis"] = flow_label(rec)
+            out[str(code)] = rec
+        return out
+
+
+def flow_label(rec):
+    """Accumulating / Distributing when the 5- and 20-day combined flows agree."""
+    if rec.get("flow_days", 0) < 5:
+        return "N/A"
+    short = rec["foreign_5d"] + rec["trust_5d"]
+    mid = rec["foreign_20d"] + rec["trust_20d"]
+    if short > 0 and mid > 0: return "Accumulating"
+    if short < 0 and mid < 0: return "Distributing"
+    return "Mixed"
+
+
+def update_state(store, state_path=None):
+    """
+    Bring the rolling state up to the store's last day.
+    Incremental when the state's window still matches the store's days up to
+    its last day; otherwise (a backfill or refill added older days) rebuilt
+    from the last max(WINDOWS) days only.
+    """
+    state_path = state_path or os.path.join(store.root, "state.npz")
+    days = store.days()
+    state = FlowState.load(state_path)
+    end = days.index(state.last_day) + 1 if state is not None and state.last_day in days else None
+    if end is not None and state.window_days == days[:end][-max(WINDOWS):]:
+        pending = days[end:]
+        mode = "incremental"
+    else:
+        state = FlowState()
+        pending = days[-max(WINDOWS):]
+        mode = "rebuild"
+    for day in pending:
+        state.add_day(store, day)
+    if pending:
+        state.save(state_path)
+    return state, mode, len(pending)
+
+
+def ingest(store, engine, days, twse_domain, tpex_domain, headers=None, chunk=60):
+    """
+    Fetch T86 / TPEx tables for the given days on the engine pool and store them.
+    Only days both markets answer empty become holidays; failed days (None) are retried next run.
+    """
+    from backend.scrapers.chips import fetch_chips_day
+    today = transport.today()
+    todo = [d for d in days if not store.has_day(d.strftime("%Y-%m-%d"))]
+    written = failed = 0
+    for i in range(0, len(todo), chunk):
+        batch = todo[i:i + chunk]
+        maps = engine.map(lambda d: fetch_chips_day(engine, d, twse_domain, tpex_domain, headers), batch)
+        by_day = {d.strftime("%Y-%m-%d"): m for d, m in zip(batch, maps) if m is not None}
+        failed += sum(1 for m in maps if m is None)
+        holidays = [d.strftime("%Y-%m-%d") for d, m in zip(batch, maps) if m == {} and d < today]
+        written += store.write_days(by_day, holidays=holidays)
+        print(f"   🏦 Flows: {min(i + chunk, len(todo))}/{len(todo)} days checked, {written} stored"
+              + (f", {failed} failed (retried next run)" if failed else ""))
+    return written
+
+
+def backfill(store, engine, days_back, twse_domain, tpex_domain, headers=None):
+    end = transport.today()
+    start = end - datetime.timedelta(days=days_back)
+    return ingest(store, engine, list(weekdays(start, end)), twse_domain, tpex_domain, headers)
+
+
+def update(store, engine, twse_domain, tpex_domain, headers=None):
+    """Store every trading day since the last stored one (daily ETL); the lookback window is always re-checked."""
+    end = transport.today()
+    start = end - datetime.timedelta(days=INCREMENTAL_LOOKBACK_DAYS)
+    last = store.last_day()
+    if last:
+        start = min(start, datetime.date.fromisoformat(last) + datetime.timedelta(days=1))
+    return ingest(store, engine, list(weekdays(start, end)), twse_domain, tpex_domain, headers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Institutional flow history")
+    parser.add_argument("action", choices=["backfill", "update", "show"])
+    parser.add_argument("arg", nargs="?", help="stock code (show)")
+    parser.add_argument("--days", type=int, default=120, help="calendar days to backfill")
+    parser.add_argument("--root", default=FLOWS_DIR)
+    parser.add_argument("--twse", default="https://www.twse.com.tw")
+    parser.add_argument("--tpex", default="https://www.tpex.org.tw")
+    args = parser.parse_args()
+
+    store = FlowStore(args.root)
+    if args.action in ("backfill", "update"):
+        from backend.fetch_engine import FetchEngine
+        engine = FetchEngine()
+        start = time.perf_counter()
+        if args.action == "backfill":
+            n = backfill(store, engine, args.days, args.twse, args.tpex)
+        else:
+            n = update(store, engine, args.twse, args.tpex)
+        engine.shutdown()
+        state, mode, added = update_state(store)
+        print(f"✅ {n} new days in {time.perf_counter() - start:.1f}s; aggregates {mode} (+{added} days, "
+              f"window ends {state.last_day})")
+    else:
+        state, _, _ = update_state(store)
+        print(json.dumps(state.records().get(args.arg), ensure_ascii=False, indent=2))
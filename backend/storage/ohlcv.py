@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend import transport
+from backend.storage.columnar import BASE_DIR, _atomic_replace_dir
+from backend.models.stock_data import DailyQuote
+
+# --- Market-wide Daily OHLCV Store ---
+# Partitioned by year, columnar inside each partition:
+#   meta.json                 {"version", "days": [...], "holidays": [...], "years": [...]}
+#   2025/dates.npy            '<U10' ISO dates, sorted (rows)
+#   2025/codes.npy            '<U' stock codes, sorted (columns)
+#   2025/{open,high,low,close}.npy   float32 (days x codes), NaN = no trade
+#   2025/volume.npy           float64 (days x codes), shares
+# One day's cross-section is one contiguous row; one stock's series is one
+# column per partition. Both are read through mmap without parsing text.
+
+OHLCV_DIR = os.path.join(BASE_DIR, "data", "ohlcv")
+OHLCV_VERSION = 1
+PRICE_FIELDS = ("open", "high", "low", "close")
+FIELDS = PRICE_FIELDS + ("volume",)
+INCREMENTAL_LOOKBACK_DAYS = 7  # First incremental run on an empty store
+
+
+def _iso(day):
+    return day.strftime("%Y-%m-%d") if hasattr(day, "strftime") else str(day)[:10]
+
+
+def weekdays(start, end):
+    """Mon-Fri dates in [start, end]."""
+    day = start
+    while day <= end:
+        if day.weekday() <= 4:
+            yield day
+        day += datetime.timedelta(days=1)
+
+
+class OHLCVStore:
+    """
+    Reader / writer for the partitioned OHLCV store.
+    - series(code): one stock's history (DataFrame indexed by date)
+    - cross_section(date): all stocks for one day (DataFrame indexed by code)
+    - write_days({date: frame}): merge new days into their year partitions
+    """
+
+    def __init__(self, root=None):
+        self.root = root or OHLCV_DIR
+        self._parts = {}
+        self._lock = threading.Lock()
+        self.meta = self._load_meta()
+
+    def _load_meta(self):
+        path = os.path.join(self.root, "meta.json")
+        if not os.path.exists(path):
+            return {"version": OHLCV_VERSION, "days": [], "holidays": [], "years": []}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_meta(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "meta.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    # --- Reading ---
+    def _partition(self, year):
+        year = str(year)
+        if year not in self._parts:
+            d = os.path.join(self.root, year)
+            if not os.path.exists(os.path.join(d, "dates.npy")):
+                return None
+            self._parts[year] = {
+                name: np.load(os.path.join(d, f"{name}.npy"), mmap_mode="r")
+                for name in ("dates", "codes") + FIELDS
+            }
+        return self._parts[year]
+
+    def days(self):
+        return list(self.meta["days"])
+
+    def last_day(self):
+        return self.meta["days"][-1] if self.meta["days"] else None
+
+    def has_day(self, day):
+        day = _iso(day)
+        return day in set(self.meta["days"]) or day in set(self.meta["holidays"])
+
+    def series(self, code, start=None, end=None):
+        """One stock's OHLCV, oldest first. start/end: ISO dates (inclusive)."""
+        frames = []
+        for year in self.meta["years"]:
+            if start and str(year) < start[:4]: continue
+            if end and str(year) > end[:4]: continue
+            part = self._partition(year)
+            if part is None: continue
+            codes = part["codes"]
+            i = int(np.searchsorted(codes, code))
+            if i >= len(codes) or codes[i] != code: continue
+            dates = part["dates"]
+            lo = int(np.searchsorted(dates, start)) if start else 0
+            hi = int(np.searchsorted(dates, end, side="right")) if end else len(dates)
+            frames.append(pd.DataFrame(
+                {name: np.asarray(part[name][lo:hi, i], dtype=np.float64) for name in FIELDS},
+                index=pd.Index(np.asarray(dates[lo:hi]), name="date")))
+        if not frames:
+            return pd.DataFrame(columns=list(FIELDS)).rename_axis("date")
+        out = pd.concat(frames)
+        return out[out["close"].notna()]
+
+    def cross_section(self, day):
+        """All stocks traded on one day (DataFrame indexed by code)."""
+        day = _iso(day)
+        part = self._partition(day[:4])
+        if part is None:
+            return pd.DataFrame(columns=list(FIELDS)).rename_axis("code")
+        dates = part["dates"]
+        i = int(np.searchsorted(dates, day))
+        if i >= len(dates) or dates[i] != day:
+            return pd.DataFrame(columns=list(FIELDS)).rename_axis("code")
+        out = pd.DataFrame(
+            {name: np.asarray(part[name][i], dtype=np.float64) for name in FIELDS},
+            index=pd.Index(np.asarray(part["codes"]), name="code"))
+        return out[out["close"].notna()]
+
+    def matrix(self, last_n=300):
+        """
+        Universe matrices over the last `last_n` stored days.
+        Returns (codes, dates, {field: float64 array (stocks x days)}), NaN = no trade.
+        """
+        days = self.meta["days"][-last_n:]
+        if not days:
+            return np.array([], dtype=str), np.array([], dtype=str), {name: np.empty((0, 0)) for name in FIELDS}
+        parts = {name: [] for name in FIELDS}
+        for year in sorted({d[:4] for d in days}):
+            part = self._partition(year)
+            if part is None: continue
+            dates = np.asarray(part["dates"])
+            lo = int(np.searchsorted(dates, days[0]))
+            index = pd.Index(dates[lo:])
+            columns = pd.Index(np.asarray(part["codes"]))
+            for name in FIELDS:
+                parts[name].append(pd.DataFrame(np.asarray(part[name][lo:], dtype=np.float64), index=index, columns=columns))
+        wide = {name: pd.concat(frames).sort_index(axis=1) for name, frames in parts.items()}
+        ref = wide["close"]
+        arrays = {name: wide[name].reindex(index=ref.index, columns=ref.columns).to_numpy().T for name in FIELDS}
+        return np.array(ref.columns, dtype=str), np.array(ref.index, dtype=str), arrays
+
+    def quotes(self, code, start=None, end=None):
+        """series() as DailyQuote models (API shape)."""
+        df = self.series(code, start, end)
+        return [
+            DailyQuote(date=d, open=o, high=h, low=l, close=c, volume=int(v) if v == v else 0)
+            for d, o, h, l, c, v in zip(df.index, df["open"], df["high"], df["low"], df["close"], df["volume"])
+        ]
+
+    # --- Writing ---
+    def _read_wide(self, year):
+        """Existing partition -> {field: DataFrame (dates x codes)} in memory."""
+        part = self._partition(year)
+        if part is None:
+            return {}
+        index = pd.Index(np.asarray(part["dates"]))
+        columns = pd.Index(np.asarray(part["codes"]))
+        return {name: pd.DataFrame(np.asarray(part[name]), index=index, columns=columns) for name in FIELDS}
+
+    def write_days(self, frames, holidays=()):
+        """
+        Merge {date: code-indexed OHLCV frame} into the store. Each touched year
+        partition is rewritten once (atomic directory swap); re-written days replace old rows.
+        """
+        frames = {_iso(d): f for d, f in frames.items() if f is not None and not f.empty}
+        with self._lock:
+            by_year = {}
+            for day, frame in frames.items():
+                by_year.setdefault(day[:4], {})[day] = frame
+
+            for year, days in sorted(by_year.items()):
+                wide = self._read_wide(year)
+                new = {name: pd.DataFrame({day: f[name] for day, f in days.items()}).T for name in FIELDS}
+                out_dir = os.path.join(self.root, year)
+                tmp_dir = f"{out_dir}.tmp"
+                if os.path.exists(tmp_dir):
+                    shutil.rmtree(tmp_dir)
+                os.makedirs(tmp_dir)
+
+                merged = {}
+                for name in FIELDS:
+                    m = new[name].combine_first(wide[name]) if name in wide else new[name]
+                    merged[name] = m.sort_index().sort_index(axis=1)
+                ref = merged["close"]
+                np.save(os.path.join(tmp_dir, "dates.npy"), np.array(ref.index, dtype="<U10"))
+                np.save(os.path.join(tmp_dir, "codes.npy"), np.array(ref.columns, dtype=str))
+                for name in FIELDS:
+                    dtype = np.float64 if name == "volume" else np.float32
+                    arr = merged[name].reindex(index=ref.index, columns=ref.columns).to_numpy(dtype=dtype)
+                    np.save(os.path.join(tmp_dir, f"{name}.npy"), arr)
+
+                self._parts.pop(year, None)
+                _atomic_replace_dir(tmp_dir, out_dir)
+
+            self.meta["days"] = sorted(set(self.meta["days"]) | set(frames))
+            self.meta["holidays"] = sorted((set(self.meta["holidays"]) | {_iso(d) for d in holidays}) - set(frames))
+            self.meta["years"] = sorted(set(self.meta["years"]) | {int(y) for y in by_year})
+            self.meta["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self._save_meta()
+        return len(frames)
+
+
+def fetch_days(engine, days, twse_domain, tpex_domain, headers=None):
+    """Fetch many days on the engine's pool (host limiters bound the request rate)."""
+    from backend.scrapers.quotes import fetch_ohlcv_day
+    frames = engine.map(lambda d: fetch_ohlcv_day(engine, d, twse_domain, tpex_domain, headers), days)
+    return dict(zip(days, frames))
+
+
+def ingest(store, engine, days, twse_domain, tpex_domain, headers=None, chunk=60):
+    """
+    Fetch + write the given trading days in chunks (bounded memory, progress
+    survives interruption). Past weekdays both markets answer empty are recorded
+    as holidays; failed days (None) are left out so the next run retries them.
+    """
+    today = transport.today()
+    todo = [d for d in days if not store.has_day(d)]
+    written = failed = 0
+    for i in range(0, len(todo), chunk):
+        batch = todo[i:i + chunk]
+        frames = fetch_days(engine, batch, twse_domain, tpex_domain, headers)
+        failed += sum(1 for f in frames.values() if f is None)
+        holidays = [d for d, f in frames.items() if f is not None and f.empty and d < today]
+        written += store.write_days(frames, holidays=holidays)
+        print(f"   📈 OHLCV: {min(i + chunk, len(todo))}/{len(todo)} days checked, {written} stored"
+              + (f", {failed} failed (retried next run)" if failed else ""))
+    return written
+
+
+def backfill(store, engine, years, twse_domain, tpex_domain, headers=None):
+    """Fill the last `years` years of trading days (skips days already stored)."""
+    end = transport.today()
+    start = end - datetime.timedelta(days=int(365.25 * years))
+    return ingest(store, engine, list(weekdays(start, end)), twse_domain, tpex_domain, headers)
+
+
+def update(store, engine, twse_domain, tpex_domain, headers=None):
+    """
+    Append every trading day since the last stored one (incremental daily run).
+    The lookback window is always re-checked so days that failed earlier get filled.
+    """
+    end = transport.today()
+    start = end - datetime.timedelta(days=INCREMENTAL_LOOKBACK_DAYS)
+    last = store.last_day()
+    if last:
+        start = min(start, datetime.date.fromisoformat(last) + datetime.timedelta(days=1))
+    return ingest(store, engine, list(weekdays(start, end)), twse_domain, tpex_domain, headers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Market-wide daily OHLCV store")
+    parser.add_argument("action", choices=["backfill", "update", "series", "day"])
+    parser.add_argument("arg", nargs="?", help="stock code (series) or YYYY-MM-DD (day)")
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--root", default=OHLCV_DIR)
+    parser.add_argument("--twse", default="https://www.twse.com.tw")
+    parser.add_argument("--tpex", default="https://www.tpex.org.tw")
+    args = parser.parse_args()
+
+    store = OHLCVStore(args.root)
+    if args.action in ("backfill", "update"):
+        from backend.fetch_engine import FetchEngine
+        engine = FetchEngine()
+        start = time.perf_counter()
+        if args.action == "backfill":
+            n = backfill(store, engine, args.years, args.twse, args.tpex)
+        else:
+            n = update(store, engine, args.twse, args.tpex)
+        engine.shutdown()
+        print(f"✅ {n} new trading days in {time.perf_counter() - start:.1f}s "
+              f"({len(store.days())} total, last {store.last_day()})")
+    elif args.action == "series":
+        start = time.perf_counter()
+        df = store.series(args.arg)
+        print(df.tail(10))
+        print(f"⏱️ {len(df)} rows in {(time.perf_counter() - start) * 1000:.2f}ms")
+    else:
+        start = time.perf_counter()
+        df = store.cross_section(args.arg)
+        print(df.head(10))
+        print(f"⏱️ {len(df)} stocks in {(time.perf_counter() - start) * 1000:.2f}ms")
@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import hashlib
+
+# --- Sharded Static Layout (served by Vercel as plain files) ---
+#   stocks/manifest.json   {"version", "generated_at", "count", "stocks": [[id, name, hash], ...]}
+#   stocks/<id>.json       one minified record per stock
+# The frontend loads the small manifest, resolves the query locally, then fetches
+# /stocks/<id>.json?v=<hash> so unchanged shards stay in the browser cache.
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=False)
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_static_shards(db, out_dir):
+    """
+    Write one minified JSON per stock plus the manifest.
+    Order: changed shards -> manifest (atomic, skipped if unchanged) -> prune shards no longer listed,
+    so a reader holding any manifest version can always fetch its shards.
+    Returns {"written", "unchanged", "removed", "version"}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = unchanged = removed = 0
+    entries = []
+    version = hashlib.sha256()
+
+    for code in sorted(db):
+        rec = db[code]
+        data = _dumps(rec).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        version.update(f"{code}:{digest};".encode("utf-8"))
+        entries.append([code, rec.get("stock_name", code), digest])
+
+        path = os.path.join(out_dir, f"{code}.json")
+        try:
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    unchanged += 1
+                    continue
+        except OSError:
+            pass
+        _write_atomic(path, data)
+        written += 1
+
+    manifest = {
+        "version": version.hexdigest()[:12],
+        "generated_at": time.strftime("%Y-%m-%d %H:%M"),
+        "count": len(entries),
+        "stocks": entries,
+    }
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    # Same version = same shards: keep the old file (and its generated_at) so nothing needs redeploying
+    if previous.get("version") != manifest["version"] or previous.get("stocks") != entries:
+        _write_atomic(manifest_path, _dumps(manifest).encode("utf-8"))
+
+    keep = {f"{code}.json" for code in db} | {MANIFEST_NAME}
+    for name in os.listdir(out_dir):
+        if name.endswith(".json") and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+            removed += 1
+
+    return {"written": written, "unchanged": unchanged, "removed": removed, "version": manifest["version"]}
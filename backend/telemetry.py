@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# --- ETL Run Telemetry ---
+# One RunTelemetry per updater run. Every HTTP request that goes through
+# http_cache.cached_request is recorded against the current stage and host:
+#   requests, cache hits, bytes, status histogram, errors, retries, wall time
+# Stages also carry parse time and rows produced; http_session adds connection
+# reuse, short-circuited requests and circuit breaker transitions. At the end of the run the
+# report is written as <job>_last_run.json and appended to <job>_history.jsonl
+# (bounded) next to the JSON outputs, so runs can be compared over time.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TELEMETRY_DIR = os.path.join(BASE_DIR, "frontend", "public", "telemetry")
+HISTORY_MAX_RUNS = 100
+NO_STAGE = "(no stage)"
+
+
+def _host_stats():
+    return {"requests": 0, "cache_hits": 0, "bytes": 0, "status": {}, "errors": 0, "retries": 0, "elapsed_s": 0.0,
+            "new_connections": 0, "reused_connections": 0, "short_circuits": 0}
+
+
+def _stage_stats():
+    return {"wall_s": 0.0, "parse_s": 0.0, "rows": 0, "hosts": {}}
+
+
+class RunTelemetry:
+    def __init__(self, job):
+        self.job = job
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.started_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        self._t0 = time.perf_counter()
+        self.stages = {}
+        self.meta = {}
+        self.breakers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # --- Stage attribution ---
+    def current_stage(self):
+        return getattr(self._local, "stage", None) or NO_STAGE
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = _stage_stats()
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name):
+        """Attribute requests / parse time on this thread to `name` and time it."""
+        prev = getattr(self._local, "stage", None)
+        self._local.stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.stage = prev
+            with self._lock:
+                self._stage(name)["wall_s"] += elapsed
+
+    def bind(self, fn):
+        """Wrap fn so it runs under the caller's stage on another thread (worker pools)."""
+        name = getattr(self._local, "stage", None)
+        if name is None:
+            return fn
+        def run(*args, **kwargs):
+            with self.attribute(name):
+                return fn(*args, **kwargs)
+        return run
+
+    @contextmanager
+    def attribute(self, name):
+        """Like stage() but without adding wall time (pool workers inside a timed stage)."""
+        prev = getattr(self._local, "stage", None)
+        self._local.stage = name
+        try:
+            yield
+        finally:
+            self._local.stage = prev
+
+    # --- Counters ---
+    def record_request(self, url_or_host, status=None, nbytes=0, elapsed=0.0, cache_hit=False, error=False):
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._lock:
+            h = self._stage(self.current_stage())["hosts"].setdefault(host, _host_stats())
+            h["requests"] += 1
+            h["cache_hits"] += int(cache_hit)
+            h["bytes"] += int(nbytes or 0)
+            h["elapsed_s"] += elapsed
+            if error:
+                h["errors"] += 1
+            key = str(status) if status is not None else "error"
+            h["status"][key] = h["status"].get(key, 0) + 1
+
+    def record_retry(self, host):
+        with self._lock:
+            h = self._stage(self.current_stage())["hosts"].setdefault(host, _host_stats())
+            h["retries"] += 1
+
+    def record_connection(self, url_or_host, new):
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._lock:
+            h = self._stage(self.current_stage())["hosts"].setdefault(host, _host_stats())
+            h["new_connections" if new else "reused_connections"] += 1
+
+    def record_short_circuit(self, url_or_host):
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._lock:
+            h = self._stage(self.current_stage())["hosts"].setdefault(host, _host_stats())
+            h["short_circuits"] += 1
+
+    def record_breaker(self, host, state, trips):
+        """Circuit breaker transition (closed / open / half_open) for host."""
+        with self._lock:
+            b = self.breakers.setdefault(host, {"state": state, "trips": 0, "transitions": []})
+            b["state"] = state
+            b["trips"] = trips
+            b["transitions"].append([round(time.perf_counter() - self._t0, 3), state])
+
+    def add_rows(self, n, stage=None):
+        with self._lock:
+            self._stage(stage or self.current_stage())["rows"] += int(n or 0)
+
+    @contextmanager
+    def parse(self, stage=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._stage(stage or self.current_stage())["parse_s"] += elapsed
+
+    # --- Report ---
+    def report(self):
+        with self._lock:
+            stages = json.loads(json.dumps(self.stages))
+            breakers = json.loads(json.dumps(self.breakers))
+        hosts = {}
+        for s in stages.values():
+            s["wall_s"] = round(s["wall_s"], 3)
+            s["parse_s"] = round(s["parse_s"], 3)
+            for host, h in s["hosts"].items():
+                h["elapsed_s"] = round(h["elapsed_s"], 3)
+                t = hosts.setdefault(host, _host_stats())
+                for k in ("requests", "cache_hits", "bytes", "errors", "retries",
+                          "new_connections", "reused_connections", "short_circuits"):
+                    t[k] += h[k]
+                t["elapsed_s"] = round(t["elapsed_s"] + h["elapsed_s"], 3)
+                for code, n in h["status"].items():
+                    t["status"][code] = t["status"].get(code, 0) + n
+        return {
+            "job": self.job,
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "wall_s": round(time.perf_counter() - self._t0, 3),
+            "totals": {
+                "requests": sum(h["requests"] for h in hosts.values()),
+                "cache_hits": sum(h["cache_hits"] for h in hosts.values()),
+                "bytes": sum(h["bytes"] for h in hosts.values()),
+                "errors": sum(h["errors"] for h in hosts.values()),
+                "retries": sum(h["retries"] for h in hosts.values()),
+                "new_connections": sum(h["new_connections"] for h in hosts.values()),
+                "reused_connections": sum(h["reused_connections"] for h in hosts.values()),
+                "short_circuits": sum(h["short_circuits"] for h in hosts.values()),
+            },
+            "hosts": hosts,
+            "breakers": breakers,
+            "stages": stages,
+            "meta": self.meta,
+        }
+
+    def write(self, out_dir=None):
+        """<job>_last_run.json + append to <job>_history.jsonl (last HISTORY_MAX_RUNS runs)."""
+        out_dir = out_dir or TELEMETRY_DIR
+        report = self.report()
+        os.makedirs(out_dir, exist_ok=True)
+        last = os.path.join(out_dir, f"{self.job}_last_run.json")
+        tmp = f"{last}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, last)
+
+        history = os.path.join(out_dir, f"{self.job}_history.jsonl")
+        lines = []
+        if os.path.exists(history):
+            with open(history, "r", encoding="utf-8") as f:
+                lines = [l for l in f.read().splitlines() if l.strip()]
+        lines = (lines + [json.dumps(report, ensure_ascii=False, separators=(",", ":"))])[-HISTORY_MAX_RUNS:]
+        tmp = f"{history}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, history)
+        return report
+
+    def print_summary(self):
+        report = self.report()
+        t = report["totals"]
+        print(f"📡 Telemetry [{self.job}] {report['wall_s']:.1f}s, {t['requests']} requests "
+              f"({t['cache_hits']} cached), {t['bytes'] / 1e6:.1f} MB, {t['errors']} errors, {t['retries']} retries, "
+              f"{t['reused_connections']}/{t['new_connections'] + t['reused_connections']} connections reused")
+        for host, h in sorted(report["hosts"].items(), key=lambda x: -x[1]["elapsed_s"]):
+            print(f"   - {host:<24} {h['requests']:5d} req {h['elapsed_s']:7.2f}s {h['bytes'] / 1e6:7.2f} MB  {h['status']}"
+                  + (f"  🔌 {h['short_circuits']} short-circuited" if h["short_circuits"] else ""))
+        for host, b in report["breakers"].items():
+            print(f"   🔌 {host}: breaker {b['state']} ({b['trips']} trips)")
+        return report
+
+
+_current = RunTelemetry("adhoc")
+_current_lock = threading.Lock()
+
+
+def start_run(job):
+    """Begin a new run; every later record_* call goes to it."""
+    global _current
+    with _current_lock:
+        _current = RunTelemetry(job)
+    return _current
+
+
+def get_run():
+    return _current
+
+
+def finish_run(out_dir=None):
+    """Print the summary and write the report + history. Never raises."""
+    out_dir = out_dir or TELEMETRY_DIR
+    try:
+        run = get_run()
+        run.print_summary()
+        report = run.write(out_dir)
+        print(f"📡 Run report: {os.path.join(out_dir, run.job + '_last_run.json')}")
+        return report
+    except Exception as e:
+        print(f"⚠️ Telemetry write failed: {e}")
+        return None
@@ -0,0 +1,100 @@
+import time
+import threading
+import http.server
+
+import pytest
+
+from backend import transport
+from backend.bench import fixtures as fx
+
+# --- Local stub HTTP server ---
+# Serves recorded fixtures (backend/bench/fixtures) by path prefix on 127.0.0.1 and
+# logs every request (path, start, end) plus the peak number in flight, so tests can
+# check what the fetchers sent without touching the network.
+#
+#   python -m pytest -q backend/tests
+
+
+class StubServer:
+    def __init__(self, routes, delay=0.0):
+        """routes: {path prefix: (fixture name | bytes, content type)}. delay: seconds per response."""
+        self.routes = routes
+        self.delay = delay
+        self.hits = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.netloc = f"127.0.0.1:{self._server.server_address[1]}"
+        self.url = f"http://{self.netloc}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def _body(self, path):
+        for prefix, (body, ctype) in self.routes.items():
+            if path.startswith(prefix):
+                return (fx.load_bytes(body) if isinstance(body, str) else body), ctype
+        return None, None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                start = time.monotonic()
+                with stub._lock:
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    if stub.delay: time.sleep(stub.delay)
+                    body, ctype = stub._body(self.path)
+                    if body is None:
+                        body = b"not found"
+                        self.send_response(404)
+                    else:
+                        self.send_response(200)
+                        self.send_header("Content-Type", ctype)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+                        stub.hits.append((self.path, start, time.monotonic()))
+
+            def log_message(self, *args): pass
+
+        return Handler
+
+    def starts(self):
+        with self._lock:
+            return sorted(start for _, start, _ in self.hits)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """Factory: stub_server(routes, delay=0.0) -> StubServer (shut down after the test)."""
+    servers = []
+
+    def make(routes, delay=0.0):
+        servers.append(StubServer(routes, delay))
+        return servers[-1]
+
+    yield make
+    for s in servers:
+        s.close()
+
+
+@pytest.fixture
+def live_transport(monkeypatch):
+    """Plain live transport for this test, whatever MARKET_RADAR_TRANSPORT says."""
+    t = transport.make("live")
+    monkeypatch.setattr(transport, "_active", t)
+    return t
@@ -0,0 +1,95 @@
+import time
+import asyncio
+
+from backend.analysis import AIReportService, generate_rule_based_report
+
+REPORT = "### ⚡ 操盤手戰情室\nAI 綜合戰力: 88 分\n趨勢訊號: **強烈看多 (Strong Bull)**\n"
+
+
+def stock(code, price=100.0):
+    return {"stock_id": code, "stock_name": f"公司{code}",
+            "valuation": {"current_pe": 12.0, "sector_pe": 20.0, "price": price},
+            "revenue": {"mom": 3.0, "yoy": 25.0},
+            "chips": {"foreign_net": 1500, "trust_net": 200, "analysis": "Accumulating"}}
+
+
+class FakeModel:
+    """Async stand-in for the Gemini call: counts calls and records when each one started."""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.prompts = []
+        self.started = []
+
+    async def __call__(self, prompt):
+        self.started.append(time.monotonic())
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        return REPORT
+
+
+def test_concurrent_requests_share_one_model_call():
+    model = FakeModel()
+    service = AIReportService(model_call=model, rate_per_sec=100, burst=1)
+
+    async def run():
+        return await asyncio.gather(*(service.report(stock("2330")) for _ in range(20)))
+
+    reports = asyncio.run(run())
+    assert len(model.prompts) == 1
+    assert all(r is reports[0] for r in reports)
+    assert reports[0]["score"] == 88 and reports[0]["verdict"] == "強烈看多 (Strong Bull)"
+    assert service.stats["misses"] == 1 and service.stats["shared"] == 19
+
+
+def test_cache_hits_until_ttl_or_inputs_change():
+    model = FakeModel(delay=0)
+    service = AIReportService(model_call=model, rate_per_sec=100, burst=5, ttl=0.2)
+
+    async def run():
+        first = await service.report(stock("2330"))
+        again = await service.report(stock("2330"))
+        moved = await service.report(stock("2330", price=101.0))  # New inputs -> new report
+        await asyncio.sleep(0.25)
+        expired = await service.report(stock("2330"))
+        return first, again, moved, expired
+
+    first, again, moved, expired = asyncio.run(run())
+    assert again is first and service.stats["hits"] == 1
+    assert moved is not first and moved["input_hash"] != first["input_hash"]
+    assert expired is not first and expired["input_hash"] == first["input_hash"]
+    assert len(model.prompts) == 3
+
+
+def test_token_bucket_throttles_over_the_burst():
+    rate = 10.0
+    model = FakeModel(delay=0)
+    service = AIReportService(model_call=model, rate_per_sec=rate, burst=2)
+
+    async def run():
+        return await asyncio.gather(*(service.report(stock(str(2000 + i))) for i in range(6)))
+
+    start = time.monotonic()
+    asyncio.run(run())
+    offsets = sorted(t - start for t in model.started)
+    assert len(offsets) == 6
+    assert offsets[1] < 0.05                                   # The burst goes straight through
+    for i in range(2, 6):
+        assert offsets[i] >= (i - 1) / rate - 0.02, offsets    # Then one call per 1/rate seconds
+
+
+def test_model_failure_falls_back_to_rule_report_uncached():
+    model = FakeModel(delay=0, fail=True)
+    service = AIReportService(model_call=model, rate_per_sec=100, burst=5)
+    rec = stock("2330")
+
+    async def run():
+        return await service.report(rec), await service.report(rec)
+
+    first, second = asyncio.run(run())
+    assert first == generate_rule_based_report(rec)
+    assert second == first and len(model.prompts) == 2  # Failures are not cached
+    assert service.stats["errors"] == 2
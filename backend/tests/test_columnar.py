@@ -0,0 +1,64 @@
+import os
+import json
+
+import pytest
+
+from backend.storage.columnar import (BASE_DIR, ColumnarStore, export_legacy_json, load_stock_db, mark_synced,
+                                      open_store, write_store)
+
+STOCK_JSON = os.path.join(BASE_DIR, "frontend", "public", "stock_data.json")
+
+
+def _dump(db):
+    return json.dumps(db, ensure_ascii=False, indent=2)
+
+
+def test_export_matches_legacy_json_byte_for_byte(tmp_path):
+    with open(STOCK_JSON, "r", encoding="utf-8") as f:
+        raw = f.read()
+    db = json.loads(raw)
+    write_store(db, str(tmp_path / "store"))
+    store = ColumnarStore(str(tmp_path / "store"))
+
+    export_legacy_json(store, str(tmp_path / "out.json"))
+    assert (tmp_path / "out.json").read_text(encoding="utf-8") == raw
+    for code in list(db)[::97]:
+        assert _dump(store.get(code)) == _dump(db[code])
+
+
+def test_mixed_kinds_nulls_and_missing_keys_round_trip(tmp_path):
+    db = {
+        "2330": {"stock_id": "2330", "revenue": {"yoy": 0, "mom": 1.5, "history": [{"date": "2026-01", "revenue": 2.0}]},
+                 "chips": {"foreign_net": None, "analysis": "N/A"}, "tags": ["ai"], "flag": True},
+        "1101": {"stock_id": "1101", "revenue": {"yoy": 3.25, "mom": 0, "history": []},
+                 "chips": {"foreign_net": 12}},
+        "6488": {"stock_id": "6488", "chips": {"foreign_net": -3, "analysis": "Mixed"}, "flag": False},
+    }
+    meta = write_store(db, str(tmp_path / "store"))
+    assert meta["schema"]["revenue.yoy"] == "number" and meta["schema"]["chips.foreign_net"] == "int"
+    store = ColumnarStore(str(tmp_path / "store"))
+
+    assert _dump(store.to_dict()) == _dump(db)
+    assert list(store.to_dict()) == list(db)
+    assert _dump(store.get("1101")) == _dump(db["1101"])
+    assert store.get("9999") is None
+
+
+def test_old_store_version_falls_back_to_json(tmp_path):
+    db = {"2330": {"stock_id": "2330", "valuation": {"price": 1000.0}}}
+    json_path = str(tmp_path / "stock_data.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(db, f)
+    store_dir = str(tmp_path / "store")
+    write_store({"2330": {"stock_id": "2330", "valuation": {"price": 1.0}}}, store_dir)
+    mark_synced(store_dir, json_path)
+    assert load_stock_db(json_path, store_dir)["2330"]["valuation"]["price"] == 1.0
+
+    meta_path = os.path.join(store_dir, "meta.json")
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["version"] = 1
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    assert open_store(store_dir) is None
+    assert load_stock_db(json_path, store_dir) == db
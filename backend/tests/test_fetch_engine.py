@@ -0,0 +1,63 @@
+import time
+import datetime
+
+import pytest
+
+from backend import data_updater
+from backend.fetch_engine import FetchEngine
+from backend.scrapers.chips import T86_PATH, TPEX_3INSTI_PATH
+
+DELAY = 0.2       # Stub response time
+CONCURRENCY = 2   # Per-host limit under test
+INTERVAL = 0.1    # Min spacing between request starts
+SLACK = 0.02      # Timer / scheduling tolerance
+DAY = datetime.datetime(2026, 2, 13)
+
+
+@pytest.fixture
+def stub_hosts(stub_server, live_transport, monkeypatch):
+    """TWSE / TPEx / MOPS each on their own stub host, data_updater pointed at them with a fresh engine."""
+    hosts = {
+        "twse": stub_server({T86_PATH: ("t86", "application/json")}, delay=DELAY),
+        "tpex": stub_server({TPEX_3INSTI_PATH: ("tpex_3insti", "application/json")}, delay=DELAY),
+        "mops": stub_server({"/nas/t21/": ("mops_sii", "text/html")}, delay=DELAY),
+    }
+    engine = FetchEngine(use_cache=False, host_limits={s.netloc: (CONCURRENCY, INTERVAL) for s in hosts.values()})
+    monkeypatch.setattr(data_updater, "TWSE_DOMAIN", hosts["twse"].url)
+    monkeypatch.setattr(data_updater, "TPEX_DOMAIN", hosts["tpex"].url)
+    monkeypatch.setattr(data_updater, "MOPS_DOMAIN", hosts["mops"].url)
+    monkeypatch.setattr(data_updater, "ENGINE", engine)
+    yield hosts
+    engine.shutdown()
+
+
+def test_host_limiter_caps_concurrency_and_spaces_starts(stub_hosts):
+    mops = stub_hosts["mops"]
+    months = [DAY.replace(month=m) for m in range(1, 9)]
+    pages = data_updater.ENGINE.map(lambda d: data_updater.fetch_mops_page("sii", d), months)
+
+    assert all(pages)
+    assert len(mops.hits) == len(months)
+    assert mops.max_active == CONCURRENCY  # Bounded, and the pool did run requests in parallel
+    starts = mops.starts()
+    assert min(b - a for a, b in zip(starts, starts[1:])) >= INTERVAL - SLACK
+
+
+def test_run_stages_reports_per_stage_timings(stub_hosts):
+    engine = data_updater.ENGINE
+    stages = {
+        "twse_chips": data_updater.fetch_twse_chips_global,
+        "tpex_chips": data_updater.fetch_tpex_chips_global,
+        "mops_probe": lambda: data_updater.fetch_mops_page("sii", DAY),
+    }
+    start = time.perf_counter()
+    results = engine.run_stages(stages)
+    wall = time.perf_counter() - start
+
+    assert set(results) == set(stages)
+    assert len(results["twse_chips"]) > 10 and results["tpex_chips"] and results["mops_probe"]
+    assert set(engine.stage_timings) == set(stages)
+    for name, elapsed in engine.stage_timings.items():
+        assert elapsed >= DELAY - SLACK, name
+        assert elapsed <= wall + SLACK, name
+    assert wall < sum(engine.stage_timings.values())  # Stages ran concurrently
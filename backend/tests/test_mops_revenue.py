@@ -0,0 +1,139 @@
+import re
+import json
+import math
+import datetime
+from io import StringIO
+
+import pandas as pd
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from backend import data_updater
+from backend.bench import fixtures as fx
+from backend.scrapers.mops import parse_t21sc03_page
+
+ANCHOR = datetime.datetime(2026, 1, 1)
+MONTHS = [ANCHOR - relativedelta(months=i) for i in range(12)]  # Newest first, as fetched
+
+ROW = re.compile(r"(<tr align=right>)(.*?)(</tr>)", re.S)
+CELL = re.compile(r"(<td[^>]*>)(.*?)(</td>)", re.S)
+
+
+def month_page(html, k):
+    """The recorded page as it could look k months back: revenues scaled, some rows unfiled / '-' / 0 / blank YoY."""
+    def row(m):
+        cells = [list(c) for c in CELL.findall(m.group(2))]
+        code = int(cells[0][1])
+        if k and (code + k) % 11 == 0:
+            return ""
+        rev = int(cells[2][1].replace(",", ""))
+        if (code + k) % 13 == 0: cells[2][1] = "-"
+        elif (code + k) % 19 == 0: cells[2][1] = "0"
+        else: cells[2][1] = f"{rev * (100 - 3 * k) // 100:,}"
+        if (code + k) % 17 == 0: cells[6][1] = "N/A"  # read_html -> NaN
+        elif (code + k) % 23 == 0: cells[6][1] = "-"   # float() fails -> 0
+        return m.group(1) + "".join("".join(c) for c in cells) + m.group(3)
+    return ROW.sub(row, html)
+
+
+@pytest.fixture(scope="module")
+def pages():
+    """{(market, month): html} for 12 months x sii / otc."""
+    base = {"sii": fx.load_text("mops_sii"), "otc": fx.load_text("mops_otc")}
+    return {(mkt, d): month_page(base[mkt], k) for k, d in enumerate(MONTHS) for mkt in ("sii", "otc")}
+
+
+def baseline_revenue_maps(pages):
+    """The original iterrows loop of fetch_mops_revenue_history_global (network removed), kept as the reference."""
+    history_map = {}
+    latest_stats_map = {}
+    for target_date in MONTHS:
+        for mkt in ['sii', 'otc']:
+            try:
+                dfs = pd.read_html(StringIO(pages[(mkt, target_date)]))
+                for df in dfs:
+                    if df.shape[1] > 6:
+                        df.columns = [str(col) for col in df.columns]
+                        for _, row in df.iterrows():
+                            try:
+                                code = str(row.iloc[0]).strip()
+                                if len(code) != 4 or not code.isdigit(): continue
+                                rev_raw = row.iloc[2]
+                                if pd.isna(rev_raw) or str(rev_raw).strip() == '-': continue
+                                rev_val = float(str(rev_raw).replace(',', '')) * 1000
+
+                                if code not in history_map: history_map[code] = []
+                                history_map[code].append({
+                                    "date": target_date.strftime("%Y-%m"),
+                                    "revenue": rev_val
+                                })
+
+                                if code not in latest_stats_map:
+                                    try:
+                                        yoy = float(str(row.iloc[6]).replace(',', ''))
+                                        latest_stats_map[code] = {"mom": 0, "yoy": yoy}
+                                    except:
+                                        latest_stats_map[code] = {"mom": 0, "yoy": 0}
+                            except: continue
+            except: continue
+
+    for code, hist in history_map.items():
+        hist.reverse()
+        if len(hist) >= 2:
+            latest = hist[-1]['revenue']
+            prev = hist[-2]['revenue']
+            if prev > 0:
+                mom = ((latest - prev) / prev) * 100
+                if code in latest_stats_map:
+                    latest_stats_map[code]['mom'] = round(mom, 2)
+                else:
+                    latest_stats_map[code] = {"mom": round(mom, 2), "yoy": 0}
+    return history_map, latest_stats_map
+
+
+def _nan_safe(obj):
+    """NaN != NaN: spell it out so maps compare by value."""
+    if isinstance(obj, dict): return {k: _nan_safe(v) for k, v in obj.items()}
+    if isinstance(obj, list): return [_nan_safe(v) for v in obj]
+    if isinstance(obj, float) and math.isnan(obj): return "nan"
+    return obj
+
+
+def test_page_parse_matches_row_loop(pages):
+    """One page: vectorized [code, revenue, yoy] == the row loop's accepted rows, in table order."""
+    html = pages[("sii", MONTHS[1])]
+    frame = parse_t21sc03_page(html)
+    expected = []
+    for df in pd.read_html(StringIO(html)):
+        if df.shape[1] <= 6: continue
+        for _, row in df.iterrows():
+            code = str(row.iloc[0]).strip()
+            if len(code) != 4 or not code.isdigit(): continue
+            rev_raw = row.iloc[2]
+            if pd.isna(rev_raw) or str(rev_raw).strip() == '-': continue
+            try: rev_val = float(str(rev_raw).replace(',', '')) * 1000
+            except ValueError: continue
+            try: yoy = float(str(row.iloc[6]).replace(',', ''))
+            except ValueError: yoy = 0.0
+            expected.append((code, rev_val, yoy))
+    expected = pd.DataFrame(expected, columns=["code", "revenue", "yoy"])
+    assert frame["yoy"].isna().any()  # Blank YoY cells stay NaN, as float(str(nan)) did
+    pd.testing.assert_frame_equal(frame, expected, check_dtype=False)
+
+
+def test_revenue_maps_match_baseline(pages, monkeypatch):
+    monkeypatch.setattr(data_updater, "fetch_mops_page", lambda mkt, d, timeout=10: pages[(mkt, d)])
+    frame = data_updater.download_mops_months(MONTHS)
+    history, stats = data_updater.revenue_frame_to_maps(frame)
+    ref_history, ref_stats = baseline_revenue_maps(pages)
+
+    assert len(ref_history) > 1000
+    assert history == ref_history
+    assert _nan_safe(stats) == _nan_safe(ref_stats)
+    assert any(s["mom"] for s in stats.values()) and any(s["yoy"] == 0 for s in stats.values())
+
+    # And the revenue block written to stock_data.json is byte-identical
+    for code in ref_history:
+        got = data_updater.build_stock_record(code, {}, history, stats, {})["revenue"]
+        ref = data_updater.build_stock_record(code, {}, ref_history, ref_stats, {})["revenue"]
+        assert json.dumps(got) == json.dumps(ref), code
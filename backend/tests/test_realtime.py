@@ -0,0 +1,135 @@
+import time
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.realtime import MIS_PATH, MISPoller, RealtimeStore, TickRing, serve_stand_in
+
+TSE = ["2330", "2317", "2454", "2308", "2382"]
+OTC = ["6488", "5347"]
+CHUNK = 3   # 7 codes -> 3 chunks per cycle
+RING = 4    # Small ring so a few cycles wrap it
+
+
+@pytest.fixture
+def mis(live_transport):
+    """The stand-in MIS server on a free port; OTC codes only answer on otc_ channels."""
+    server = serve_stand_in(port=0, otc=OTC)
+    hits = []
+    handle = server.RequestHandlerClass.do_GET
+
+    def do_GET(self):
+        hits.append(self.path)
+        handle(self)
+
+    server.RequestHandlerClass.do_GET = do_GET
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    server.shutdown()
+    server.server_close()
+
+
+def poll(poller, cycles):
+    """Run `cycles` polls, returning the latest quote of every code after each one."""
+    seen = []
+    for _ in range(cycles):
+        time.sleep(0.005)  # Stand-in trade times are wall-clock ms: keep cycles apart
+        assert poller.poll_once() == len(TSE) + len(OTC)
+        seen.append({c: poller.store.latest(c) for c in TSE + OTC})
+    return seen
+
+
+def test_tick_ring_wraps_oldest_first():
+    ring = TickRing(3)
+    assert ring.last_ts() == 0 and ring.series()[0].tolist() == []
+    for i in range(1, 6):
+        ring.append(i * 1000, 100.0 + i, i * 10)
+    assert (ring.head, ring.count) == (2, 3)
+    ts, price, volume = ring.series()
+    assert ts.tolist() == [3000, 4000, 5000] and price.tolist() == [103.0, 104.0, 105.0]
+    assert volume.tolist() == [30, 40, 50] and ring.last_ts() == 5000
+    assert ring.series(since=3000)[0].tolist() == [4000, 5000]
+    assert ring.series(limit=1)[0].tolist() == [5000]
+
+
+def test_poll_once_discovers_markets_and_chunks(mis):
+    url, hits = mis
+    store = RealtimeStore(ring_size=RING)
+    poller = MISPoller(store, TSE + OTC, base_url=url, chunk_size=CHUNK, always=True)
+
+    poll(poller, 1)
+    assert poller.markets == {**{c: "tse" for c in TSE}, **{c: "otc" for c in OTC}}
+    # Warm-up, the tse discovery pass in 3 chunks, then the leftover codes as otc in one
+    requests = [h for h in hits if h.startswith(MIS_PATH)]
+    assert len(hits) == 1 + len(requests) and len(requests) == 4
+    assert all(len(r.split("%7C")) <= CHUNK for r in requests)
+    assert "otc_6488.tw" in requests[-1] and "otc_5347.tw" in requests[-1]
+
+    # Known markets: one request per chunk, OTC codes asked on otc_ straight away
+    del hits[:]
+    poll(poller, 1)
+    assert len(hits) == 3 and poller.stats["requests"] == 7 and poller.stats["errors"] == 0
+    assert sum("otc_" in h for h in hits) >= 1 and not any("tse_6488" in h for h in hits)
+    status = poller.status()
+    assert status["cycles"] == 2 and status["markets_known"] == 7 and status["unresolved"] == 0
+    assert status["symbols"] == 7 and status["ticks"] == 14
+
+
+def test_rings_keep_the_last_ticks_and_wrap(mis):
+    url, _ = mis
+    store = RealtimeStore(ring_size=RING)
+    poller = MISPoller(store, TSE + OTC, base_url=url, chunk_size=CHUNK, always=True)
+    seen = poll(poller, RING + 2)
+
+    for code in TSE + OTC:
+        ring = store.rings[code]
+        assert (ring.count, ring.head) == (RING, (RING + 2) % RING)  # Wrapped: the 2 oldest ticks are gone
+        kept = [s[code] for s in seen[-RING:]]
+        series = store.series(code)
+        assert series == {"ts": [q["ts"] for q in kept], "price": [q["price"] for q in kept],
+                          "volume": [q["volume"] for q in kept]}
+        assert series["ts"] == sorted(series["ts"]) and len(set(series["ts"])) == RING
+
+        latest = store.latest(code)
+        assert latest is seen[-1][code] and latest["code"] == code
+        assert latest["market"] == ("otc" if code in OTC else "tse")
+        assert latest["price"] == series["price"][-1] and latest["bid"] == round(latest["price"] - 0.5, 4)
+
+        since = store.series(code, since=series["ts"][1])
+        assert since["ts"] == series["ts"][2:]
+        assert store.series(code, limit=1)["price"] == series["price"][-1:]
+
+    assert store.series("9999") is None and store.latest("9999") is None
+    # An unchanged trade time adds no tick
+    assert store.update([dict(seen[-1]["2330"])]) == 0
+
+
+def test_realtime_api_serves_the_store(mis, monkeypatch):
+    url, _ = mis
+    store = RealtimeStore(ring_size=RING)
+    poller = MISPoller(store, TSE + OTC, base_url=url, chunk_size=CHUNK, always=True)
+    poll(poller, RING + 1)
+    monkeypatch.setattr(main, "REALTIME", store)
+    monkeypatch.setattr(main, "POLLER", poller)
+    client = TestClient(main.app)
+
+    body = client.get("/api/realtime", params={"codes": "2330,6488,9999"}).json()
+    assert body["status"]["cycles"] == RING + 1 and body["status"]["watchlist"] == 7
+    assert body["status"]["ticks"] == 7 * (RING + 1) and body["status"]["chunk_size"] == CHUNK
+    assert body["quotes"]["2330"] == store.latest("2330") and body["quotes"]["6488"]["market"] == "otc"
+    assert body["quotes"]["9999"] is None
+    assert "quotes" not in client.get("/api/realtime").json()
+
+    r = client.get("/api/realtime/5347")
+    assert r.status_code == 200 and r.json() == store.latest("5347")
+    assert client.get("/api/realtime/9999").status_code == 404
+
+    full = store.series("6488")
+    r = client.get("/api/realtime/6488/series")
+    assert r.status_code == 200 and r.json() == {"stock_id": "6488", "count": RING, **full}
+    tail = client.get("/api/realtime/6488/series", params={"since": full["ts"][1], "limit": 1}).json()
+    assert tail["count"] == 1 and tail["ts"] == full["ts"][-1:] and tail["price"] == full["price"][-1:]
+    assert client.get("/api/realtime/9999/series").status_code == 404
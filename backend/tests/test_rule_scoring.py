@@ -0,0 +1,153 @@
+import os
+import copy
+import json
+
+import pytest
+
+from backend.analysis import generate_rule_based_report, render_rule_report, score_universe
+from backend.storage.columnar import BASE_DIR
+
+STOCK_JSON = os.path.join(BASE_DIR, "frontend", "public", "stock_data.json")
+
+
+def original_rule_report(stock_data):
+    """The hand-written expert system before the rule table, kept verbatim as the reference."""
+    sid = stock_data.get('stock_id')
+    name = stock_data.get('stock_name', sid)
+
+    val = stock_data.get('valuation', {})
+    pe = val.get('current_pe', 0)
+    rev = stock_data.get('revenue', {})
+    yoy = rev.get('yoy', 0)
+    chips = stock_data.get('chips', {})
+    foreign = chips.get('foreign_net', 0)
+    trust = chips.get('trust_net', 0)
+
+    score = 50
+    bull_factors, bear_factors = [], []
+
+    if foreign > 1000:
+        score += 15
+        bull_factors.append(f"外資強力買超 ({foreign}張)。")
+    elif foreign > 0:
+        score += 5
+        bull_factors.append("外資站在買方。")
+    elif foreign < -1000:
+        score -= 15
+        bear_factors.append(f"外資調節 ({foreign}張)。")
+
+    if trust > 100:
+        score += 10
+        bull_factors.append("投信進場佈局。")
+
+    if yoy > 20:
+        score += 15
+        bull_factors.append(f"營收年增爆發 (+{yoy}%)。")
+    elif yoy < -20:
+        score -= 15
+        bear_factors.append(f"營收明顯衰退 ({yoy}%)。")
+
+    if pe > 0 and pe < 15:
+        score += 10
+        bull_factors.append(f"本益比 ({pe}x) 低廉。")
+    elif pe > 40:
+        score -= 10
+        bear_factors.append(f"本益比 ({pe}x) 偏高。")
+
+    tech = stock_data.get('technicals') or {}
+    price = val.get('price', 0)
+    ma20, ma60, rsi = tech.get('ma20'), tech.get('ma60'), tech.get('rsi14')
+    if price and ma20 and ma60:
+        if price > ma20 > ma60:
+            score += 10
+            bull_factors.append("多頭排列 (站上月線與季線)。")
+        elif price < ma20 < ma60:
+            score -= 10
+            bear_factors.append("空頭排列 (跌破月線與季線)。")
+    if rsi is not None:
+        if rsi >= 80:
+            score -= 5
+            bear_factors.append(f"RSI 過熱 ({rsi})。")
+        elif rsi <= 20:
+            score += 5
+            bull_factors.append(f"RSI 超賣 ({rsi})。")
+    from_high, vol_ratio = tech.get('pct_from_high'), tech.get('volume_ratio')
+    if from_high is not None and vol_ratio is not None and from_high > -3 and vol_ratio >= 1.5:
+        score += 5
+        bull_factors.append(f"量增 ({vol_ratio}倍) 逼近 52 週高點。")
+
+    if score >= 80: verdict = "強力買進 (Strong Buy)"
+    elif score >= 60: verdict = "偏多操作 (Bullish)"
+    elif score <= 30: verdict = "保守觀望 (Bearish)"
+    else: verdict = "區間震盪 (Neutral)"
+
+    summary_md = f"### 🤖 Rules AI 診斷: {name} ({sid})\n\n"
+    summary_md += f"**總和評分**: {score}分 - **{verdict}**\n\n"
+    for f in bull_factors: summary_md += f"- 📈 {f}\n"
+    for f in bear_factors: summary_md += f"- 📉 {f}\n"
+    if not bull_factors and not bear_factors:
+        summary_md += "數據平穩，無顯著訊號。\n"
+    summary_md += "\n> *此報告由專家規則系統生成 (Rule-Based)*"
+    return { "score": score, "verdict": verdict, "report": summary_md }
+
+
+def with_technicals(db):
+    """The same universe with indicator blocks cycling through every technical rule (and their gaps)."""
+    variants = [
+        None,
+        {"ma20": 0.9, "ma60": 0.8, "rsi14": 85.0, "pct_from_high": -1.0, "volume_ratio": 2.0},   # above MAs, hot
+        {"ma20": 1.2, "ma60": 1.4, "rsi14": 15.0, "pct_from_high": -20.0, "volume_ratio": 3.0},  # below MAs, oversold
+        {"ma20": None, "ma60": 1.0, "rsi14": None, "pct_from_high": None, "volume_ratio": 1.6},
+        {"ma20": 1.0, "ma60": 1.0, "rsi14": 50.0, "pct_from_high": -2.9, "volume_ratio": 1.5},  # flat MAs, breakout
+    ]
+    out = copy.deepcopy(db)
+    for i, rec in enumerate(out.values()):
+        v = variants[i % len(variants)]
+        if v is None: continue
+        price = (rec.get("valuation") or {}).get("price") or 0
+        rec["technicals"] = {k: (round(x * price, 2) if k in ("ma20", "ma60") and x is not None else x) for k, x in v.items()}
+    return out
+
+
+@pytest.fixture(scope="module")
+def universes():
+    with open(STOCK_JSON, "r", encoding="utf-8") as f:
+        db = json.load(f)
+    broken = {
+        "9901": {"stock_id": "9901", "valuation": {"current_pe": "N/A"}},     # string PE: the reference raises
+        "9902": {"stock_id": "9902", "chips": {"foreign_net": None}},         # null flow: the reference raises
+        "9903": {"stock_id": "9903"},                                         # nothing: neutral
+    }
+    return {"stock_data.json": db, "with technicals": {**with_technicals(db), **broken}}
+
+
+def _reference(rec):
+    try:
+        return original_rule_report(rec)
+    except Exception:
+        return None
+
+
+@pytest.mark.parametrize("name", ["stock_data.json", "with technicals"])
+def test_batch_scores_match_per_stock_report(universes, name):
+    db = universes[name]
+    batch = score_universe(db)
+    for code, rec in db.items():
+        ref = _reference(rec)
+        if ref is None:
+            assert code not in batch, code
+            with pytest.raises(Exception):
+                generate_rule_based_report(rec)
+            continue
+        per_stock = generate_rule_based_report(rec)
+        assert {k: per_stock[k] for k in ("score", "verdict", "report")} == ref, code
+        got = batch[code]
+        assert (got["score"], got["verdict"], got["factors"]) == \
+            (per_stock["score"], per_stock["verdict"], per_stock["factors"]), code
+        assert render_rule_report(rec, got) == per_stock, code
+
+
+def test_every_rule_fires_somewhere(universes):
+    from backend.analysis import RULES
+    fired = {f for r in score_universe(universes["with technicals"]).values() for f in r["factors"]}
+    assert fired == set(RULES)
@@ -0,0 +1,55 @@
+import time
+import datetime
+import threading
+
+import pytest
+
+from backend import data_updater, transport
+from backend.bench import fixtures as fx
+from backend.fetch_engine import FetchEngine
+from backend.scrapers.chips import T86_PATH
+
+RECORDED_AT = datetime.datetime(2026, 2, 13, 15, 0, 0)
+
+
+@pytest.fixture
+def replay(tmp_path, monkeypatch):
+    """A tape recorded on RECORDED_AT holding that day's T86, active as the replay transport."""
+    tape = transport.Tape(str(tmp_path / "tape"))
+    tape.write_info({"recorded_at": RECORDED_AT.strftime("%Y-%m-%d %H:%M:%S")})
+    url = f"{data_updater.TWSE_DOMAIN}{T86_PATH}?date={RECORDED_AT:%Y%m%d}&selectType=ALL&response=json"
+    tape.put(transport.tape_key("GET", url), {"method": "GET", "url": url, "status": 200,
+                                              "headers": {"Content-Type": "application/json"}}, fx.load_bytes("t86"))
+    t = transport.make("replay", str(tmp_path / "tape"))
+    monkeypatch.setattr(transport, "_active", t)
+    engine = FetchEngine(use_cache=False)
+    monkeypatch.setattr(data_updater, "ENGINE", engine)
+    yield t
+    engine.shutdown()
+
+
+def test_replay_pins_the_fetchers_clock_only(replay):
+    assert replay.recorded_at == RECORDED_AT
+    assert transport.today() == RECORDED_AT.date()
+    assert abs(transport.now() - RECORDED_AT) < datetime.timedelta(minutes=1)
+
+    # The standard library is untouched, in this thread and any other
+    assert datetime.datetime.now.__self__ is datetime.datetime and datetime.datetime.__module__ == "datetime"
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(datetime.date.today()))
+    worker.start()
+    worker.join()
+    assert seen == [datetime.date.today()] and str(seen[0]) == time.strftime("%Y-%m-%d")
+    assert isinstance(transport.now(), datetime.datetime) and type(transport.today()) is datetime.date
+
+
+def test_fetchers_replay_requests_built_from_the_recorded_day(replay):
+    chips_map = data_updater.fetch_twse_chips_global()
+    assert len(chips_map) > 10
+    assert replay.stats["hits"] == 1 and replay.stats["misses"] == 0
+
+
+def test_live_clock_is_the_real_clock(monkeypatch):
+    monkeypatch.setattr(transport, "_active", transport.make("live"))
+    assert abs(transport.now() - datetime.datetime.now()) < datetime.timedelta(seconds=1)
+    assert transport.today() == datetime.date.today()
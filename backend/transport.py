@@ -0,0 +1,483 @@
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import datetime
+import tempfile
+import importlib
+import threading
+import contextlib
+from urllib.parse import urlparse, parse_qsl
+
+import requests
+
+from backend import http_session
+
+# --- Pluggable HTTP Transport ---
+# Every fetcher sends through http_cache.cached_request -> transport.send(), so
+# one switch decides where responses come from:
+#   live    pooled per-host sessions with backoff + circuit breakers (http_session)
+#   record  requests, and every response is also written to the tape
+#   replay  responses come from the tape only: no network, no polite sleeps
+#   local   requests go to a local stand-in server (`serve` plays a tape over HTTP)
+# record / replay / local skip the on-disk HTTP cache so every request reaches
+# the transport. Non-HTTP sources (yfinance) are taped per call via call().
+#
+#   MARKET_RADAR_TRANSPORT=replay MARKET_RADAR_TAPE_DIR=data/tapes python backend/data_updater.py --force
+#   python -m backend.transport run all --mode record
+#   python -m backend.transport run all --mode replay --profile data/etl.prof
+#   python -m backend.transport run stock --mode replay --out /tmp/radar   (keep the outputs)
+#   python -m backend.transport serve --port 8765   (then --mode local --url http://127.0.0.1:8765)
+#
+# Replay is keyed by the exact request, and request URLs are built from "today",
+# so the tape keeps its recording time (tape.json). Fetchers take "now" from
+# transport.now() / transport.today(), which the replay transport runs from the
+# recorded moment; datetime itself (and every other thread) keeps the real clock.
+# A miss raises ConnectionError and the fetcher takes its usual fallback.
+# `run` writes every output (public JSON, shards, deltas, telemetry, data/ stores)
+# under a scratch directory (--out, default a fresh temp dir), never the real tree.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Allow `python backend/transport.py` to import backend.* modules
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+TAPE_DIR = os.getenv("MARKET_RADAR_TAPE_DIR", os.path.join(BASE_DIR, "data", "tapes"))
+LOCAL_URL = os.getenv("MARKET_RADAR_LOCAL_URL", "http://127.0.0.1:8765")
+MODES = ("live", "record", "replay", "local")
+CALL_PREFIX = "/__call__/"
+
+
+def tape_key(method, url, params=None, data=None):
+    """Request identity: method + fully encoded URL (minus MIS cache-busters) + sorted form fields."""
+    full = requests.Request(method.upper(), url, params=params).prepare().url
+    full = re.sub(r"([?&])_=\d+&?", r"\1", full).rstrip("?&")
+    if isinstance(data, dict):
+        data = sorted((str(k), str(v)) for k, v in data.items())
+    elif isinstance(data, (bytes, str)):
+        data = sorted(parse_qsl(data.decode() if isinstance(data, bytes) else data))
+    raw = json.dumps([method.upper(), full, data or []], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def call_key(name, args):
+    raw = json.dumps([name, args], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _json_default(o):
+    return o.item() if hasattr(o, "item") else str(o)  # numpy scalars from yfinance
+
+
+class Tape:
+    """
+    Recorded responses: <dir>/<key[:2]>/<key>.gz = gzip(meta-json + b"\\n" + body)
+    (same layout as the HTTP cache) plus index.jsonl, one line per recording.
+    """
+
+    def __init__(self, root=TAPE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.gz")
+
+    def put(self, key, meta, body):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n" + body)
+        os.replace(tmp, path)
+        with self._lock, open(os.path.join(self.root, "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, **meta}, ensure_ascii=False) + "\n")
+
+    def get(self, key):
+        """(meta, body) or None."""
+        try:
+            with gzip.open(self._path(key), "rb") as f:
+                meta_line, body = f.read().split(b"\n", 1)
+            return json.loads(meta_line), body
+        except (OSError, ValueError):
+            return None
+
+    def write_info(self, info):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, "tape.json"), "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False)
+
+    def recorded_at(self):
+        """Recording start (datetime) from tape.json; older tapes fall back to the first index line."""
+        try:
+            with open(os.path.join(self.root, "tape.json"), "r", encoding="utf-8") as f:
+                stamp = json.load(f).get("recorded_at")
+        except (OSError, ValueError):
+            stamps = [e["recorded_at"] for e in self.entries().values() if e.get("recorded_at")]
+            stamp = min(stamps) if stamps else None
+        return datetime.datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S") if stamp else None
+
+    def entries(self):
+        """Latest index line per key."""
+        path = os.path.join(self.root, "index.jsonl")
+        out = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        out[entry["key"]] = entry
+        return out
+
+
+def _response(meta, body, url):
+    r = requests.models.Response()
+    r.status_code = meta.get("status", 200)
+    r._content = body
+    r.url = meta.get("url") or url
+    r.headers.update(meta.get("headers") or {})
+    r.headers["X-Transport"] = "replay"
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+
+class Transport:
+    """live: pooled sessions (http_session), polite delays on, HTTP cache on."""
+    mode = "live"
+    polite = True
+    uses_cache = True
+
+    def __init__(self):
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "recorded": 0}
+        self._lock = threading.Lock()
+
+    def now(self, tz=None):
+        """The fetchers' clock (see transport.now())."""
+        return datetime.datetime.now(tz)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def send(self, method, url, **kwargs):
+        self._count("requests")
+        return http_session.request(method, url, **kwargs)
+
+    def call(self, name, args, fn):
+        """Non-HTTP source (e.g. yfinance): fn() -> JSON-able result."""
+        return fn()
+
+    def report(self):
+        s = self.stats
+        print(f"📼 Transport [{self.mode}]: {s['requests']} requests, {s['hits']} replayed, "
+              f"{s['misses']} missed, {s['recorded']} recorded")
+
+
+class RecordTransport(Transport):
+    mode = "record"
+    uses_cache = False  # Every response must reach the tape
+
+    def __init__(self, tape_dir=TAPE_DIR):
+        super().__init__()
+        self.tape = Tape(tape_dir)
+        self.tape.write_info({"recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+    def send(self, method, url, **kwargs):
+        r = super().send(method, url, **kwargs)
+        meta = {"method": method.upper(), "url": url, "params": kwargs.get("params"), "status": r.status_code,
+                "headers": {"Content-Type": r.headers.get("Content-Type", "")},
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self.tape.put(tape_key(method, url, kwargs.get("params"), kwargs.get("data")), meta, r.content)
+        self._count("recorded")
+        return r
+
+    def call(self, name, args, fn):
+        result = fn()
+        meta = {"call": name, "args": args, "status": 200, "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        body = json.dumps(result, ensure_ascii=False, default=_json_default).encode("utf-8")
+        self.tape.put(call_key(name, args), meta, body)
+        self._count("recorded")
+        return result
+
+
+class ReplayTransport(Transport):
+    mode = "replay"
+    polite = False
+    uses_cache = False
+
+    def __init__(self, tape_dir=TAPE_DIR):
+        super().__init__()
+        self.tape = Tape(tape_dir)
+        self.recorded_at = self.tape.recorded_at()
+        # Clock pinned to the recording: runs on from recorded_at as of now
+        self._clock_offset = self.recorded_at - datetime.datetime.now() if self.recorded_at else None
+
+    def now(self, tz=None):
+        real = datetime.datetime.now(tz)
+        return real + self._clock_offset if self._clock_offset is not None else real
+
+    def _miss(self, what):
+        self._count("misses")
+        raise requests.ConnectionError(f"replay miss: {what}")
+
+    def send(self, method, url, **kwargs):
+        self._count("requests")
+        hit = self.tape.get(tape_key(method, url, kwargs.get("params"), kwargs.get("data")))
+        if hit is None:
+            self._miss(f"{method} {url}")
+        self._count("hits")
+        return _response(hit[0], hit[1], url)
+
+    def call(self, name, args, fn):
+        hit = self.tape.get(call_key(name, args))
+        if hit is None:
+            self._miss(f"{name}({args})")
+        self._count("hits")
+        return json.loads(hit[1])
+
+
+class LocalTransport(Transport):
+    """Rewrites every request to base_url, original host in X-Forwarded-Host (see serve())."""
+    mode = "local"
+    polite = False
+    uses_cache = False
+
+    def __init__(self, base_url=LOCAL_URL):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+
+    def send(self, method, url, **kwargs):
+        self._count("requests")
+        u = urlparse(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers.update({"X-Forwarded-Host": u.netloc, "X-Forwarded-Proto": u.scheme})
+        local = f"{self.base_url}{u.path or '/'}" + (f"?{u.query}" if u.query else "")
+        return http_session.request(method, local, headers=headers, **kwargs)
+
+    def call(self, name, args, fn):
+        self._count("requests")
+        r = http_session.request("GET", f"{self.base_url}{CALL_PREFIX}{call_key(name, args)}", timeout=10)
+        if r.status_code != 200:
+            raise requests.ConnectionError(f"local miss: {name}({args})")
+        return r.json()
+
+
+# --- Active transport (process-wide) ---
+_active = None
+_active_lock = threading.Lock()
+
+
+def make(mode, tape_dir=None, base_url=None):
+    if mode not in MODES:
+        raise ValueError(f"unknown transport mode {mode!r} (expected one of {', '.join(MODES)})")
+    if mode == "record": return RecordTransport(tape_dir or TAPE_DIR)
+    if mode == "replay": return ReplayTransport(tape_dir or TAPE_DIR)
+    if mode == "local": return LocalTransport(base_url or LOCAL_URL)
+    return Transport()
+
+
+def active():
+    global _active
+    with _active_lock:
+        if _active is None:
+            _active = make(os.getenv("MARKET_RADAR_TRANSPORT", "live"))
+        return _active
+
+
+def use(mode, tape_dir=None, base_url=None):
+    """Switch the process to `mode`. Returns the new transport."""
+    global _active
+    with _active_lock:
+        _active = make(mode, tape_dir, base_url)
+        if getattr(_active, "recorded_at", None):
+            print(f"🕰️ Replay clock pinned at {_active.recorded_at:%Y-%m-%d %H:%M:%S} (tape recording time)")
+        return _active
+
+
+def send(method, url, **kwargs):
+    return active().send(method, url, **kwargs)
+
+
+def call(name, args, fn):
+    return active().call(name, args, fn)
+
+
+def now(tz=None):
+    """"Now" for fetchers that build requests from the date: real time, or the tape's clock when replaying."""
+    return active().now(tz)
+
+
+def today():
+    return now().date()
+
+
+def polite_sleep(seconds):
+    """Courtesy delay for live sources; skipped when replaying or serving locally."""
+    if seconds and active().polite:
+        time.sleep(seconds)
+
+
+# --- Local stand-in server ---
+
+def serve(tape_dir=TAPE_DIR, host="127.0.0.1", port=8765):
+    """Play a tape over HTTP for LocalTransport clients (404 + X-Tape-Miss when not recorded)."""
+    import http.server
+    tape = Tape(tape_dir)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, hit):
+            if hit is None:
+                body = b"not recorded"
+                self.send_response(404)
+                self.send_header("X-Tape-Miss", "1")
+            else:
+                meta, body = hit
+                self.send_response(meta.get("status", 200))
+                ctype = (meta.get("headers") or {}).get("Content-Type")
+                if ctype: self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, method):
+            if self.path.startswith(CALL_PREFIX):
+                return self._reply(tape.get(self.path[len(CALL_PREFIX):]))
+            length = int(self.headers.get("Content-Length") or 0)
+            data = self.rfile.read(length) if length else None
+            origin = f"{self.headers.get('X-Forwarded-Proto', 'https')}://{self.headers.get('X-Forwarded-Host', '')}"
+            self._reply(tape.get(tape_key(method, origin + self.path, None, data)))
+
+        def do_GET(self): self._handle("GET")
+        def do_POST(self): self._handle("POST")
+        def log_message(self, *args): pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    print(f"📼 Serving tape {tape_dir} on http://{host}:{port}")
+    return server
+
+
+# --- Jobs ---
+# Every output location of the updaters, relative to the scratch directory
+SCOPED_OUTPUTS = (
+    ("backend.data_updater", "PUBLIC_DIR", "public"),
+    ("backend.data_updater", "JSON_PATH", "public/stock_data.json"),
+    ("backend.data_updater", "stock_json_path", "public/stock_data.json"),
+    ("backend.data_updater", "macro_json_path", "public/macro_data.json"),
+    ("backend.data_updater", "SHARDS_DIR", "public/stocks"),
+    ("backend.data_updater", "STORE_DIR", "data/stock_store"),
+    ("backend.scrapers.macro", "PUBLIC_DIR", "public"),
+    ("backend.scrapers.macro", "MACRO_DATA_FILE", "public/macro_data.json"),
+    ("backend.global_updater", "PUBLIC_DIR", "public"),
+    ("backend.global_updater", "JSON_PATH", "public/global_data.json"),
+    ("backend.telemetry", "TELEMETRY_DIR", "public/telemetry"),
+    ("backend.storage.delta", "DELTA_DIR", "public/delta"),
+    ("backend.storage.ohlcv", "OHLCV_DIR", "data/ohlcv"),
+    ("backend.storage.flows", "FLOWS_DIR", "data/flows"),
+    ("backend.indicators", "STATE_PATH", "data/indicator_state.npz"),
+    ("backend.checkpoint", "CHECKPOINT_DIR", "data/checkpoints"),
+)
+JOB_MODULES = {"stock": "backend.data_updater", "macro": "backend.scrapers.macro", "global": "backend.global_updater"}
+
+
+@contextlib.contextmanager
+def scoped_outputs(out_dir):
+    """Point every updater output at out_dir (like bench/run.py's temp workdir); restored on exit."""
+    saved = []
+    os.makedirs(os.path.join(out_dir, "public"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "data"), exist_ok=True)
+    try:
+        for module_name, attr, rel in SCOPED_OUTPUTS:
+            module = importlib.import_module(module_name)
+            saved.append((module, attr, getattr(module, attr)))
+            setattr(module, attr, os.path.join(out_dir, *rel.split("/")))
+        yield out_dir
+    finally:
+        for module, attr, value in reversed(saved):
+            setattr(module, attr, value)
+
+
+def run_job(job, out_dir):
+    """Run one updater with its outputs under out_dir."""
+    if job not in JOB_MODULES:
+        raise ValueError(job)
+    importlib.import_module(JOB_MODULES[job])
+    with scoped_outputs(out_dir):
+        if job == "stock":
+            from backend import data_updater
+            argv, sys.argv = sys.argv, [sys.argv[0], "--force"]
+            try:
+                data_updater.main()
+            finally:
+                sys.argv = argv
+        elif job == "macro":
+            from backend.scrapers.macro import MacroScraper
+            MacroScraper().run()
+        else:
+            from backend.global_updater import update_global_intelligence
+            update_global_intelligence()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Record / replay / local transport for the updaters")
+    parser.add_argument("action", choices=["run", "serve", "show"])
+    parser.add_argument("job", nargs="?", default="all", choices=["all", "stock", "macro", "global"])
+    parser.add_argument("--mode", default="replay", choices=MODES)
+    parser.add_argument("--tape", default=TAPE_DIR)
+    parser.add_argument("--url", default=LOCAL_URL, help="local server base URL (--mode local)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", help="write cProfile stats to this file")
+    parser.add_argument("--out", help="directory for the jobs' outputs (default: a fresh temp dir, removed afterwards)")
+    args = parser.parse_args()
+
+    if args.action == "serve":
+        srv = serve(args.tape, port=args.port)
+        try: srv.serve_forever()
+        except KeyboardInterrupt: pass
+    elif args.action == "show":
+        entries = Tape(args.tape).entries()
+        for e in sorted(entries.values(), key=lambda e: e.get("url") or e.get("call") or ""):
+            print(f"   {e.get('status')} {e.get('method', 'CALL'):<5} {e.get('url') or e.get('call')} {e.get('args') or ''}")
+        print(f"📼 {len(entries)} recordings in {args.tape}")
+    else:
+        jobs = ["stock", "macro", "global"] if args.job == "all" else [args.job]
+        t = use(args.mode, args.tape, args.url)
+        if args.mode == "replay" and t.recorded_at is None:
+            print(f"⚠️ {args.tape} has no recording time; replaying on the real clock")
+        out_dir = args.out or tempfile.mkdtemp(prefix="market_radar_transport_")
+        print(f"📂 Outputs go to {out_dir}")
+        profiler = None
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        timings = {}
+        try:
+            for job in jobs:
+                job_start = time.perf_counter()
+                try:
+                    run_job(job, out_dir)
+                except SystemExit as e:  # An aborted job (e.g. integrity check) must not stop the others
+                    print(f"⚠️ {job} exited with status {e.code}")
+                timings[job] = time.perf_counter() - job_start
+        finally:
+            if not args.out:
+                shutil.rmtree(out_dir, ignore_errors=True)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"📈 Profile written to {args.profile}")
+        t.report()
+        print(f"⏱️ {', '.join(f'{j} {s:.2f}s' for j, s in timings.items())} (total {time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    # Run the CLI on the importable module: fetchers call backend.transport.active(), not __main__'s
+    from backend import transport
+    transport.main()
@@ -13,6 +13,17 @@ IF %ERRORLEVEL% NEQ 0 (
 
 echo [2/4] Staging changes...
 git add .
+REM Every updater run rewrites telemetry (run id, timings) and the per-job deltas (run_at):
+REM leave them out of the check so a run with no material change is not deployed.
+git reset -q -- frontend/public/telemetry frontend/public/delta
+git diff --cached --quiet
+IF %ERRORLEVEL% EQU 0 (
+    echo Nothing changed since the last deploy ^(telemetry / delta only^). Skipping commit and push.
+    pause
+    exit /b
+)
+REM A real change: telemetry and deltas ride along
+git add .
 
 set /p commit_msg="Enter commit message (Press Enter for 'Update'): "
 if "%commit_msg%"=="" set commit_msg=Update
@@ -5,6 +5,32 @@ import { AlertTriangle, TrendingUp, TrendingDown, DollarSign, Activity, Sparkles
 
 const API_BASE = "http://localhost:8000/api";
 
+// Sharded static DB: /stocks/manifest.json lists [stock_id, stock_name, hash]
+// Only a good manifest is kept for the session; a failed fetch is retried on the next lookup.
+let manifestPromise = null;
+function loadManifest() {
+    if (!manifestPromise) {
+        manifestPromise = axios.get('/stocks/manifest.json', { params: { t: Date.now() } })
+            .then(res => (res.data && Array.isArray(res.data.stocks) ? res.data : null))
+            .catch(() => null)
+            .then(manifest => {
+                if (!manifest) manifestPromise = null;
+                return manifest;
+            });
+    }
+    return manifestPromise;
+}
+
+// Same priority as the API: exact ID, exact name, then name substring
+function resolveTicker(manifest, query) {
+    const q = query.trim();
+    const stocks = manifest.stocks;
+    return stocks.find(s => s[0] === q) ||
+        stocks.find(s => s[1] === q) ||
+        (q.length > 1 ? stocks.find(s => s[1].includes(q)) : null) ||
+        null;
+}
+
 function StockScan({ ticker }) {
     const [data, setData] = useState(null);
     const [loading, setLoading] = useState(false);
@@ -40,27 +66,41 @@ function StockScan({ ticker }) {
             try {
                 console.log(`Searching for ${debouncedTicker} in serverless DB...`);
 
-                // Serverless: Fetch full database (2.5MB) from local public
-                const response = await axios.get('/stock_data.json');
+                // Serverless: small manifest (cached per session) + one per-stock shard (~1KB)
+                const manifest = await loadManifest();
+                let targetData = null;
+                let total = 0;
+
+                if (manifest) {
+                    total = manifest.stocks.length;
+                    const hit = resolveTicker(manifest, debouncedTicker);
+                    if (hit) {
+                        const [stockId, , hash] = hit;
+                        const shard = await axios.get(`/stocks/${stockId}.json?v=${hash}`);
+                        targetData = shard.data;
+                    }
+                } else {
+                    // Legacy fallback: full database (2.5MB) from local public
+                    const response = await axios.get('/stock_data.json');
+                    let fullData = response.data;
+                    // Safety: Ensure it's an object
+                    if (typeof fullData === 'string') {
+                        try { fullData = JSON.parse(fullData); } catch (e) { console.error("JSON Parse Error", e); }
+                    }
+                    total = Object.keys(fullData).length;
+                    targetData = fullData[debouncedTicker] ||
+                        Object.values(fullData).find(s => s.stock_name.includes(debouncedTicker) || s.stock_id === debouncedTicker);
+                }
 
                 if (!isMounted) return;
 
-                let fullData = response.data;
-                // Safety: Ensure it's an object
-                if (typeof fullData === 'string') {
-                    try { fullData = JSON.parse(fullData); } catch (e) { console.error("JSON Parse Error", e); }
-                }
-
                 // Debug Info
-                console.log(`Loaded ${Object.keys(fullData).length} stocks.`);
-
-                const targetData = fullData[debouncedTicker] ||
-                    Object.values(fullData).find(s => s.stock_name.includes(debouncedTicker) || s.stock_id === debouncedTicker);
+                console.log(`Index has ${total} stocks.`);
 
                 if (targetData) {
                     setData(targetData);
                 } else {
-                    setError(`查無此股資料 (${debouncedTicker})。資料庫筆數: ${Object.keys(fullData).length}`);
+                    setError(`查無此股資料 (${debouncedTicker})。資料庫筆數: ${total}`);
                 }
 
             } catch (err) {